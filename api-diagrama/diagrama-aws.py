@@ -1,104 +1,32 @@
-import json, uuid, os, base64, logging, boto3, requests
+import json, os, logging
+
+from comun.cuotas import RENDER, admitir, respuesta_limitada
+from comun.entrega import quiere_inline, respuesta_inline
+from comun.firmador import obtener_firmador, prefijo_usuario
+from comun.formatos import MERMAID, formatos_pedidos, generar_formatos, renderer_de, respuesta_mermaid
+from comun.generacion import generar_diagrama
+from comun.metricas import etapa, instrumentado, registrar_evento, sumar
+from comun.mosaico import desde_grafo, generar_mosaicos, quiere_mosaico
+from comun.parser import Grafo, parsear_pseudocodigo, pseudocodigo_a_mermaid
+from comun.render import ErrorRender
+from comun.trabajos import encolar_render, es_async
+from comun.validador import TokenInvalido, validar_token
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-BUCKET_NAME  = os.environ["BUCKET_NAME"]
-VALIDADOR_FN = "api-diagrama-dev-validarUsuario"
+BUCKET_NAME = os.environ["BUCKET_NAME"]
 
 CORS_HEADERS = {
-    "Access-Control-Allow-Origin":  "*",           restringir
+    "Access-Control-Allow-Origin":  "*",           # restringir
     "Access-Control-Allow-Headers": "Content-Type,Authorization",
     "Access-Control-Allow-Methods": "OPTIONS,POST"
 }
 
-def pseudocodigo_a_mermaid(pseudocodigo: str) -> str:
-    lines = pseudocodigo.strip().split("\n")
-    if not lines:
-        raise ValueError("Pseudocódigo vacío")
-
-    header = lines[0].lower()
-    if header.startswith("erdiagrama"):
-        tipo = "erDiagram"
-        lines = lines[1:]
-    elif header.startswith("diagrama"):
-        tipo = "graph TD"
-        lines = lines[1:]
-    else:
-        tipo = "graph TD"
-
-    if tipo == "erDiagram":
-        entidades  = {}
-        relaciones = []
-
-        for raw in lines:
-            line = raw.strip()
-            if not line:
-                continue
-
-            if "{" in line and "}" in line:
-                entidad, bloque   = line.split("{", 1)
-                entidad           = entidad.strip()
-                atributos_raw     = bloque.rstrip("}").strip()
-                atributos         = atributos_raw.split("string")
-                entidades[entidad] = [
-                    "string " + a.strip()
-                    for a in atributos
-                    if a.strip()
-                ]
-
-            elif any(sym in line for sym in ["||--", "}o--", "o{", "}o--o{"]):
-                relaciones.append(line)
-
-            else:
-                raise ValueError(f"Línea ER inválida: “{line}”")
-
-        mermaid = "erDiagram\n"
-        for entidad, attrs in entidades.items():
-            mermaid += f"    {entidad} {{\n"
-            for attr in attrs:
-                mermaid += f"        {attr}\n"
-            mermaid += "    }\n"
-        for rel in relaciones:
-            mermaid += f"    {rel}\n"
-        return mermaid
-
-    recursos   = set()
-    conexiones = []
-
-    for raw in lines:
-        line = raw.strip()
-        if not line:
-            continue
-
-        if "conectado a" in line:
-            try:
-                origen_txt, destino_txt = line.split("conectado a")
-                _, origen_nombre  = origen_txt.strip().split(" ", 1)
-                _, destino_nombre = destino_txt.strip().split(" ", 1)
-                origen  = origen_nombre.strip(' "\'')
-                destino = destino_nombre.strip(' "\'')
-                conexiones.append((origen, destino))
-                recursos.update([origen, destino])
-            except ValueError as e:
-                raise ValueError(f"Línea inválida: “{line}” → {e}")
-        else:
-            try:
-                _, nombre = line.split(" ", 1)
-                recursos.add(nombre.strip(' "\''))
-            except ValueError as e:
-                raise ValueError(f"Línea inválida: “{line}” → {e}")
-
-    mermaid = "graph TD\n"
-    for r in sorted(recursos):
-        mermaid += f'    {r.replace(" ", "_")}[\"{r}\"]\n'
-    for orig, dest in conexiones:
-        mermaid += f'    {orig.replace(" ", "_")} --> {dest.replace(" ", "_")}\n'
-    return mermaid
-
+@instrumentado("diagrama-aws")
 def lambda_handler(event, _context):
     try:
-        logger.info("Evento: %s", json.dumps(event))
+        registrar_evento(logger, event)
 
         if event.get("requestContext", {}).get("http", {}).get("method") == "OPTIONS":
             return {
@@ -115,24 +43,35 @@ def lambda_handler(event, _context):
                 "body": json.dumps({"error": "Token no proporcionado"})
             }
 
-        lambda_cli = boto3.client("lambda")
-        resp = lambda_cli.invoke(
-            FunctionName  = VALIDADOR_FN,
-            InvocationType= "RequestResponse",
-            Payload       = json.dumps({"token": token})
-        )
-        validation = json.loads(resp["Payload"].read())
-        if validation.get("statusCode") == 403:
+        try:
+            with etapa("validar_token"):
+                user = validar_token(token)
+        except TokenInvalido:
             return {
                 "statusCode": 403,
                 "headers": CORS_HEADERS,
                 "body": json.dumps({"error": "Token inválido"})
             }
 
-        user         = json.loads(validation["body"])
         tenant_id    = user["tenant_id"]
         user_id      = user["user_id"]
 
+        # Cuota del tenant antes de parsear o renderizar nada
+        with etapa("cuota"):
+            espera = admitir(tenant_id, RENDER)
+        if espera:
+            return respuesta_limitada(espera, CORS_HEADERS)
+
+        try:
+            formatos = formatos_pedidos(event)
+        except ValueError as ve:
+            return {
+                "statusCode": 400,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"error": str(ve)})
+            }
+        formato = formatos[0] if len(formatos) == 1 else None
+
         body        = json.loads(event.get("body") or "{}")
         pseudocode  = body.get("code")
         if not pseudocode:
@@ -142,30 +81,97 @@ def lambda_handler(event, _context):
                 "body": json.dumps({"error": "Falta el campo code"})
             }
 
-        mermaid_code = pseudocodigo_a_mermaid(pseudocode)
-        encoded      = base64.urlsafe_b64encode(mermaid_code.encode()).decode()
-        img_resp     = requests.get(f"https://mermaid.ink/img/{encoded}", timeout=10)
-        if img_resp.status_code != 200:
+        if quiere_mosaico(event) and formato != MERMAID:
+            with etapa("parseo"):
+                diagrama = parsear_pseudocodigo(pseudocode)
+            if not isinstance(diagrama, Grafo):
+                return {
+                    "statusCode": 400,
+                    "headers": CORS_HEADERS,
+                    "body": json.dumps({"error": "El modo mosaico solo aplica a diagramas de recursos"})
+                }
+            try:
+                with etapa("mosaicos"):
+                    manifiesto = generar_mosaicos(desde_grafo(diagrama), tenant_id, user_id, "aws", BUCKET_NAME,
+                                                  renderer=renderer_de(formato))
+            except ErrorRender:
+                return {
+                    "statusCode": 502,
+                    "headers": CORS_HEADERS,
+                    "body": json.dumps({"error": "Error generando imagen Mermaid"})
+                }
+            return {
+                "statusCode": 201,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({
+                    "message":   "Diagrama generado en mosaicos",
+                    **manifiesto,
+                    "tenant_id": tenant_id,
+                    "user_id":   user_id
+                })
+            }
+
+        with etapa("parseo"):
+            mermaid_code = pseudocodigo_a_mermaid(pseudocode)
+        sumar("bytes_mermaid", len(mermaid_code))
+
+        if formato == MERMAID:
+            return respuesta_mermaid(mermaid_code, CORS_HEADERS)
+
+        if es_async(event):
+            job_id = encolar_render(mermaid_code, tenant_id, user_id, "aws", BUCKET_NAME, renderer_de(formato))
+            return {
+                "statusCode": 202,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({
+                    "message":    "Diagrama en cola",
+                    "job_id":     job_id,
+                    "status_url": f"/diagrama/jobs/{job_id}",
+                    "tenant_id":  tenant_id,
+                    "user_id":    user_id
+                })
+            }
+
+        if len(formatos) > 1:
+            # Un render por formato pedido; cada uno con su propia clave de caché
+            try:
+                with etapa("generar"):
+                    urls = generar_formatos(mermaid_code, tenant_id, user_id, "aws", BUCKET_NAME, formatos)
+            except ErrorRender:
+                return {
+                    "statusCode": 502,
+                    "headers": CORS_HEADERS,
+                    "body": json.dumps({"error": "Error generando imagen Mermaid"})
+                }
+            return {
+                "statusCode": 201,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({
+                    "message":   "Diagrama generado con éxito",
+                    "formats":   urls,
+                    "tenant_id": tenant_id,
+                    "user_id":   user_id
+                })
+            }
+
+        try:
+            with etapa("generar"):
+                publicado = generar_diagrama(mermaid_code, tenant_id, user_id, "aws", BUCKET_NAME, renderer_de(formato))
+            sumar("bytes_imagen", publicado.tamanio)
+        except ErrorRender:
             return {
                 "statusCode": 502,
                 "headers": CORS_HEADERS,
                 "body": json.dumps({"error": "Error generando imagen Mermaid"})
             }
 
-        s3_key = f"{tenant_id}/{user_id}/{uuid.uuid4()}.png"
-        s3     = boto3.client("s3")
-        s3.put_object(
-            Bucket      = BUCKET_NAME,
-            Key         = s3_key,
-            Body        = img_resp.content,
-            ContentType = "image/png"
-        )
-
-        url_firmada = s3.generate_presigned_url(
-            ClientMethod = "get_object",
-            Params       = {"Bucket": BUCKET_NAME, "Key": s3_key},
-            ExpiresIn    = 3600
-        )
+        if quiere_inline(event):
+            inline = respuesta_inline(publicado, BUCKET_NAME, CORS_HEADERS)
+            if inline:
+                return inline
+
+        with etapa("firma"):
+            url_firmada = obtener_firmador(BUCKET_NAME).firmar([publicado.s3_key], prefijo_usuario(tenant_id, user_id), expira=3600)[0]
 
         return {
             "statusCode": 201,                
@@ -173,6 +179,7 @@ def lambda_handler(event, _context):
             "body": json.dumps({
                 "message":     "Diagrama generado con éxito",
                 "diagram_url": url_firmada,
+                "format":      renderer_de(formato).extension,
                 "tenant_id":   tenant_id,
                 "user_id":     user_id
             })
@@ -0,0 +1,187 @@
+import json, os, logging
+from concurrent.futures import ThreadPoolExecutor
+
+from comun.cache_render import hash_mermaid
+from comun.cuotas import RENDER, admitir, excede_rafaga, respuesta_limitada
+from comun.firmador import obtener_firmador, prefijo_usuario
+from comun.generacion import generar_diagrama
+from comun.indice import registrar_diagramas
+from comun.limites import limites_tenant, validar_grafo_json
+from comun.metricas import instrumentado, sumar
+from comun.parser import grafo_json_a_mermaid, pseudocodigo_a_mermaid
+from comun.render import ErrorRender, obtener_renderer
+from comun.validador import TokenInvalido, validar_token
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+BUCKET_NAME   = os.environ["BUCKET_NAME"]
+BATCH_MAX     = int(os.environ.get("BATCH_MAX_DIAGRAMAS", "500"))
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", "8"))
+
+CONVERTIDORES = {
+    "aws":  lambda code, _: pseudocodigo_a_mermaid(code),
+    "ER":   lambda code, _: pseudocodigo_a_mermaid(code),
+    "json": lambda code, limites: grafo_json_a_mermaid(validar_grafo_json(code, limites))
+}
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin":  "*",
+    "Access-Control-Allow-Headers": "Content-Type,Authorization",
+    "Access-Control-Allow-Methods": "OPTIONS,POST"
+}
+
+
+def _convertir(item, limites):
+    if not isinstance(item, dict):
+        raise ValueError("Cada diagrama debe ser un objeto con 'tipo' y 'code'")
+    tipo = item.get("tipo")
+    if tipo not in CONVERTIDORES:
+        raise ValueError(f"Tipo inválido: {tipo}. Use aws, ER o json")
+    if not item.get("code"):
+        raise ValueError("Falta el campo code")
+    return tipo, CONVERTIDORES[tipo](item["code"], limites)
+
+
+@instrumentado("diagrama-batch")
+def lambda_handler(event, _context):
+    try:
+        if event.get("requestContext", {}).get("http", {}).get("method") == "OPTIONS":
+            return {
+                "statusCode": 200,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"message": "Pre-flight OK"})
+            }
+
+        token = (event.get("headers") or {}).get("Authorization")
+        if not token:
+            return {
+                "statusCode": 401,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"error": "Token no proporcionado"})
+            }
+
+        # Una sola validación para todo el lote
+        try:
+            user = validar_token(token)
+        except TokenInvalido:
+            return {
+                "statusCode": 403,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"error": "Token inválido"})
+            }
+
+        tenant_id = user["tenant_id"]
+        user_id   = user["user_id"]
+
+        body      = json.loads(event.get("body") or "{}")
+        diagramas = body.get("diagramas")
+        if not isinstance(diagramas, list) or not diagramas:
+            return {
+                "statusCode": 400,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"error": "Falta la lista diagramas"})
+            }
+        if len(diagramas) > BATCH_MAX:
+            return {
+                "statusCode": 413,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"error": f"Máximo {BATCH_MAX} diagramas por lote"})
+            }
+
+        # Cada diagrama cuenta como un render. Un lote más grande que la ráfaga
+        # del tenant no entraría nunca: no es un 429 (reintentar no sirve) sino
+        # un 413 que dice cuánto admite. La ráfaga se sube por tenant en
+        # t_limites_tenant (render_rafaga)
+        sumar("diagramas", len(diagramas))
+        rafaga = excede_rafaga(tenant_id, RENDER, len(diagramas))
+        if rafaga:
+            return {
+                "statusCode": 413,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({
+                    "error":  f"El lote supera la ráfaga del tenant: máximo {rafaga} diagramas por lote",
+                    "maximo": rafaga
+                })
+            }
+        espera = admitir(tenant_id, RENDER, costo=len(diagramas))
+        if espera:
+            return respuesta_limitada(espera, CORS_HEADERS)
+
+        # 1. Parseo de todo el lote; los errores quedan por ítem
+        resultados = [None] * len(diagramas)
+        unicos     = {}   # digest -> (tipo, mermaid_code, [índices])
+        limites    = limites_tenant(tenant_id)
+        for i, item in enumerate(diagramas):
+            try:
+                tipo, mermaid_code = _convertir(item, limites)
+            except (ValueError, AttributeError, TypeError) as e:
+                resultados[i] = {"indice": i, "error": str(e)}
+                continue
+            digest = hash_mermaid(mermaid_code)
+            unicos.setdefault(digest, (tipo, mermaid_code, []))[2].append(i)
+
+        # 2. Render + subida de los diagramas únicos en paralelo
+        renderer = obtener_renderer()
+
+        def generar(tipo, mermaid_code):
+            return generar_diagrama(mermaid_code, tenant_id, user_id, tipo, BUCKET_NAME, renderer, indexar=False)
+
+        with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as pool:
+            futuros = {
+                digest: pool.submit(generar, tipo, mermaid_code)
+                for digest, (tipo, mermaid_code, _) in unicos.items()
+            }
+
+        publicados = {}
+        nuevos     = []
+        for digest, futuro in futuros.items():
+            tipo, _, indices = unicos[digest]
+            try:
+                publicado = futuro.result()
+            except ErrorRender:
+                error = "Error generando imagen del diagrama"
+            except Exception as e:
+                logger.exception("Fallo generando diagrama del lote")
+                error = f"Fallo interno: {e}"
+            else:
+                publicados[digest] = publicado
+                if publicado.nuevo:
+                    nuevos.append((tenant_id, user_id, tipo, publicado))
+                continue
+            for i in indices:
+                resultados[i] = {"indice": i, "error": error}
+
+        # 3. Índice en BatchWriteItem y URLs firmadas en una sola pasada
+        if nuevos:
+            registrar_diagramas(nuevos)
+        urls = dict(zip(
+            publicados,
+            obtener_firmador(BUCKET_NAME).firmar(
+                [p.s3_key for p in publicados.values()], prefijo_usuario(tenant_id, user_id), expira=3600
+            )
+        ))
+        for digest in publicados:
+            for i in unicos[digest][2]:
+                resultados[i] = {"indice": i, "tipo": diagramas[i]["tipo"], "diagram_url": urls[digest]}
+
+        return {
+            "statusCode": 200,
+            "headers": CORS_HEADERS,
+            "body": json.dumps({
+                "message":   "Lote procesado",
+                "diagramas": resultados,
+                "generados": sum(1 for r in resultados if "diagram_url" in r),
+                "errores":   sum(1 for r in resultados if "error" in r),
+                "tenant_id": tenant_id,
+                "user_id":   user_id
+            })
+        }
+
+    except Exception as e:
+        logger.exception("Fallo interno")
+        return {
+            "statusCode": 500,
+            "headers": CORS_HEADERS,
+            "body": json.dumps({"error": f"Fallo interno: {e}"})
+        }
@@ -1,10 +1,22 @@
-import json, uuid, os, base64, logging, boto3, requests
+import json, os, logging
+
+from comun.cuotas import RENDER, admitir, respuesta_limitada
+from comun.entrega import quiere_inline, respuesta_inline
+from comun.firmador import obtener_firmador, prefijo_usuario
+from comun.formatos import MERMAID, formatos_pedidos, generar_formatos, renderer_de, respuesta_mermaid
+from comun.generacion import generar_diagrama
+from comun.limites import LimiteExcedido, limites_tenant, validar_grafo_json
+from comun.metricas import etapa, instrumentado, registrar_evento, sumar
+from comun.mosaico import desde_grafo_json, generar_mosaicos, quiere_mosaico
+from comun.parser import grafo_json_a_mermaid
+from comun.render import ErrorRender
+from comun.trabajos import encolar_render, es_async
+from comun.validador import TokenInvalido, validar_token
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-BUCKET_NAME  = os.environ["BUCKET_NAME"]
-VALIDADOR_FN = "api-diagrama-dev-validarUsuario"
+BUCKET_NAME = os.environ["BUCKET_NAME"]
 
 CORS_HEADERS = {
     "Access-Control-Allow-Origin": "*",
@@ -12,33 +24,10 @@ CORS_HEADERS = {
     "Access-Control-Allow-Methods": "OPTIONS,POST"
 }
 
-def json_a_mermaid(data: dict) -> str:
-    nodos       = data.get("nodos", [])
-    conexiones  = data.get("conexiones", [])
-
-    if not nodos:
-        raise ValueError("El JSON debe contener una lista de 'nodos'.")
-
-    mermaid = "graph TD\n"
-    for nodo in nodos:
-        id_nodo  = nodo.get("id")
-        etiqueta = nodo.get("etiqueta", id_nodo).replace('"', "'").replace("\n", " ")
-        if not id_nodo:
-            raise ValueError("Cada nodo debe tener un 'id'.")
-        mermaid += f'    {id_nodo}["{etiqueta}"]\n'
-
-    for conexion in conexiones:
-        origen  = conexion.get("origen")
-        destino = conexion.get("destino")
-        if not origen or not destino:
-            raise ValueError("Cada conexión debe tener 'origen' y 'destino'.")
-        mermaid += f'    {origen} --> {destino}\n'
-
-    return mermaid
-
+@instrumentado("diagrama-json")
 def lambda_handler(event, _context):
     try:
-        logger.info("Evento: %s", json.dumps(event))
+        registrar_evento(logger, event)
 
         if event.get("requestContext", {}).get("http", {}).get("method") == "OPTIONS":
             return {
@@ -55,28 +44,37 @@ def lambda_handler(event, _context):
                 "body": json.dumps({"error": "Token no proporcionado"})
             }
 
-        lambda_cli = boto3.client("lambda")
-        resp       = lambda_cli.invoke(
-            FunctionName   = VALIDADOR_FN,
-            InvocationType = "RequestResponse",
-            Payload        = json.dumps({"token": token})
-        )
-        validation = json.loads(resp["Payload"].read())
-        if validation.get("statusCode") == 403:
+        try:
+            with etapa("validar_token"):
+                user = validar_token(token)
+        except TokenInvalido:
             return {
                 "statusCode": 403,
                 "headers": CORS_HEADERS,
                 "body": json.dumps({"error": "Token inválido"})
             }
 
-        user      = json.loads(validation["body"])
         tenant_id = user["tenant_id"]
         user_id   = user["user_id"]
 
+        # Cuota del tenant antes de parsear o renderizar nada
+        with etapa("cuota"):
+            espera = admitir(tenant_id, RENDER)
+        if espera:
+            return respuesta_limitada(espera, CORS_HEADERS)
+
+        try:
+            formatos = formatos_pedidos(event)
+        except ValueError as ve:
+            return {
+                "statusCode": 400,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"error": str(ve)})
+            }
+        formato = formatos[0] if len(formatos) == 1 else None
+
         body      = json.loads(event.get("body") or "{}")
-        logger.info("Body recibido: %s", body)
         json_data = body.get("code")
-        logger.info("JSON Data para Mermaid: %s", json_data)
         if not json_data:
             return {
                 "statusCode": 400,
@@ -84,25 +82,92 @@ def lambda_handler(event, _context):
                 "body": json.dumps({"error": "Falta el campo code con el JSON"})
             }
 
-        mermaid_code = json_a_mermaid(json_data)
-        encoded      = base64.urlsafe_b64encode(mermaid_code.encode()).decode()
-        img_resp     = requests.get(f"https://mermaid.ink/img/{encoded}", timeout=10)
-        if img_resp.status_code != 200:
+        # Validación, normalización y límites del tenant antes de cualquier render
+        with etapa("parseo"):
+            grafo = validar_grafo_json(json_data, limites_tenant(tenant_id))
+
+        if quiere_mosaico(event) and formato != MERMAID:
+            try:
+                with etapa("mosaicos"):
+                    manifiesto = generar_mosaicos(desde_grafo_json(grafo), tenant_id, user_id, "json", BUCKET_NAME,
+                                                  renderer=renderer_de(formato))
+            except ErrorRender:
+                return {
+                    "statusCode": 502,
+                    "headers": CORS_HEADERS,
+                    "body": json.dumps({"error": "Error generando imagen Mermaid"})
+                }
+            return {
+                "statusCode": 201,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({
+                    "message": "Diagrama generado en mosaicos",
+                    **manifiesto,
+                    "tenant_id": tenant_id,
+                    "user_id": user_id
+                })
+            }
+
+        mermaid_code = grafo_json_a_mermaid(grafo)
+        sumar("bytes_mermaid", len(mermaid_code))
+
+        if formato == MERMAID:
+            return respuesta_mermaid(mermaid_code, CORS_HEADERS)
+
+        if es_async(event):
+            job_id = encolar_render(mermaid_code, tenant_id, user_id, "json", BUCKET_NAME, renderer_de(formato))
+            return {
+                "statusCode": 202,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({
+                    "message": "Diagrama en cola",
+                    "job_id": job_id,
+                    "status_url": f"/diagrama/jobs/{job_id}",
+                    "tenant_id": tenant_id,
+                    "user_id": user_id
+                })
+            }
+
+        if len(formatos) > 1:
+            # Un render por formato pedido; cada uno con su propia clave de caché
+            try:
+                with etapa("generar"):
+                    urls = generar_formatos(mermaid_code, tenant_id, user_id, "json", BUCKET_NAME, formatos)
+            except ErrorRender:
+                return {
+                    "statusCode": 502,
+                    "headers": CORS_HEADERS,
+                    "body": json.dumps({"error": "Error generando imagen Mermaid"})
+                }
+            return {
+                "statusCode": 201,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({
+                    "message":   "Diagrama generado con éxito",
+                    "formats":   urls,
+                    "tenant_id": tenant_id,
+                    "user_id":   user_id
+                })
+            }
+
+        try:
+            with etapa("generar"):
+                publicado = generar_diagrama(mermaid_code, tenant_id, user_id, "json", BUCKET_NAME, renderer_de(formato))
+            sumar("bytes_imagen", publicado.tamanio)
+        except ErrorRender:
             return {
                 "statusCode": 502,
                 "headers": CORS_HEADERS,
                 "body": json.dumps({"error": "Error generando imagen Mermaid"})
             }
 
-        s3_key = f"{tenant_id}/{user_id}/{uuid.uuid4()}.png"
-        s3     = boto3.client("s3")
-        s3.put_object(Bucket=BUCKET_NAME, Key=s3_key, Body=img_resp.content, ContentType="image/png")
+        if quiere_inline(event):
+            inline = respuesta_inline(publicado, BUCKET_NAME, CORS_HEADERS)
+            if inline:
+                return inline
 
-        url_firmada = s3.generate_presigned_url(
-            ClientMethod="get_object",
-            Params={"Bucket": BUCKET_NAME, "Key": s3_key},
-            ExpiresIn=3600
-        )
+        with etapa("firma"):
+            url_firmada = obtener_firmador(BUCKET_NAME).firmar([publicado.s3_key], prefijo_usuario(tenant_id, user_id), expira=3600)[0]
 
         return {
             "statusCode": 201,
@@ -110,11 +175,19 @@ def lambda_handler(event, _context):
             "body": json.dumps({
                 "message": "Diagrama generado con éxito",
                 "diagram_url": url_firmada,
+                "format": renderer_de(formato).extension,
                 "tenant_id": tenant_id,
                 "user_id": user_id
             })
         }
 
+    except LimiteExcedido as le:
+        return {
+            "statusCode": 413,
+            "headers": CORS_HEADERS,
+            "body": json.dumps({"error": str(le), "metricas": le.metricas})
+        }
+
     except ValueError as ve:
         logger.warning(f"Error de validación: {ve}")
         return {
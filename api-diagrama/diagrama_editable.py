@@ -0,0 +1,122 @@
+import json, os, logging
+
+from comun.cuotas import RENDER, admitir, respuesta_limitada
+from comun.editable import (
+    MODELOS, CambioInvalido, ConflictoVersion, DiagramaNoEncontrado, actualizar_diagrama, crear_diagrama,
+    obtener_diagrama
+)
+from comun.firmador import obtener_firmador, prefijo_usuario
+from comun.render import ErrorRender
+from comun.validador import TokenInvalido, validar_token
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+BUCKET_NAME = os.environ["BUCKET_NAME"]
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin":  "*",
+    "Access-Control-Allow-Headers": "Content-Type,Authorization",
+    "Access-Control-Allow-Methods": "OPTIONS,GET,POST,PATCH"
+}
+
+
+def _respuesta(status, body):
+    return {"statusCode": status, "headers": CORS_HEADERS, "body": json.dumps(body)}
+
+
+def _url(user, s3_key):
+    return obtener_firmador(BUCKET_NAME).firmar(
+        [s3_key], prefijo_usuario(user["tenant_id"], user["user_id"]), expira=3600
+    )[0]
+
+
+def _cuerpo(event) -> dict:
+    try:
+        body = json.loads(event.get("body") or "{}")
+    except ValueError:
+        body = None
+    if not isinstance(body, dict):
+        raise CambioInvalido("El cuerpo debe ser un objeto JSON")
+    return body
+
+
+def _manejar(event, accion, presupuesto=None):
+    # Autenticación, cuota y mapeo de errores comunes a los tres endpoints
+    try:
+        token = (event.get("headers") or {}).get("Authorization")
+        if not token:
+            return _respuesta(401, {"error": "Token no proporcionado"})
+        try:
+            user = validar_token(token)
+        except TokenInvalido:
+            return _respuesta(403, {"error": "Token inválido"})
+
+        if presupuesto:
+            espera = admitir(user["tenant_id"], presupuesto)
+            if espera:
+                return respuesta_limitada(espera, CORS_HEADERS)
+
+        return accion(user, (event.get("pathParameters") or {}).get("id"))
+
+    except DiagramaNoEncontrado:
+        return _respuesta(404, {"error": "Diagrama no encontrado"})
+    except ConflictoVersion as e:
+        return _respuesta(409, {"error": str(e), "version": e.version_actual})
+    except ErrorRender:
+        return _respuesta(502, {"error": "Error generando imagen del diagrama"})
+    except CambioInvalido as e:
+        # Solo la entrada inválida es 400. Cualquier otro error, incluido un
+        # ValueError al leer un snapshot corrupto, es del servidor y cae en el 500
+        return _respuesta(400, {"error": str(e)})
+    except Exception as e:
+        logger.exception("Fallo interno")
+        return _respuesta(500, {"error": f"Fallo interno: {e}"})
+
+
+def crear_editable(event, _context):
+    def accion(user, _):
+        body = _cuerpo(event)
+        tipo = body.get("tipo")
+        if tipo not in MODELOS:
+            return _respuesta(400, {"error": f"Tipo inválido: {tipo}. Use aws, ER o json"})
+        if not body.get("code"):
+            return _respuesta(400, {"error": "Falta el campo code"})
+
+        cabecera = crear_diagrama(user["tenant_id"], user["user_id"], tipo, body["code"], BUCKET_NAME)
+        return _respuesta(201, {
+            "message":     "Diagrama creado",
+            "diagrama_id": cabecera["diagrama_id"],
+            "version":     1,
+            "diagram_url": _url(user, cabecera["s3_key"])
+        })
+    return _manejar(event, accion, RENDER)
+
+
+def obtener_editable(event, _context):
+    def accion(user, diagrama_id):
+        diagrama = obtener_diagrama(diagrama_id, user["tenant_id"], user["user_id"], BUCKET_NAME)
+        diagrama["diagram_url"] = _url(user, diagrama.pop("s3_key"))
+        return _respuesta(200, diagrama)
+    return _manejar(event, accion)
+
+
+def actualizar_editable(event, _context):
+    # body = {"version": <versión sobre la que se editó, opcional>, "cambios": {...}}
+    def accion(user, diagrama_id):
+        body    = _cuerpo(event)
+        cambios = body.get("cambios")
+        if not isinstance(cambios, dict) or not cambios:
+            return _respuesta(400, {"error": "Falta el objeto cambios"})
+        version = body.get("version")
+        if version is not None:
+            if isinstance(version, bool) or not isinstance(version, (int, str)) or not str(version).isdecimal():
+                return _respuesta(400, {"error": "version debe ser un entero"})
+            version = int(version)
+
+        resultado = actualizar_diagrama(
+            diagrama_id, user["tenant_id"], user["user_id"], cambios, BUCKET_NAME, version
+        )
+        resultado["diagram_url"] = _url(user, resultado.pop("s3_key"))
+        return _respuesta(200, resultado)
+    return _manejar(event, accion, RENDER)
@@ -0,0 +1,39 @@
+import json
+
+from comun.cuotas import RENDER, admitir, respuesta_limitada
+from comun.trabajos import encolar_exportacion
+from comun.validador import TokenInvalido, validar_token
+
+HEADERS = {
+    "Content-Type": "application/json",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET,OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type,Authorization"
+}
+
+
+def _respuesta(status, body):
+    return {"statusCode": status, "body": json.dumps(body), "headers": HEADERS}
+
+
+def exportar_diagramas(event, context):
+    # Encola la exportación de todos los diagramas del usuario; el ZIP se
+    # consulta en /diagrama/jobs/{job_id} (archive_url)
+    token = (event.get("headers") or {}).get("Authorization")
+    if not token:
+        return _respuesta(401, {"error": "Token no proporcionado"})
+    try:
+        user = validar_token(token)
+    except TokenInvalido:
+        return _respuesta(403, {"error": "Token inválido"})
+
+    espera = admitir(user["tenant_id"], RENDER)
+    if espera:
+        return respuesta_limitada(espera, HEADERS)
+
+    job_id = encolar_exportacion(user["tenant_id"], user["user_id"])
+    return _respuesta(202, {
+        "message":    "Exportación en cola",
+        "job_id":     job_id,
+        "status_url": f"/diagrama/jobs/{job_id}"
+    })
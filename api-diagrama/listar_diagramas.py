@@ -1,31 +1,77 @@
 import os
-import boto3
 import json
+import logging
+
+from comun.cuotas import LISTADO, admitir, respuesta_limitada
+from comun.firmador import obtener_firmador, prefijo_usuario
+from comun.indice import CursorInvalido, recientes_usuario
+from comun.validador import TokenInvalido, validar_token
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+BUCKET_NAME  = os.environ["BUCKET_NAME"]
+LIMITE_DEF   = 50
+LIMITE_MAX   = 1000
+
+HEADERS = {
+    "Content-Type": "application/json",
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET,OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type,Authorization"
+}
+
+
+def _respuesta(status, body):
+    return {"statusCode": status, "body": json.dumps(body), "headers": HEADERS}
 
-BUCKET_NAME = os.environ["BUCKET_NAME"]
 
 def listar_diagramas(event, context):
-    s3 = boto3.client("s3")
-    resultados = []
+    try:
+        token = (event.get("headers") or {}).get("Authorization")
+        if not token:
+            return _respuesta(401, {"error": "Token no proporcionado"})
+        try:
+            user = validar_token(token)
+        except TokenInvalido:
+            return _respuesta(403, {"error": "Token inválido"})
 
-    objetos = s3.list_objects_v2(Bucket=BUCKET_NAME).get("Contents", [])
+        espera = admitir(user["tenant_id"], LISTADO)
+        if espera:
+            return respuesta_limitada(espera, HEADERS)
 
-    for obj in objetos:
-        key = obj["Key"]
-        url = s3.generate_presigned_url(
-            "get_object",
-            Params={"Bucket": BUCKET_NAME, "Key": key},
-            ExpiresIn=3600
+        params = event.get("queryStringParameters") or {}
+        try:
+            limit = min(max(int(params.get("limit", LIMITE_DEF)), 1), LIMITE_MAX)
+        except ValueError:
+            return _respuesta(400, {"error": "limit debe ser un entero"})
+
+        # Un Query sobre el índice de metadatos: O(página), no O(bucket)
+        try:
+            items, next_token = recientes_usuario(user["tenant_id"], user["user_id"], limit, params.get("next_token"))
+        except CursorInvalido as e:
+            return _respuesta(400, {"error": str(e)})
+
+        urls = obtener_firmador(BUCKET_NAME).firmar(
+            [item["s3_key"] for item in items], prefijo_usuario(user["tenant_id"], user["user_id"]), expira=3600
         )
-        resultados.append(url)
-
-    return {
-        "statusCode": 200,
-        "body": json.dumps(resultados),
-        "headers": {
-            "Content-Type": "application/json",
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET,OPTIONS",
-            "Access-Control-Allow-Headers": "Content-Type,Authorization"
-        }
-    }
+
+        resultados = [
+            {
+                "key":        item["s3_key"],
+                "url":        url,
+                "tipo":       item["tipo"],
+                "tamanio":    int(item["tamanio"]),
+                "created_at": item["created_at"].split("#", 1)[0]
+            }
+            for item, url in zip(items, urls)
+        ]
+
+        return _respuesta(200, {
+            "diagramas":  resultados,
+            "next_token": next_token
+        })
+
+    except Exception as e:
+        logger.exception("Fallo interno")
+        return _respuesta(500, {"error": f"Fallo interno: {e}"})
@@ -0,0 +1,78 @@
+import json, os, logging
+
+from comun.firmador import obtener_firmador, prefijo_usuario
+from comun.trabajos import COMPLETADO, EXPORTACION, obtener_trabajo, procesar_evento
+from comun.validador import TokenInvalido, validar_token
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+BUCKET_NAME = os.environ["BUCKET_NAME"]
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Headers": "Content-Type,Authorization",
+    "Access-Control-Allow-Methods": "OPTIONS,GET"
+}
+
+
+def procesar_trabajos(event, _context):
+    return procesar_evento(event, BUCKET_NAME)
+
+
+def estado_trabajo(event, _context):
+    try:
+        token = (event.get("headers") or {}).get("Authorization")
+        if not token:
+            return {
+                "statusCode": 401,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"error": "Token no proporcionado"})
+            }
+
+        try:
+            user = validar_token(token)
+        except TokenInvalido:
+            return {
+                "statusCode": 403,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"error": "Token inválido"})
+            }
+
+        job_id  = (event.get("pathParameters") or {}).get("id")
+        trabajo = obtener_trabajo(job_id) if job_id else None
+        # Un trabajo de otro usuario se reporta igual que uno inexistente
+        if not trabajo or (trabajo["tenant_id"], trabajo["user_id"]) != (user["tenant_id"], user["user_id"]):
+            return {
+                "statusCode": 404,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"error": "Trabajo no encontrado"})
+            }
+
+        respuesta = {"job_id": job_id, "estado": trabajo["estado"]}
+        if trabajo["estado"] == COMPLETADO:
+            url = obtener_firmador(BUCKET_NAME).firmar(
+                [trabajo["s3_key"]], prefijo_usuario(trabajo["tenant_id"], trabajo["user_id"]), expira=3600
+            )[0]
+            if trabajo.get("tipo") == EXPORTACION:
+                respuesta["archive_url"] = url
+                respuesta["archivos"]    = int(trabajo["archivos"])
+                respuesta["bytes"]       = int(trabajo["bytes"])
+            else:
+                respuesta["diagram_url"] = url
+        if "error" in trabajo:
+            respuesta["error"] = trabajo["error"]
+
+        return {
+            "statusCode": 200,
+            "headers": CORS_HEADERS,
+            "body": json.dumps(respuesta)
+        }
+
+    except Exception as e:
+        logger.exception("Fallo interno")
+        return {
+            "statusCode": 500,
+            "headers": CORS_HEADERS,
+            "body": json.dumps({"error": f"Fallo interno: {e}"})
+        }
@@ -0,0 +1,117 @@
+import importlib.util
+import json
+import os
+import re
+import threading
+
+from comun import runtime
+
+# Despliegue unificado (serverless-unificado.yml): una sola función atiende
+# las rutas HTTP de /usuario y /diagrama y despacha a los handlers de siempre.
+# Todos comparten el mismo proceso: un juego de clientes de comun.runtime,
+# las mismas cachés en memoria y un único pool de contenedores calientes
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# (método, ruta) -> (archivo del handler, función). Las mismas rutas que los
+# eventos http de serverless.yml; /usuario/onboarding queda aparte (API key)
+RUTAS = {
+    ("POST",  "/usuario/login"):            ("api-usuarios/LoginUsuario.py", "lambda_handler"),
+    ("POST",  "/usuario/signup"):           ("api-usuarios/RegistroUsuario.py", "lambda_handler"),
+    ("POST",  "/usuario/validar"):          ("api-usuarios/ValidarTokenUsuario.py", "lambda_handler"),
+    ("POST",  "/diagrama/aws"):             ("api-diagrama/diagrama-aws.py", "lambda_handler"),
+    ("POST",  "/diagrama/ER"):              ("api-diagrama/diagrama-ER.py", "lambda_handler"),
+    ("POST",  "/diagrama/json"):            ("api-diagrama/diagrama-json.py", "lambda_handler"),
+    ("POST",  "/diagrama/batch"):           ("api-diagrama/diagrama-batch.py", "lambda_handler"),
+    ("GET",   "/diagrama/export"):          ("api-diagrama/exportar_diagramas.py", "exportar_diagramas"),
+    ("GET",   "/diagrama/jobs/{id}"):       ("api-diagrama/trabajos_diagrama.py", "estado_trabajo"),
+    ("POST",  "/diagrama/editable"):        ("api-diagrama/diagrama_editable.py", "crear_editable"),
+    ("GET",   "/diagrama/editable/{id}"):   ("api-diagrama/diagrama_editable.py", "obtener_editable"),
+    ("PATCH", "/diagrama/editable/{id}"):   ("api-diagrama/diagrama_editable.py", "actualizar_editable"),
+    ("GET",   "/diagrama/publico"):         ("api-diagrama/listar_diagramas.py", "listar_diagramas"),
+}
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin":  "*",
+    "Access-Control-Allow-Headers": "Content-Type,Authorization",
+    "Access-Control-Allow-Methods": "OPTIONS,GET,POST,PATCH"
+}
+
+# Con concurrencia provisionada la inicialización corre antes de recibir
+# tráfico: conviene importar todo y crear los clientes ahí
+PRECARGA = (os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") == "provisioned-concurrency"
+            or os.environ.get("ENRUTADOR_PRECARGA", "").lower() in ("true", "1"))
+
+
+def _patron(ruta: str):
+    return re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>[^/]+)", ruta) + "/?$")
+
+
+_rutas   = [(metodo, ruta, _patron(ruta), destino) for (metodo, ruta), destino in RUTAS.items()]
+_modulos = {}   # archivo -> módulo ya importado
+_lock    = threading.Lock()
+
+
+def cargar_modulo(archivo: str):
+    # Los handlers se importan al primer uso de su ruta: un contenedor que solo
+    # atiende /diagrama/publico no paga el import de los renderers
+    modulo = _modulos.get(archivo)
+    if modulo is None:
+        with _lock:
+            modulo = _modulos.get(archivo)
+            if modulo is None:
+                nombre = "handler_" + re.sub(r"\W", "_", archivo[:-3])
+                spec   = importlib.util.spec_from_file_location(nombre, os.path.join(RAIZ, archivo))
+                modulo = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(modulo)
+                _modulos[archivo] = modulo
+    return modulo
+
+
+def precargar():
+    for archivo, _ in set(RUTAS.values()):
+        cargar_modulo(archivo)
+    runtime.s3()
+    runtime.dynamodb()
+
+
+def resolver(metodo: str, path: str):
+    # (ruta, destino, parámetros); destino None si la ruta existe con otro método
+    encontrada = None
+    for metodo_ruta, ruta, patron, destino in _rutas:
+        coincidencia = patron.match(path)
+        if coincidencia:
+            if metodo_ruta == metodo:
+                return ruta, destino, coincidencia.groupdict()
+            encontrada = ruta
+    return encontrada, None, {}
+
+
+def _respuesta(status, body, headers=None):
+    return {"statusCode": status, "headers": {**CORS_HEADERS, **(headers or {})}, "body": json.dumps(body)}
+
+
+def lambda_handler(event, context):
+    # REST API (httpMethod/path) o HTTP API (requestContext.http)
+    http   = (event.get("requestContext") or {}).get("http") or {}
+    metodo = (event.get("httpMethod") or http.get("method") or "").upper()
+    path   = event.get("path") or event.get("rawPath") or ""
+
+    if metodo == "OPTIONS":
+        return _respuesta(200, {"message": "Pre-flight OK"})
+
+    ruta, destino, parametros = resolver(metodo, path)
+    if destino is None:
+        if ruta:
+            permitidos = ",".join(m for m, r in RUTAS if r == ruta)
+            return _respuesta(405, {"error": f"Método no permitido en {ruta}"}, {"Allow": permitidos})
+        return _respuesta(404, {"error": f"Ruta no encontrada: {metodo} {path}"})
+
+    archivo, funcion = destino
+    # El handler recibe el evento como si API Gateway lo hubiera enviado a su
+    # propia función: con la ruta declarada y sus parámetros, no los del proxy
+    evento = {**event, "resource": ruta, "pathParameters": parametros or None}
+    return getattr(cargar_modulo(archivo), funcion)(evento, context)
+
+
+if PRECARGA:
+    precargar()
@@ -1,27 +1,32 @@
-import boto3
-import hashlib
+import os
 import uuid
 import json
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+from comun import runtime
+from comun.contrasenias import hashear, necesita_rehash, verificar
+from comun.metricas import etapa, instrumentado
+from comun.tokens import emitir_token, verificar_modo
 
+# "firmado": token HMAC verificable sin DynamoDB; "opaco": uuid en t_tokens_acceso2
+TOKEN_MODO = os.environ.get("TOKEN_MODO", "opaco")
+verificar_modo(TOKEN_MODO)
+
+@instrumentado('login')
 def lambda_handler(event, context):
     body = json.loads(event['body'])
     tenant_id = body['tenant_id']
     email = body['email']
     password = body['password']
 
-    hashed_password = hash_password(password)
-    dynamodb = boto3.resource('dynamodb')
-    t_usuarios = dynamodb.Table('t_usuarios3')
+    t_usuarios = runtime.tabla('t_usuarios3')
 
-    response = t_usuarios.get_item(Key={
-        'tenant_id': tenant_id,
-        'user_id': email
-    })
+    with etapa('leer_usuario'):
+        response = t_usuarios.get_item(Key={
+            'tenant_id': tenant_id,
+            'user_id': email
+        })
 
     if 'Item' not in response:
         return {
@@ -29,24 +34,45 @@ def lambda_handler(event, context):
             'body': json.dumps({'error': 'Usuario no existe'})
         }
 
-    hashed_password_bd = response['Item']['password']
-    if hashed_password != hashed_password_bd:
+    usuario = response['Item']
+    with etapa('verificar_password'):
+        valida = verificar(password, usuario)
+    if not valida:
         return {
             'statusCode': 403,
             'body': json.dumps({'error': 'Contraseña incorrecta'})
         }
 
-    lima_time = datetime.now(ZoneInfo("America/Lima"))
-    fecha_hora_exp = lima_time + timedelta(hours=1)
-
-    t_tokens = dynamodb.Table('t_tokens_acceso2')
-    token = str(uuid.uuid4())
-    t_tokens.put_item(Item={
-        'token': token,
-        'expires': fecha_hora_exp.strftime('%Y-%m-%d %H:%M:%S'),
-        'tenant_id': tenant_id,
-        'user_id': email
-    })
+    # Hash antiguo (SHA-256) o con otros parámetros: se reemplaza ahora que
+    # tenemos la contraseña en claro
+    if necesita_rehash(usuario):
+        with etapa('rehash'):
+            nuevo = hashear(password)
+            t_usuarios.update_item(
+                Key={'tenant_id': tenant_id, 'user_id': email},
+                UpdateExpression='SET #password = :password, kdf = :kdf',
+                ExpressionAttributeNames={'#password': 'password'},
+                ExpressionAttributeValues={':password': nuevo['password'], ':kdf': nuevo['kdf']}
+            )
+
+    if TOKEN_MODO == 'firmado':
+        with etapa('emitir_token'):
+            token, expira = emitir_token(tenant_id, email, ttl=3600)
+        fecha_hora_exp = datetime.fromtimestamp(expira, ZoneInfo("America/Lima"))
+    else:
+        lima_time = datetime.now(ZoneInfo("America/Lima"))
+        fecha_hora_exp = lima_time + timedelta(hours=1)
+
+        t_tokens = runtime.tabla('t_tokens_acceso2')
+        token = str(uuid.uuid4())
+        # ttl en epoch: DynamoDB borra los tokens vencidos por su cuenta
+        with etapa('emitir_token'):
+            t_tokens.put_item(Item={
+                'token': token,
+                'ttl': int(fecha_hora_exp.timestamp()),
+                'tenant_id': tenant_id,
+                'user_id': email
+            })
 
 
     return {
@@ -0,0 +1,65 @@
+import json
+import logging
+import os
+
+from comun.metricas import etapa, instrumentado, sumar
+from comun.usuarios import IdentificadorInvalido, registrar_usuarios, validar_identificador
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+ONBOARDING_MAX = int(os.environ.get("ONBOARDING_MAX_USUARIOS", "1000"))
+
+@instrumentado('onboarding')
+def lambda_handler(event, context):
+    try:
+        body = json.loads(event['body'])
+
+        tenant_id = body['tenant_id']
+        usuarios = body['usuarios']
+
+        if not isinstance(usuarios, list) or not usuarios:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'Falta la lista usuarios'})
+            }
+        if len(usuarios) > ONBOARDING_MAX:
+            return {
+                'statusCode': 413,
+                'body': json.dumps({'error': f'Máximo {ONBOARDING_MAX} usuarios por llamada'})
+            }
+        if not all(isinstance(u, dict) and u.get('email') and u.get('password') for u in usuarios):
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'Cada usuario necesita email y password'})
+            }
+
+        try:
+            validar_identificador(tenant_id, 'tenant_id')
+            for u in usuarios:
+                validar_identificador(u['email'], 'email')
+        except IdentificadorInvalido as e:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': str(e)})
+            }
+
+        with etapa('registrar'):
+            resultado = registrar_usuarios(tenant_id, usuarios)
+        sumar('usuarios', len(usuarios))
+
+        return {
+            'statusCode': 207 if resultado['fallidos'] else 201,
+            'body': json.dumps({
+                'message': 'Onboarding procesado',
+                'tenant_id': tenant_id,
+                **resultado
+            })
+        }
+
+    except Exception as e:
+        logger.exception("Fallo en onboarding")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({ "error": str(e) })
+        }
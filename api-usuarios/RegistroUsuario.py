@@ -1,10 +1,9 @@
-import boto3
-import hashlib
 import json
 
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+from comun.metricas import etapa, instrumentado
+from comun.usuarios import IdentificadorInvalido, UsuarioExistente, registrar_usuario
 
+@instrumentado('registro')
 def lambda_handler(event, context):
     try:
         body = json.loads(event['body'])
@@ -13,15 +12,15 @@ def lambda_handler(event, context):
         user_id = body['email']
         password = body['password']
 
-        dynamodb = boto3.resource('dynamodb')
-        t_usuarios = dynamodb.Table('t_usuarios3')  
-
-        response = t_usuarios.get_item(Key={
-            'tenant_id': tenant_id,
-            'user_id': user_id
-        })
-
-        if 'Item' in response:
+        try:
+            with etapa('registrar'):
+                registrar_usuario(tenant_id, user_id, password)
+        except IdentificadorInvalido as e:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': str(e)})
+            }
+        except UsuarioExistente:
             return {
                 'statusCode': 409,
                 'body': json.dumps({
@@ -29,14 +28,6 @@ def lambda_handler(event, context):
                 })
             }
 
-        hashed_password = hash_password(password)
-
-        t_usuarios.put_item(Item={
-            'tenant_id': tenant_id,
-            'user_id': user_id,
-            'password': hashed_password,
-        })
-
         return {
             'statusCode': 201,
             'body': json.dumps({
@@ -0,0 +1,62 @@
+"""Overhead por invocación "warm" de construir clientes AWS/HTTP.
+
+Compara el patrón anterior (boto3.client/resource y requests.get dentro de
+lambda_handler) con los clientes compartidos de comun.runtime. No hace
+llamadas de red: mide solo la construcción de clientes y tablas.
+
+    python benchmarks/bench_clientes.py [iteraciones]
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+
+import boto3
+import requests
+
+from comun import runtime
+
+
+def por_invocacion():
+    s3         = boto3.client("s3")
+    dynamodb   = boto3.resource("dynamodb")
+    t_tokens   = dynamodb.Table("t_tokens_acceso2")
+    t_usuarios = dynamodb.Table("t_usuarios3")
+    sesion     = requests.Session()  # equivalente a requests.get(): pool nuevo
+    sesion.close()
+    return s3, t_tokens, t_usuarios
+
+
+def compartido():
+    return runtime.s3(), runtime.tabla("t_tokens_acceso2"), runtime.tabla("t_usuarios3"), runtime.http()
+
+
+def medir(fn, iteraciones):
+    fn()  # la primera llamada es el "cold start" del contenedor
+    tiempos = []
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return {
+        "media_ms": statistics.mean(tiempos),
+        "p50_ms":   tiempos[len(tiempos) // 2],
+        "p99_ms":   tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.99))],
+    }
+
+
+def main():
+    iteraciones = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    for nombre, fn in (("por invocación", por_invocacion), ("comun.runtime", compartido)):
+        r = medir(fn, iteraciones)
+        print(f"{nombre:<16} media={r['media_ms']:8.3f} ms  p50={r['p50_ms']:8.3f} ms  p99={r['p99_ms']:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Latencia y throughput del login según los parámetros de scrypt.
+
+Mide comun.contrasenias.verificar (el costo dominante del login) para varias
+combinaciones de n/r/p: p50/p99 en serie y logins por segundo con varios hilos
+(hashlib.scrypt libera el GIL). Lambda asigna CPU en proporción a la memoria
+(1 vCPU completa a 1769 MB), así que la latencia por tamaño de memoria se
+proyecta escalando la medición local; conviene confirmarla en la función real.
+
+    python benchmarks/bench_contrasenias.py [--slo-ms 250] [--memorias 512,1024,1769]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from comun import contrasenias
+
+MB_POR_VCPU     = 1769
+CONFIGURACIONES = [
+    (2 ** 12, 8, 1),
+    (2 ** 13, 8, 1),
+    (2 ** 14, 8, 1),
+    (2 ** 15, 8, 1),
+    (2 ** 14, 8, 2),
+    (2 ** 16, 8, 1),
+]
+
+
+def medir(n, r, p, iteraciones, hilos):
+    usuario = contrasenias.hashear("contraseña de prueba", n, r, p)
+    contrasenias.verificar("contraseña de prueba", usuario)
+
+    tiempos = []
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        contrasenias.verificar("contraseña de prueba", usuario)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        list(pool.map(lambda _: contrasenias.verificar("contraseña de prueba", usuario), range(iteraciones)))
+    throughput = iteraciones / (time.perf_counter() - inicio)
+
+    return {
+        "p50_ms":     statistics.median(tiempos),
+        "p99_ms":     tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.99))],
+        "logins_seg": throughput,
+        "memoria_mb": 128 * n * r / (1024 * 1024)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iteraciones", type=int, default=50)
+    parser.add_argument("--hilos", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--slo-ms", type=float, default=250)
+    parser.add_argument("--memorias", default="512,1024,1769")
+    args = parser.parse_args()
+
+    memorias = [int(m) for m in args.memorias.split(",")]
+    print(f"{'n':>7} {'r':>2} {'p':>2} {'mem MB':>7} {'p50 ms':>8} {'p99 ms':>8} {'logins/s':>9}  "
+          + "  ".join(f"p99@{m}MB" for m in memorias))
+
+    candidatos = {m: None for m in memorias}
+    # De menor a mayor costo: el último que cumple el SLO es el candidato
+    for n, r, p in sorted(CONFIGURACIONES, key=lambda c: c[0] * c[1] * c[2]):
+        res = medir(n, r, p, args.iteraciones, args.hilos)
+        # Por debajo de 1769 MB la función recibe una fracción de vCPU
+        proyectados = {m: res["p99_ms"] * max(1.0, MB_POR_VCPU / m) for m in memorias}
+        print(f"{n:>7} {r:>2} {p:>2} {res['memoria_mb']:>7.0f} {res['p50_ms']:>8.1f} {res['p99_ms']:>8.1f} "
+              f"{res['logins_seg']:>9.1f}  " + "  ".join(f"{proyectados[m]:>10.1f}" for m in memorias))
+        for m in memorias:
+            if proyectados[m] <= args.slo_ms:
+                candidatos[m] = (n, r, p)
+
+    print(f"\nConfiguración más costosa dentro del SLO de {args.slo_ms:.0f} ms (p99 proyectado):")
+    for m, conf in candidatos.items():
+        texto = f"KDF_N={conf[0]} KDF_R={conf[1]} KDF_P={conf[2]}" if conf else "ninguna"
+        print(f"  {m:>5} MB: {texto}")
+
+
+if __name__ == "__main__":
+    main()
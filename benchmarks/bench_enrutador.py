@@ -0,0 +1,271 @@
+"""Una función por ruta contra el enrutador unificado, con tráfico en ráfagas.
+
+Mide primero los costos reales de este árbol:
+
+- import en frío de cada handler en un intérprete nuevo (como
+  bench_importacion.py) y, para el enrutador, su import base más lo que agrega
+  cada handler la primera vez que se usa su ruta en el contenedor;
+- creación de los clientes de comun.runtime (la paga cada contenedor nuevo);
+- latencia "warm" de cada ruta, ejecutando los handlers a través del
+  enrutador sobre los sustitutos de benchmarks/simulados.py.
+
+Con esos costos reproduce una traza sintética (tráfico de fondo Poisson más
+ráfagas) sobre un modelo del pool de contenedores de Lambda: un contenedor
+atiende una solicitud a la vez, se reutiliza si está libre y se descarta tras
+--inactividad segundos sin uso. Compara una función por ruta, la función
+unificada y la unificada con --provisionadas instancias ya inicializadas.
+Reporta los arranques en frío (contenedores creados), su porcentaje y p50/p95/p99.
+
+    python benchmarks/bench_enrutador.py [--duracion 3600] [--rafagas-por-hora 20]
+        [--tamanio-rafaga 40] [--base-rps 0.5] [--inactividad 600] [--arranque 150]
+        [--provisionadas 2] [--latencia dynamodb=5,s3=15] [--muestras 30] [--semilla 1]
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from bench_handlers import EMAIL, PASSWORD, TENANT, cargar, entrada_json, evento, leer_latencias, percentil, preparar
+from bench_importacion import ENTORNO, RAIZ, importar
+from bench_parser import entrada_er, entrada_grafo
+from simulados import instalar
+
+ENRUTADOR = "api-unificada/enrutador.py"
+
+# ruta -> (método, path, peso en la mezcla de tráfico)
+MEZCLA = {
+    "login":         ("POST", "/usuario/login", 10),
+    "validar-token": ("POST", "/usuario/validar", 15),
+    "diagrama-aws":  ("POST", "/diagrama/aws", 15),
+    "diagrama-ER":   ("POST", "/diagrama/ER", 10),
+    "diagrama-json": ("POST", "/diagrama/json", 20),
+    "listar":        ("GET", "/diagrama/publico", 30),
+}
+
+MEDIR_ENRUTADOR = """
+import importlib.util, json, sys, time
+sys.path.insert(0, {raiz!r})
+inicio = time.perf_counter()
+spec   = importlib.util.spec_from_file_location("enrutador", {enrutador!r})
+enr    = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(enr)
+base   = (time.perf_counter() - inicio) * 1000
+for previo in {previos!r}:
+    enr.cargar_modulo(previo)
+inicio = time.perf_counter()
+enr.cargar_modulo({archivo!r})
+print(json.dumps({{"base": base, "ms": (time.perf_counter() - inicio) * 1000}}))
+"""
+
+MEDIR_CLIENTES = """
+import json, sys, time
+sys.path.insert(0, {raiz!r})
+import botocore.exceptions
+from comun import runtime
+inicio = time.perf_counter()
+runtime.s3()
+runtime.dynamodb()
+print(json.dumps({{"ms": (time.perf_counter() - inicio) * 1000}}))
+"""
+
+
+def _subproceso(codigo: str) -> dict:
+    salida = subprocess.run(
+        [sys.executable, "-c", codigo],
+        capture_output=True, text=True, env={**os.environ, **ENTORNO}, check=True
+    )
+    return json.loads(salida.stdout)
+
+
+def costos_frio(archivos: dict, repeticiones: int) -> dict:
+    # Medianas en ms: import por función, import del enrutador, primer uso de
+    # cada ruta en un contenedor unificado vacío y en uno que ya cargó las demás
+    unicos = sorted(set(archivos.values()))
+    costos = {"funcion": {}, "primero": {}, "despues": {}, "base": [], "clientes": []}
+    for archivo in unicos:
+        otros = [a for a in unicos if a != archivo]
+        por_funcion, primero, despues = [], [], []
+        for _ in range(repeticiones):
+            por_funcion.append(importar(archivo)[0]["ms"])
+            medido = _subproceso(MEDIR_ENRUTADOR.format(
+                raiz=RAIZ, enrutador=os.path.join(RAIZ, ENRUTADOR), previos=[], archivo=archivo))
+            primero.append(medido["ms"])
+            costos["base"].append(medido["base"])
+            despues.append(_subproceso(MEDIR_ENRUTADOR.format(
+                raiz=RAIZ, enrutador=os.path.join(RAIZ, ENRUTADOR), previos=otros, archivo=archivo))["ms"])
+        costos["funcion"][archivo] = statistics.median(por_funcion)
+        costos["primero"][archivo] = statistics.median(primero)
+        costos["despues"][archivo] = statistics.median(despues)
+    for _ in range(repeticiones):
+        costos["clientes"].append(_subproceso(MEDIR_CLIENTES.format(raiz=RAIZ))["ms"])
+    costos["base"]     = statistics.median(costos["base"])
+    costos["clientes"] = statistics.median(costos["clientes"])
+    return costos
+
+
+def latencias_warm(token: str, muestras: int) -> dict:
+    # ruta -> latencias (ms) medidas a través del enrutador, ya caliente
+    enrutador = cargar(ENRUTADOR)
+    cuerpos   = {
+        "login":         lambda i: {"tenant_id": TENANT, "email": EMAIL, "password": PASSWORD},
+        "validar-token": lambda i: {"token": token},
+        "diagrama-aws":  lambda i: {"code": entrada_grafo(20) + f'\nS3 "warm {i}"'},
+        "diagrama-ER":   lambda i: {"code": entrada_er(20) + f"\nW{i} {{ string id }}"},
+        "diagrama-json": lambda i: {"code": entrada_json(20, f"warm{i}")},
+        "listar":        lambda i: None,
+    }
+    resultado = {}
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        for ruta, (metodo, path, _) in MEZCLA.items():
+            tiempos = []
+            for i in range(muestras + 1):
+                ev = evento(cuerpos[ruta](i), token, {"limit": "50"} if ruta == "listar" else None)
+                ev.update({"httpMethod": metodo, "path": path})
+                inicio = time.perf_counter()
+                respuesta = enrutador(ev, None)
+                if respuesta["statusCode"] >= 400:
+                    raise RuntimeError(f"{ruta}: {respuesta['statusCode']} {respuesta['body']}")
+                if i:   # la primera carga el módulo
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+            resultado[ruta] = tiempos
+    return resultado
+
+
+def traza(args, rng: random.Random) -> list:
+    # (instante s, ruta): fondo Poisson más ráfagas de hasta 2 * --tamanio-rafaga
+    # solicitudes repartidas en --duracion-rafaga segundos
+    rutas    = list(MEZCLA)
+    pesos    = [MEZCLA[r][2] for r in rutas]
+    llegadas = []
+    t = 0.0
+    while args.base_rps > 0:
+        t += rng.expovariate(args.base_rps)
+        if t >= args.duracion:
+            break
+        llegadas.append(t)
+    t = 0.0
+    while args.rafagas_por_hora > 0:
+        t += rng.expovariate(args.rafagas_por_hora / 3600)
+        if t >= args.duracion:
+            break
+        for _ in range(rng.randint(1, 2 * args.tamanio_rafaga)):
+            llegadas.append(t + rng.uniform(0, args.duracion_rafaga))
+    llegadas.sort()
+    return [(instante, rng.choices(rutas, pesos)[0]) for instante in llegadas]
+
+
+class _Contenedor:
+    def __init__(self, provisionado: bool = False, cargados=()):
+        self.libre_en     = 0.0
+        self.provisionado = provisionado
+        self.cargados     = set(cargados)   # handlers ya importados
+
+
+def simular(solicitudes: list, pool_de, frio, primer_uso, warm: dict, rng: random.Random,
+            inactividad: float, provisionadas: int = 0, precargados=()) -> dict:
+    # pool_de(ruta): función que la atiende. frio(ruta): ms de un contenedor
+    # nuevo. primer_uso(ruta, contenedor): ms extra si el handler no estaba cargado
+    pools     = {}
+    latencias = []
+    creados   = 0
+    for instante, ruta in solicitudes:
+        nombre = pool_de(ruta)
+        if nombre not in pools:
+            pools[nombre] = [_Contenedor(True, precargados) for _ in range(provisionadas)]
+        pool = pools[nombre]
+        # Los contenedores on-demand sin uso por más de `inactividad` se reciclan
+        pool[:] = [c for c in pool if c.provisionado or instante - c.libre_en < inactividad]
+        libres  = [c for c in pool if c.libre_en <= instante]
+        extra   = 0.0
+        if libres:
+            contenedor = max(libres, key=lambda c: (c.provisionado, c.libre_en))
+        else:
+            contenedor = _Contenedor()
+            pool.append(contenedor)
+            creados += 1
+            extra   += frio(ruta)
+        extra   += primer_uso(ruta, contenedor)
+        latencia = extra + rng.choice(warm[ruta])
+        contenedor.libre_en = instante + latencia / 1000
+        latencias.append(latencia)
+    latencias.sort()
+    return {
+        "solicitudes": len(latencias),
+        "frios":       creados,
+        "p50":         percentil(latencias, 0.50),
+        "p95":         percentil(latencias, 0.95),
+        "p99":         percentil(latencias, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duracion", type=float, default=3600, help="segundos de tráfico simulado")
+    parser.add_argument("--base-rps", type=float, default=0.5)
+    parser.add_argument("--rafagas-por-hora", type=float, default=20)
+    parser.add_argument("--tamanio-rafaga", type=int, default=40)
+    parser.add_argument("--duracion-rafaga", type=float, default=2.0)
+    parser.add_argument("--inactividad", type=float, default=600, help="segundos hasta que Lambda recicla un contenedor")
+    parser.add_argument("--arranque", type=float, default=150, help="ms de arranque del sandbox, antes del import")
+    parser.add_argument("--provisionadas", type=int, default=2)
+    parser.add_argument("--latencia", default="dynamodb=5,s3=15")
+    parser.add_argument("--variacion", type=float, default=0.2)
+    parser.add_argument("--muestras", type=int, default=30)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    rutas    = cargar(ENRUTADOR, "RUTAS")
+    archivos = {ruta: rutas[(metodo, path)][0] for ruta, (metodo, path, _) in MEZCLA.items()}
+
+    print("Midiendo costos de import en frío...")
+    costos = costos_frio(archivos, args.repeticiones)
+    print("Midiendo latencias warm...")
+    servicios = instalar(leer_latencias(args.latencia, args.variacion))
+    warm      = latencias_warm(preparar(servicios, 50), args.muestras)
+
+    print(f"\nenrutador: import {costos['base']:.1f} ms   clientes de runtime: {costos['clientes']:.1f} ms")
+    print(f"{'ruta':<14} {'warm p50':>9} {'función ms':>11} {'1er uso ms':>11} {'después ms':>11}")
+    for ruta, archivo in archivos.items():
+        print(f"{ruta:<14} {statistics.median(warm[ruta]):>9.2f} {costos['funcion'][archivo]:>11.1f} "
+              f"{costos['primero'][archivo]:>11.1f} {costos['despues'][archivo]:>11.1f}")
+
+    def por_funcion_frio(ruta):
+        return args.arranque + costos["funcion"][archivos[ruta]] + costos["clientes"]
+
+    def unificada_frio(_ruta):
+        return args.arranque + costos["base"] + costos["clientes"]
+
+    def unificada_primer_uso(ruta, contenedor):
+        archivo = archivos[ruta]
+        if archivo in contenedor.cargados:
+            return 0.0
+        costo = costos["despues" if contenedor.cargados else "primero"][archivo]
+        contenedor.cargados.add(archivo)
+        return costo
+
+    solicitudes = traza(args, random.Random(args.semilla))
+    todos       = set(archivos.values())
+    escenarios  = [
+        ("una función por ruta", lambda r: r, por_funcion_frio, lambda r, c: 0.0, 0),
+        ("unificada", lambda r: "api", unificada_frio, unificada_primer_uso, 0),
+        (f"unificada + {args.provisionadas} provisionadas", lambda r: "api", unificada_frio,
+         unificada_primer_uso, args.provisionadas),
+    ]
+    print(f"\n{len(solicitudes)} solicitudes en {args.duracion:.0f} s "
+          f"({args.base_rps} rps de fondo, {args.rafagas_por_hora:g} ráfagas/h de hasta {2 * args.tamanio_rafaga})")
+    print(f"{'layout':<32} {'en frío':>8} {'% frío':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for nombre, pool_de, frio, primer_uso, provisionadas in escenarios:
+        res = simular(solicitudes, pool_de, frio, primer_uso, warm, random.Random(args.semilla),
+                      args.inactividad, provisionadas, todos)
+        print(f"{nombre:<32} {res['frios']:>8} {100 * res['frios'] / max(res['solicitudes'], 1):>6.2f}% "
+              f"{res['p50']:>8.2f} {res['p95']:>8.2f} {res['p99']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Costo de prefirmar una página de listar_diagramas.
+
+Compara generate_presigned_url de botocore (una llamada por objeto) con
+comun.firmador.FirmadorS3 (clave de firma en caché, un lote por página). Si
+CDN_CLAVE_PRIVADA tiene una clave RSA en PEM, mide también FirmadorCloudFront:
+la primera página (una firma RSA por prefijo) y las siguientes (sin firmar).
+
+    CDN_CLAVE_PRIVADA="$(openssl genrsa 2048)" python benchmarks/bench_firmador.py [objetos]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+
+from comun import runtime
+from comun.firmador import FirmadorCloudFront, obtener_firmador, prefijo_usuario
+
+BUCKET = "bucket-diagramas"
+
+
+def main():
+    n    = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    keys = [f"tenant/usuario@correo.com/{i:064x}.svg" for i in range(n)]
+    pref = prefijo_usuario("tenant", "usuario@correo.com")
+    s3   = runtime.s3()
+
+    inicio = time.perf_counter()
+    for key in keys:
+        s3.generate_presigned_url("get_object", Params={"Bucket": BUCKET, "Key": key}, ExpiresIn=3600)
+    botocore_s = time.perf_counter() - inicio
+
+    firmador = obtener_firmador(BUCKET)
+    firmador.firmar(keys[:1], pref)
+    inicio = time.perf_counter()
+    firmador.firmar(keys, pref)
+    lote_s = time.perf_counter() - inicio
+
+    print(f"{n} objetos  botocore: {botocore_s * 1000:.1f} ms ({botocore_s * 1e6 / n:.1f} us/url)"
+          f"  firmador: {lote_s * 1000:.1f} ms ({lote_s * 1e6 / n:.1f} us/url)")
+
+    if os.environ.get("CDN_CLAVE_PRIVADA"):
+        cdn    = FirmadorCloudFront("d111111abcdef8.cloudfront.net", "K2BENCH", os.environ["CDN_CLAVE_PRIVADA"])
+        inicio = time.perf_counter()
+        cdn.firmar(keys, pref)
+        primera_s = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        cdn.firmar(keys, pref)
+        siguiente_s = time.perf_counter() - inicio
+        print(f"{n} objetos  cloudfront: primera página {primera_s * 1000:.1f} ms"
+              f"  siguientes {siguiente_s * 1000:.1f} ms ({siguiente_s * 1e6 / n:.1f} us/url)")
+
+
+if __name__ == "__main__":
+    main()
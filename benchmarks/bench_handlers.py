@@ -0,0 +1,295 @@
+"""Latencia, throughput y memoria de los handlers, sin desplegar.
+
+Importa los handlers tal cual (login, registro, validación de token, los tres
+generadores y el listado) y los ejecuta con eventos sintéticos de API Gateway
+sobre los sustitutos de benchmarks/simulados.py, con latencia inyectable por
+servicio. Reporta p50/p95/p99, invocaciones por segundo y memoria por
+invocación (pico y retenida, medidas con tracemalloc en una pasada aparte)
+para cada handler y tamaño de entrada. Con --guardar los resultados quedan
+como línea base; sin él se comparan contra ella y el script termina con
+código 1 si algún handler empeoró más que --tolerancia.
+
+    python benchmarks/bench_handlers.py [--iteraciones 50] [--tamanios 10,100,1000]
+        [--latencia dynamodb=5,s3=15,mermaid_ink=250] [--renderer local|mermaid_ink]
+        [--solo diagrama-json,listar] [--hilos 8] [--frio] [--guardar]
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, RAIZ)
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+os.environ.setdefault("BUCKET_NAME", "bench-diagramas")
+os.environ.setdefault("TABLE_TOKENS", "t_tokens_acceso2")
+os.environ.setdefault("TABLE_USUARIOS", "t_usuarios3")
+# Cuotas activas (se mide su costo) pero lo bastante altas para no rechazar
+os.environ.setdefault("TABLE_CUOTAS", "t_cuotas_tenant")
+for _presupuesto in ("RENDER", "LISTADO"):
+    os.environ.setdefault(f"CUOTA_{_presupuesto}_POR_MINUTO", "10000000")
+    os.environ.setdefault(f"CUOTA_{_presupuesto}_RAFAGA", "10000000")
+
+from bench_parser import entrada_er, entrada_grafo
+from simulados import Latencia, instalar
+
+from comun import cache_render, limites, render, validador
+from comun.cache_render import Publicado
+from comun.contrasenias import hashear
+from comun.indice import registrar_diagrama
+
+BASELINE_DEFECTO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "handlers.json")
+TENANT           = "bench"
+EMAIL            = "bench@ejemplo.com"
+PASSWORD         = "contraseña de prueba"
+# Diferencias por debajo de estos mínimos se consideran ruido
+MINIMO_MS        = 0.5
+MINIMO_KB        = 16
+
+
+def cargar(ruta: str, funcion: str = "lambda_handler"):
+    nombre = os.path.splitext(os.path.basename(ruta))[0].replace("-", "_")
+    spec   = importlib.util.spec_from_file_location(f"bench_{nombre}", os.path.join(RAIZ, ruta))
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return getattr(modulo, funcion)
+
+
+def entrada_json(nodos: int, extra: str = None) -> dict:
+    data = {
+        "nodos":      [{"id": f"n{i}", "etiqueta": f"Servicio {i}"} for i in range(nodos)],
+        "conexiones": [{"origen": f"n{i // 2}", "destino": f"n{i}"} for i in range(1, nodos)]
+    }
+    if extra:
+        data["nodos"].append({"id": extra})
+    return data
+
+
+def evento(body: dict, token: str = None, params: dict = None) -> dict:
+    return {
+        "headers":               {"Authorization": token} if token else {},
+        "body":                  json.dumps(body),
+        "queryStringParameters": params,
+        "requestContext":        {"http": {"method": "GET" if body is None else "POST"}}
+    }
+
+
+def preparar(servicios: dict, max_diagramas: int) -> str:
+    usuarios = servicios["dynamodb"].Table(os.environ["TABLE_USUARIOS"])
+    usuarios._guardar({"tenant_id": TENANT, "user_id": EMAIL, **hashear(PASSWORD)})
+
+    token = str(uuid.uuid4())
+    servicios["dynamodb"].Table(os.environ["TABLE_TOKENS"])._guardar({
+        "token": token, "ttl": int(time.time()) + 24 * 3600, "tenant_id": TENANT, "user_id": EMAIL
+    })
+
+    for i in range(max_diagramas):
+        digest = f"{i:064x}"
+        registrar_diagrama(TENANT, EMAIL, "aws", Publicado(
+            f"{TENANT}/{EMAIL}/{digest}.svg", f"cache/{digest}.svg", digest, 1024, "image/svg+xml", True
+        ))
+    return token
+
+
+def escenarios(token: str, tamanios: list, variar: bool) -> list:
+    # (handler, tamaño, función, fábrica de eventos por iteración)
+    login    = cargar("api-usuarios/LoginUsuario.py")
+    registro = cargar("api-usuarios/RegistroUsuario.py")
+    validar  = cargar("api-usuarios/ValidarTokenUsuario.py")
+    aws      = cargar("api-diagrama/diagrama-aws.py")
+    er       = cargar("api-diagrama/diagrama-ER.py")
+    grafo    = cargar("api-diagrama/diagrama-json.py")
+    listar   = cargar("api-diagrama/listar_diagramas.py", "listar_diagramas")
+
+    def sufijo(i, plantilla):
+        # Con variar, cada iteración es un diagrama distinto (sin aciertos de caché)
+        return plantilla.format(i=i) if variar else ""
+
+    lista = [
+        ("login", None, login,
+         lambda i: evento({"tenant_id": TENANT, "email": EMAIL, "password": PASSWORD})),
+        ("registro", None, registro,
+         lambda i: evento({"tenant_id": TENANT, "email": f"{uuid.uuid4().hex}@ejemplo.com", "password": PASSWORD})),
+        ("validar-token", None, validar,
+         lambda i: evento({"token": token})),
+    ]
+    for n in tamanios:
+        texto_aws = entrada_grafo(n)
+        texto_er  = entrada_er(n)
+        lista += [
+            ("diagrama-aws", n, aws,
+             lambda i, t=texto_aws: evento({"code": t + sufijo(i, '\nS3 "bench {i}"')}, token)),
+            ("diagrama-ER", n, er,
+             lambda i, t=texto_er: evento({"code": t + sufijo(i, "\nB{i} {{ string id }}")}, token)),
+            ("diagrama-json", n, grafo,
+             lambda i, n=n: evento({"code": entrada_json(n, sufijo(i, "bench{i}") or None)}, token)),
+            ("listar", n, listar,
+             lambda i, n=n: evento(None, token, {"limit": str(n)})),
+        ]
+    return lista
+
+
+def limpiar_caches():
+    # Contenedor recién creado, sin contar el costo de importar
+    validador._tokens.clear()
+    cache_render._objetos.clear()
+    cache_render._imagenes.clear()
+    limites._limites.clear()
+
+
+def percentil(ordenados: list, p: float) -> float:
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def medir(handler, fabrica, iteraciones: int, calentamiento: int, hilos: int, frio: bool) -> dict:
+    eventos = [fabrica(i) for i in range(calentamiento + 3 * iteraciones)]
+    errores = 0
+
+    def invocar(ev):
+        nonlocal errores
+        if frio:
+            limpiar_caches()
+        respuesta = handler(ev, None)
+        if not 200 <= respuesta.get("statusCode", 500) < 300:
+            errores += 1
+
+    for ev in eventos[:calentamiento]:
+        invocar(ev)
+    errores = 0
+
+    tiempos = []
+    for ev in eventos[calentamiento:calentamiento + iteraciones]:
+        inicio = time.perf_counter()
+        invocar(ev)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+
+    concurrentes = eventos[calentamiento + iteraciones:calentamiento + 2 * iteraciones]
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        list(pool.map(invocar, concurrentes))
+    throughput = len(concurrentes) / (time.perf_counter() - inicio)
+
+    # tracemalloc multiplica el costo de cada asignación: va en una pasada
+    # aparte para no contaminar las latencias
+    picos, retenidos = [], []
+    tracemalloc.start()
+    for ev in eventos[calentamiento + 2 * iteraciones:]:
+        tracemalloc.reset_peak()
+        antes = tracemalloc.get_traced_memory()[0]
+        invocar(ev)
+        despues, pico = tracemalloc.get_traced_memory()
+        picos.append((pico - antes) / 1024)
+        retenidos.append((despues - antes) / 1024)
+    tracemalloc.stop()
+
+    return {
+        "p50_ms":         round(statistics.median(tiempos), 3),
+        "p95_ms":         round(percentil(tiempos, 0.95), 3),
+        "p99_ms":         round(percentil(tiempos, 0.99), 3),
+        "invocaciones_s": round(throughput, 1),
+        "pico_kb":        round(statistics.median(picos), 1),
+        "retenido_kb":    round(statistics.median(retenidos), 1),
+        "errores":        errores
+    }
+
+
+def comparar(actual: dict, base: dict, tolerancia: float) -> list:
+    regresiones = []
+    for clave, res in actual.items():
+        anterior = base.get(clave)
+        if anterior is None:
+            continue
+        for metrica, minimo in (("p50_ms", MINIMO_MS), ("p95_ms", MINIMO_MS), ("p99_ms", MINIMO_MS),
+                                ("pico_kb", MINIMO_KB)):
+            antes, ahora = anterior[metrica], res[metrica]
+            if ahora > antes * (1 + tolerancia) and ahora - antes > minimo:
+                regresiones.append(f"{clave} {metrica}: {antes} -> {ahora} (+{(ahora / antes - 1) * 100:.0f}%)")
+        if anterior["invocaciones_s"] and res["invocaciones_s"] < anterior["invocaciones_s"] / (1 + tolerancia):
+            regresiones.append(f"{clave} invocaciones_s: {anterior['invocaciones_s']} -> {res['invocaciones_s']}")
+    return regresiones
+
+
+def leer_latencias(texto: str, variacion: float) -> dict:
+    latencias = {}
+    for par in filter(None, texto.split(",")):
+        servicio, ms = par.split("=")
+        latencias[servicio.strip()] = Latencia(float(ms), variacion)
+    return latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iteraciones", type=int, default=50)
+    parser.add_argument("--calentamiento", type=int, default=3)
+    parser.add_argument("--tamanios", default="10,100,1000")
+    parser.add_argument("--latencia", default="", help="servicio=ms separados por coma: dynamodb, s3, lambda, sqs, mermaid_ink")
+    parser.add_argument("--variacion", type=float, default=0.2, help="variación uniforme de la latencia (fracción)")
+    parser.add_argument("--renderer", default="local", choices=sorted(render.RENDERERS))
+    parser.add_argument("--hilos", type=int, default=8)
+    parser.add_argument("--solo", default="", help="handlers a medir, separados por coma")
+    parser.add_argument("--repetir", action="store_true", help="misma entrada en cada iteración (aciertos de caché)")
+    parser.add_argument("--frio", action="store_true", help="vaciar las cachés en memoria antes de cada invocación")
+    parser.add_argument("--baseline", default=BASELINE_DEFECTO)
+    parser.add_argument("--guardar", action="store_true", help="guardar los resultados como línea base")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    args = parser.parse_args()
+
+    tamanios  = [int(t) for t in args.tamanios.split(",")]
+    solo      = set(filter(None, args.solo.split(",")))
+    servicios = instalar(leer_latencias(args.latencia, args.variacion))
+    render.RENDERER_DEFECTO = args.renderer
+    token     = preparar(servicios, max(tamanios))
+
+    configuracion = {k: getattr(args, k) for k in ("iteraciones", "latencia", "renderer", "hilos", "repetir", "frio")}
+    resultados    = {}
+    print(f"{'handler':<14} {'tamaño':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'inv/s':>8} "
+          f"{'pico KB':>9} {'ret. KB':>8} {'errores':>7}")
+    with open(os.devnull, "w") as nulo:
+        for nombre, tamanio, handler, fabrica in escenarios(token, tamanios, not args.repetir):
+            if solo and nombre not in solo:
+                continue
+            # Las líneas EMF de comun.metricas van a stdout: se descartan
+            with contextlib.redirect_stdout(nulo):
+                res = medir(handler, fabrica, args.iteraciones, args.calentamiento, args.hilos, args.frio)
+            clave = f"{nombre}[{tamanio or '-'}]"
+            resultados[clave] = res
+            print(f"{nombre:<14} {tamanio or '-':>6} {res['p50_ms']:>9.2f} {res['p95_ms']:>9.2f} "
+                  f"{res['p99_ms']:>9.2f} {res['invocaciones_s']:>8.1f} {res['pico_kb']:>9.1f} "
+                  f"{res['retenido_kb']:>8.1f} {res['errores']:>7}")
+
+    if args.guardar:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({"configuracion": configuracion, "resultados": resultados}, f, indent=2, sort_keys=True)
+        print(f"\nLínea base guardada en {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nSin línea base en {args.baseline} (usar --guardar)")
+        return
+    with open(args.baseline) as f:
+        base = json.load(f)
+    if base.get("configuracion") != configuracion:
+        print(f"\nLa línea base se midió con otra configuración, no se compara: {base.get('configuracion')}")
+        return
+    regresiones = comparar(resultados, base.get("resultados", {}), args.tolerancia)
+    if regresiones:
+        print(f"\nRegresiones (tolerancia {args.tolerancia:.0%}):")
+        for r in regresiones:
+            print(f"  {r}")
+        sys.exit(1)
+    print(f"\nSin regresiones respecto de {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Tiempo de importación de cada handler, como en un cold start.
+
+Lee los handlers de serverless.yml e importa cada módulo en un intérprete
+nuevo (varias veces, se reporta la mediana), sin llamar al handler. Muestra
+también qué dependencias pesadas quedaron cargadas, los módulos de comun/ que
+necesita (lo que debe incluir su paquete) y los imports más costosos según
+python -X importtime.
+
+    python benchmarks/bench_importacion.py [--repeticiones 5] [--top 5]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+RAIZ     = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+PESADOS  = ("boto3", "botocore", "requests", "urllib3", "s3transfer")
+ENTORNO  = {
+    "BUCKET_NAME":           "bench-diagramas",
+    "TABLE_TOKENS":          "t_tokens_acceso2",
+    "TABLE_USUARIOS":        "t_usuarios3",
+    "AWS_DEFAULT_REGION":    "us-east-1",
+}
+
+IMPORTAR = """
+import importlib.util, json, sys, time
+sys.path.insert(0, {raiz!r})
+print("--handler--", file=sys.stderr, flush=True)
+inicio = time.perf_counter()
+spec   = importlib.util.spec_from_file_location("handler", {ruta!r})
+modulo = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(modulo)
+ms     = (time.perf_counter() - inicio) * 1000
+print(json.dumps({{
+    "ms":      ms,
+    "pesados": sorted({{m.split(".")[0] for m in sys.modules}} & set({pesados!r})),
+    "comun":   sorted(m for m in sys.modules if m.startswith("comun."))
+}}))
+"""
+
+
+def handlers_serverless() -> dict:
+    # ruta del módulo -> funciones de serverless.yml que lo usan
+    with open(os.path.join(RAIZ, "serverless.yml")) as f:
+        texto = f.read()
+    modulos = {}
+    for funcion, handler in re.findall(r"^  (\w+):\n    handler: (\S+)", texto, re.MULTILINE):
+        ruta = handler.rsplit(".", 1)[0] + ".py"
+        modulos.setdefault(ruta, []).append(funcion)
+    return modulos
+
+
+def importar(ruta: str, importtime: bool = False):
+    codigo = IMPORTAR.format(raiz=RAIZ, ruta=os.path.join(RAIZ, ruta), pesados=PESADOS)
+    flags  = ["-X", "importtime"] if importtime else []
+    salida = subprocess.run(
+        [sys.executable, *flags, "-c", codigo],
+        capture_output=True, text=True, env={**os.environ, **ENTORNO}, check=True
+    )
+    return json.loads(salida.stdout), salida.stderr
+
+
+def mas_costosos(importtime: str, top: int) -> list:
+    # Solo los imports de primer nivel (sin sangría): su tiempo acumulado
+    # incluye todo lo que arrastran
+    costos = []
+    # Lo anterior a la marca es el arranque del intérprete
+    for linea in importtime.split("--handler--", 1)[-1].splitlines():
+        partes = linea.split("|")
+        if len(partes) != 3 or not partes[0].startswith("import time:") or partes[2].startswith("  "):
+            continue
+        try:
+            costos.append((int(partes[1]) / 1000, partes[2].strip()))
+        except ValueError:
+            continue
+    return sorted(costos, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'módulo':<40} {'mediana ms':>10} {'máx ms':>8}  dependencias pesadas")
+    detalles = []
+    for ruta, funciones in handlers_serverless().items():
+        tiempos = []
+        for _ in range(args.repeticiones):
+            datos, _ = importar(ruta)
+            tiempos.append(datos["ms"])
+        _, importtime = importar(ruta, importtime=True)
+        print(f"{ruta:<40} {statistics.median(tiempos):>10.1f} {max(tiempos):>8.1f}  "
+              f"{', '.join(datos['pesados']) or '-'}")
+        detalles.append((ruta, funciones, datos["comun"], mas_costosos(importtime, args.top)))
+
+    for ruta, funciones, comun, costosos in detalles:
+        print(f"\n{ruta} ({', '.join(funciones)})")
+        print(f"  comun: {', '.join(m.split('.', 1)[1] for m in comun)}")
+        for ms, modulo in costosos:
+            print(f"  {ms:>8.1f} ms  {modulo}")
+
+
+if __name__ == "__main__":
+    main()
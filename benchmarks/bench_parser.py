@@ -0,0 +1,152 @@
+"""Escalado de pseudocodigo_a_mermaid con el tamaño de la entrada.
+
+Compara la implementación anterior (copiada abajo tal cual estaba en
+diagrama-aws.py / diagrama-ER.py) con comun.parser en entradas de 1k a 10k
+líneas, para diagramas de recursos y ER, y verifica que el Mermaid de grafos
+sea idéntico. Un costo por línea constante indica escalado lineal; las dos
+versiones rinden parecido, las diferencias están dentro del ruido.
+
+    python benchmarks/bench_parser.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from comun.parser import pseudocodigo_a_mermaid
+
+TAMANIOS = (1_000, 2_000, 5_000, 10_000)
+
+
+def pseudocodigo_a_mermaid_anterior(pseudocodigo: str) -> str:
+    lines = pseudocodigo.strip().split("\n")
+    if not lines:
+        raise ValueError("Pseudocódigo vacío")
+
+    header = lines[0].lower()
+    if header.startswith("erdiagrama"):
+        tipo = "erDiagram"
+        lines = lines[1:]
+    elif header.startswith("diagrama"):
+        tipo = "graph TD"
+        lines = lines[1:]
+    else:
+        tipo = "graph TD"
+
+    if tipo == "erDiagram":
+        entidades  = {}
+        relaciones = []
+
+        for raw in lines:
+            line = raw.strip()
+            if not line:
+                continue
+
+            if "{" in line and "}" in line:
+                entidad, bloque   = line.split("{", 1)
+                entidad           = entidad.strip()
+                atributos_raw     = bloque.rstrip("}").strip()
+                atributos         = atributos_raw.split("string")
+                entidades[entidad] = [
+                    "string " + a.strip()
+                    for a in atributos
+                    if a.strip()
+                ]
+
+            elif any(sym in line for sym in ["||--", "}o--", "o{", "}o--o{"]):
+                relaciones.append(line)
+
+            else:
+                raise ValueError(f"Línea ER inválida: “{line}”")
+
+        mermaid = "erDiagram\n"
+        for entidad, attrs in entidades.items():
+            mermaid += f"    {entidad} {{\n"
+            for attr in attrs:
+                mermaid += f"        {attr}\n"
+            mermaid += "    }\n"
+        for rel in relaciones:
+            mermaid += f"    {rel}\n"
+        return mermaid
+
+    recursos   = set()
+    conexiones = []
+
+    for raw in lines:
+        line = raw.strip()
+        if not line:
+            continue
+
+        if "conectado a" in line:
+            try:
+                origen_txt, destino_txt = line.split("conectado a")
+                _, origen_nombre  = origen_txt.strip().split(" ", 1)
+                _, destino_nombre = destino_txt.strip().split(" ", 1)
+                origen  = origen_nombre.strip(' "\'')
+                destino = destino_nombre.strip(' "\'')
+                conexiones.append((origen, destino))
+                recursos.update([origen, destino])
+            except ValueError as e:
+                raise ValueError(f"Línea inválida: “{line}” → {e}")
+        else:
+            try:
+                _, nombre = line.split(" ", 1)
+                recursos.add(nombre.strip(' "\''))
+            except ValueError as e:
+                raise ValueError(f"Línea inválida: “{line}” → {e}")
+
+    mermaid = "graph TD\n"
+    for r in sorted(recursos):
+        mermaid += f'    {r.replace(" ", "_")}[\"{r}\"]\n'
+    for orig, dest in conexiones:
+        mermaid += f'    {orig.replace(" ", "_")} --> {dest.replace(" ", "_")}\n'
+    return mermaid
+
+
+def entrada_grafo(lineas: int) -> str:
+    partes = ["diagrama"]
+    for i in range(lineas):
+        if i % 2:
+            partes.append(f'EC2 "web {i}" conectado a RDS "db {i // 7}"')
+        else:
+            partes.append(f'S3 "bucket {i}"')
+    return "\n".join(partes)
+
+
+def entrada_er(lineas: int) -> str:
+    partes = ["erdiagrama"]
+    for i in range(lineas):
+        if i % 2:
+            partes.append(f"E{i} ||--o{{ E{i - 1} : tiene")
+        else:
+            partes.append(f"E{i} {{ string id string nombre string email }}")
+    return "\n".join(partes)
+
+
+def medir(fn, texto, repeticiones=5):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn(texto)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    print(f"{'entrada':<8} {'líneas':>7} {'anterior ms':>12} {'us/línea':>9} {'nuevo ms':>9} {'us/línea':>9}")
+    for nombre, generar in (("grafo", entrada_grafo), ("ER", entrada_er)):
+        for n in TAMANIOS:
+            texto = generar(n)
+            if nombre == "grafo":
+                assert pseudocodigo_a_mermaid(texto) == pseudocodigo_a_mermaid_anterior(texto)
+            antes = medir(pseudocodigo_a_mermaid_anterior, texto)
+            ahora = medir(pseudocodigo_a_mermaid, texto)
+            print(
+                f"{nombre:<8} {n:>7} {antes * 1000:>12.2f} {antes * 1e6 / n:>9.2f}"
+                f" {ahora * 1000:>9.2f} {ahora * 1e6 / n:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
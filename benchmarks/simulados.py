@@ -0,0 +1,431 @@
+"""Sustitutos en proceso de DynamoDB, S3, Lambda, SQS y mermaid.ink.
+
+Implementan solo las operaciones que usan los handlers y comun/, con una
+latencia inyectable por servicio (time.sleep libera el GIL, así que las
+mediciones con varios hilos se comportan como esperas de red). instalar()
+los registra en comun.runtime en lugar de los clientes reales.
+"""
+import io
+import random
+import struct
+import threading
+import time
+import types
+import uuid
+import zlib
+from datetime import datetime, timezone
+
+from boto3.dynamodb.conditions import ConditionBase
+from botocore.exceptions import ClientError
+
+from comun import runtime
+
+CLAVES_TABLAS = {
+    "t_usuarios3":           ("tenant_id", "user_id"),
+    "t_tokens_acceso2":      ("token",),
+    "t_tokens_revocados":    ("jti",),
+    "t_diagramas":           ("tenant_id", "created_at"),
+    "t_limites_tenant":      ("tenant_id",),
+    "t_trabajos_diagrama":   ("job_id",),
+    "t_diagramas_editables": ("diagrama_id", "version"),
+    "t_cuotas_tenant":       ("clave",),
+}
+
+# índice -> (clave de partición, clave de orden)
+CLAVES_INDICES = {
+    "usuario-fecha-index": ("tenant_user", "created_at"),
+}
+
+
+class Latencia:
+    def __init__(self, ms: float = 0.0, variacion: float = 0.0):
+        self.ms        = ms
+        self.variacion = variacion   # fracción de ms, uniforme en ±variacion
+
+    def esperar(self):
+        if self.ms > 0:
+            time.sleep(max(0.0, self.ms * (1 + random.uniform(-self.variacion, self.variacion))) / 1000)
+
+
+def _error(codigo: str, operacion: str):
+    return ClientError({"Error": {"Code": codigo, "Message": codigo}}, operacion)
+
+
+def _cumple(condicion: ConditionBase, item: dict) -> bool:
+    expresion = condicion.get_expression()
+    operador  = expresion["operator"]
+    valores   = expresion["values"]
+    if operador == "AND":
+        return all(_cumple(c, item) for c in valores)
+    if operador == "OR":
+        return any(_cumple(c, item) for c in valores)
+    if operador == "NOT":
+        return not _cumple(valores[0], item)
+
+    actual = item.get(valores[0].name)
+    if operador == "attribute_not_exists":
+        return valores[0].name not in item
+    if operador == "attribute_exists":
+        return valores[0].name in item
+    if actual is None:
+        return False
+    if operador == "begins_with":
+        return str(actual).startswith(valores[1])
+    if operador == "BETWEEN":
+        return valores[1] <= actual <= valores[2]
+    comparar = {
+        "=":  lambda a, b: a == b,
+        "<>": lambda a, b: a != b,
+        "<":  lambda a, b: a < b,
+        "<=": lambda a, b: a <= b,
+        ">":  lambda a, b: a > b,
+        ">=": lambda a, b: a >= b,
+    }
+    return comparar[operador](actual, valores[1])
+
+
+class _LoteEscritura:
+    def __init__(self, tabla):
+        self.tabla = tabla
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.tabla.latencia.esperar()
+
+    def put_item(self, Item):
+        self.tabla._guardar(Item)
+
+    def delete_item(self, Key):
+        with self.tabla._lock:
+            self.tabla.items.pop(self.tabla._clave(Key), None)
+
+
+class TablaSimulada:
+    def __init__(self, nombre: str, latencia: Latencia):
+        self.nombre   = nombre
+        self.claves   = CLAVES_TABLAS.get(nombre, ("id",))
+        self.latencia = latencia
+        self.items    = {}
+        self._lock    = threading.Lock()
+
+    def _clave(self, item: dict) -> tuple:
+        return tuple(item[k] for k in self.claves)
+
+    def _guardar(self, item: dict):
+        with self._lock:
+            self.items[self._clave(item)] = dict(item)
+
+    def get_item(self, Key, **_):
+        self.latencia.esperar()
+        item = self.items.get(self._clave(Key))
+        return {"Item": dict(item)} if item is not None else {}
+
+    def put_item(self, Item, ConditionExpression=None, **_):
+        self.latencia.esperar()
+        with self._lock:
+            clave = self._clave(Item)
+            if ConditionExpression is not None:
+                # Solo la forma que usa el repo: attribute_not_exists(<clave>)
+                if isinstance(ConditionExpression, ConditionBase):
+                    cumple = _cumple(ConditionExpression, self.items.get(clave, {}))
+                else:
+                    cumple = "attribute_not_exists" not in ConditionExpression or clave not in self.items
+                if not cumple:
+                    raise _error("ConditionalCheckFailedException", "PutItem")
+            self.items[clave] = dict(Item)
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues=None,
+                    ExpressionAttributeNames=None, ConditionExpression=None,
+                    ReturnValuesOnConditionCheckFailure=None, **_):
+        # Solo "SET a = :a, #b = :b, c = c + :c" y condiciones de boto3
+        self.latencia.esperar()
+        nombres = ExpressionAttributeNames or {}
+        valores = ExpressionAttributeValues or {}
+        with self._lock:
+            clave  = self._clave(Key)
+            actual = self.items.get(clave)
+            if ConditionExpression is not None and not _cumple(ConditionExpression, actual or {}):
+                error = _error("ConditionalCheckFailedException", "UpdateItem")
+                if ReturnValuesOnConditionCheckFailure == "ALL_OLD" and actual is not None:
+                    error.response["Item"] = dict(actual)
+                raise error
+            item = dict(actual or Key)
+            for asignacion in UpdateExpression.strip()[len("SET"):].split(","):
+                atributo, valor = (p.strip() for p in asignacion.split("=", 1))
+                terminos = [t.strip() for t in valor.split("+")]
+                item[nombres.get(atributo, atributo)] = sum(
+                    valores[t] if t.startswith(":") else item[nombres.get(t, t)] for t in terminos
+                ) if len(terminos) > 1 else valores[terminos[0]]
+            self.items[clave] = item
+        return {}
+
+    def query(self, KeyConditionExpression, IndexName=None, Limit=None, ScanIndexForward=True,
+              ExclusiveStartKey=None, **_):
+        self.latencia.esperar()
+        orden = CLAVES_INDICES[IndexName][1] if IndexName else self.claves[-1]
+        items = sorted(
+            (i for i in list(self.items.values()) if _cumple(KeyConditionExpression, i)),
+            key=lambda i: i.get(orden, ""), reverse=not ScanIndexForward
+        )
+        inicio = 0
+        if ExclusiveStartKey:
+            ultimo = self._clave(ExclusiveStartKey)
+            inicio = next((n + 1 for n, i in enumerate(items) if self._clave(i) == ultimo), len(items))
+        fin       = len(items) if Limit is None else inicio + Limit
+        respuesta = {"Items": [dict(i) for i in items[inicio:fin]]}
+        if fin < len(items):
+            ultimo = items[fin - 1]
+            # Como DynamoDB: claves de la tabla más las del índice consultado
+            indice = CLAVES_INDICES[IndexName] if IndexName else ()
+            respuesta["LastEvaluatedKey"] = {k: ultimo[k] for k in {*self.claves, *indice} if k in ultimo}
+        return respuesta
+
+    def scan(self, FilterExpression=None, **_):
+        self.latencia.esperar()
+        items = list(self.items.values())
+        if FilterExpression is not None:
+            items = [i for i in items if _cumple(FilterExpression, i)]
+        return {"Items": [dict(i) for i in items]}
+
+    def batch_writer(self, **_):
+        return _LoteEscritura(self)
+
+
+class _ClienteDynamoSimulado:
+    # Lo que se usa de resource.meta.client: TransactWriteItems con puts
+    # condicionales attribute_not_exists, en formato tipado
+    def __init__(self, dynamo):
+        self.dynamo = dynamo
+
+    def transact_write_items(self, TransactItems):
+        from boto3.dynamodb.types import TypeDeserializer
+        deserializador = TypeDeserializer()
+        self.dynamo.latencia.esperar()
+        puts = [
+            (self.dynamo.Table(op["Put"]["TableName"]),
+             {k: deserializador.deserialize(v) for k, v in op["Put"]["Item"].items()},
+             op["Put"].get("ConditionExpression"))
+            for op in TransactItems
+        ]
+        with self.dynamo._lock:
+            razones = [
+                "ConditionalCheckFailed" if condicion and tabla._clave(item) in tabla.items else "None"
+                for tabla, item, condicion in puts
+            ]
+            if "ConditionalCheckFailed" in razones:
+                error = _error("TransactionCanceledException", "TransactWriteItems")
+                error.response["CancellationReasons"] = [{"Code": r} for r in razones]
+                raise error
+            for tabla, item, _ in puts:
+                tabla._guardar(item)
+        return {}
+
+
+class DynamoSimulado:
+    def __init__(self, latencia: Latencia):
+        self.latencia = latencia
+        self.tablas   = {}
+        self._lock    = threading.Lock()
+        self.meta     = types.SimpleNamespace(client=_ClienteDynamoSimulado(self))
+
+    def Table(self, nombre: str) -> TablaSimulada:
+        with self._lock:
+            if nombre not in self.tablas:
+                self.tablas[nombre] = TablaSimulada(nombre, self.latencia)
+            return self.tablas[nombre]
+
+    def batch_get_item(self, RequestItems):
+        self.latencia.esperar()
+        return {
+            "Responses": {
+                nombre: [dict(i) for i in (self.Table(nombre).items.get(self.Table(nombre)._clave(k))
+                                           for k in pedido["Keys"]) if i is not None]
+                for nombre, pedido in RequestItems.items()
+            },
+            "UnprocessedKeys": {}
+        }
+
+    def batch_write_item(self, RequestItems):
+        self.latencia.esperar()
+        for nombre, pedidos in RequestItems.items():
+            for pedido in pedidos:
+                self.Table(nombre)._guardar(pedido["PutRequest"]["Item"])
+        return {"UnprocessedItems": {}}
+
+
+class S3Simulado:
+    def __init__(self, latencia: Latencia, region: str = "us-east-1"):
+        self.latencia = latencia
+        self.objetos  = {}
+        self.subidas  = {}   # UploadId -> {PartNumber: bytes}
+        self.meta     = types.SimpleNamespace(region_name=region, endpoint_url="https://s3.amazonaws.com")
+
+    def head_object(self, Bucket, Key, **_):
+        self.latencia.esperar()
+        if Key not in self.objetos:
+            raise _error("404", "HeadObject")
+        return {"ContentLength": len(self.objetos[Key])}
+
+    def get_object(self, Bucket, Key, **_):
+        self.latencia.esperar()
+        if Key not in self.objetos:
+            raise _error("NoSuchKey", "GetObject")
+        return {"Body": io.BytesIO(self.objetos[Key]), "ContentLength": len(self.objetos[Key])}
+
+    def put_object(self, Bucket, Key, Body, **_):
+        self.latencia.esperar()
+        self.objetos[Key] = Body if isinstance(Body, bytes) else Body.read()
+        return {}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Config=None):
+        self.latencia.esperar()
+        partes = []
+        while True:
+            parte = Fileobj.read(1024 * 1024)
+            if not parte:
+                break
+            partes.append(parte)
+        self.objetos[Key] = b"".join(partes)
+
+    def copy_object(self, Bucket, Key, CopySource, **_):
+        self.latencia.esperar()
+        if CopySource["Key"] not in self.objetos:
+            raise _error("NoSuchKey", "CopyObject")
+        self.objetos[Key] = self.objetos[CopySource["Key"]]
+        return {}
+
+    def get_paginator(self, operacion):
+        assert operacion == "list_objects_v2"
+        return _PaginadorListado(self)
+
+    def create_multipart_upload(self, Bucket, Key, **_):
+        self.latencia.esperar()
+        upload_id = str(uuid.uuid4())
+        self.subidas[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.latencia.esperar()
+        self.subidas[UploadId][PartNumber] = Body
+        return {"ETag": f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.latencia.esperar()
+        partes = self.subidas.pop(UploadId)
+        self.objetos[Key] = b"".join(partes[p["PartNumber"]] for p in MultipartUpload["Parts"])
+        return {}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.subidas.pop(UploadId, None)
+        return {}
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn=3600):
+        # Local, igual que en botocore: sin latencia
+        return f"https://{Params['Bucket']}.s3.amazonaws.com/{Params['Key']}?X-Amz-Expires={ExpiresIn}"
+
+
+class _PaginadorListado:
+    def __init__(self, s3: S3Simulado):
+        self.s3 = s3
+
+    def paginate(self, Bucket, Prefix="", PageSize=1000):
+        keys  = sorted(k for k in self.s3.objetos if k.startswith(Prefix))
+        ahora = datetime.now(timezone.utc)
+        for i in range(0, len(keys), PageSize):
+            self.s3.latencia.esperar()
+            yield {"Contents": [
+                {"Key": k, "Size": len(self.s3.objetos[k]), "LastModified": ahora} for k in keys[i:i + PageSize]
+            ]}
+
+
+class LambdaSimulado:
+    def __init__(self, latencia: Latencia):
+        self.latencia     = latencia
+        self.invocaciones = []
+
+    def invoke(self, FunctionName, Payload=b"{}", InvocationType="RequestResponse", **_):
+        self.latencia.esperar()
+        self.invocaciones.append(FunctionName)
+        asincrona = InvocationType == "Event"
+        return {"StatusCode": 202 if asincrona else 200, "Payload": io.BytesIO(b"" if asincrona else b"{}")}
+
+
+class SQSSimulado:
+    def __init__(self, latencia: Latencia):
+        self.latencia = latencia
+        self.mensajes = []
+
+    def send_message(self, QueueUrl, MessageBody, **_):
+        self.latencia.esperar()
+        self.mensajes.append(MessageBody)
+        return {"MessageId": str(len(self.mensajes))}
+
+
+def png_sintetico(semilla: bytes, tamanio: int) -> bytes:
+    # PNG válido de 1x1 con un chunk de relleno para llegar al tamaño pedido
+    def chunk(tipo: bytes, datos: bytes) -> bytes:
+        return struct.pack(">I", len(datos)) + tipo + datos + struct.pack(">I", zlib.crc32(tipo + datos))
+
+    relleno = (semilla * (tamanio // max(len(semilla), 1) + 1))[:max(tamanio - 67, 0)]
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 0, 0, 0, 0))
+            + chunk(b"tEXt", relleno)
+            + chunk(b"IDAT", zlib.compress(b"\x00\x00"))
+            + chunk(b"IEND", b""))
+
+
+class _CuerpoSimulado(io.BytesIO):
+    decode_content = True
+
+    def drain_conn(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
+class _RespuestaSimulada:
+    def __init__(self, contenido: bytes):
+        self.status_code = 200
+        self.content     = contenido
+        self.raw         = _CuerpoSimulado(contenido)
+
+    def close(self):
+        pass
+
+
+class MermaidInkSimulado:
+    # Sesión HTTP con la interfaz de runtime.http() que responde como
+    # mermaid.ink: una imagen de bytes_por_caracter bytes por carácter del código
+    def __init__(self, latencia: Latencia, bytes_por_caracter: int = 8):
+        self.latencia           = latencia
+        self.bytes_por_caracter = bytes_por_caracter
+
+    def get(self, url, timeout=None, stream=False, **_):
+        self.latencia.esperar()
+        codificado = url.rsplit("/", 1)[-1].encode()
+        return _RespuestaSimulada(png_sintetico(codificado[:64], len(codificado) * self.bytes_por_caracter))
+
+
+def instalar(latencias: dict = None) -> dict:
+    """Reemplaza los clientes de comun.runtime por los simulados.
+
+    latencias: servicio ("dynamodb", "s3", "lambda", "sqs", "mermaid_ink") -> Latencia
+    """
+    latencias = latencias or {}
+    servicios = {
+        "dynamodb": DynamoSimulado(latencias.get("dynamodb", Latencia())),
+        "s3":       S3Simulado(latencias.get("s3", Latencia())),
+        "lambda":   LambdaSimulado(latencias.get("lambda", Latencia())),
+        "sqs":      SQSSimulado(latencias.get("sqs", Latencia())),
+        "http":     MermaidInkSimulado(latencias.get("mermaid_ink", Latencia())),
+    }
+    with runtime._lock:
+        # Las tablas ya resueltas apuntarían al DynamoDB anterior
+        for nombre in [n for n in runtime._clientes if n.startswith("tabla:")]:
+            del runtime._clientes[nombre]
+        runtime._clientes.update(servicios)
+    return servicios
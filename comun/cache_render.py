@@ -0,0 +1,189 @@
+import hashlib
+import os
+from dataclasses import dataclass
+
+from botocore.exceptions import ClientError
+
+from comun import runtime
+from comun.lru import CacheLRU
+from comun.metricas import etapa, propiedad
+
+CACHE_PREFIX     = "cache/"
+CACHE_MAX_ITEMS  = int(os.environ.get("RENDER_CACHE_ITEMS", "1024"))
+IMAGEN_MAX_BYTES = int(os.environ.get("INLINE_MAX_BYTES", str(256 * 1024)))
+IMAGENES_ITEMS   = int(os.environ.get("RENDER_CACHE_IMAGENES", "64"))
+
+# Cache-Control que CloudFront y los navegadores respetan: el contenido bajo
+# una clave <sha256>.<ext> nunca cambia; el de un editable, en cada versión
+CACHE_INMUTABLE  = "public, max-age=31536000, immutable"
+CACHE_EDITABLE   = "no-cache"
+
+# Sobreviven entre invocaciones "warm" del mismo contenedor: tamaño de los
+# objetos ya publicados y bytes de las imágenes chicas (para respuestas inline)
+_objetos  = CacheLRU(CACHE_MAX_ITEMS)
+_imagenes = CacheLRU(IMAGENES_ITEMS)
+
+
+class _LectorContado:
+    # Cuenta lo que pasa hacia S3 y conserva una copia solo si la imagen es chica
+    def __init__(self, origen, max_copia: int):
+        self.origen  = origen
+        self.tamanio = 0
+        self._copia  = bytearray()
+        self._max    = max_copia
+
+    def read(self, n=-1):
+        datos = self.origen.read(n)
+        self.tamanio += len(datos)
+        if self._copia is not None:
+            if self.tamanio <= self._max:
+                self._copia += datos
+            else:
+                self._copia = None
+        return datos
+
+    @property
+    def contenido(self):
+        return bytes(self._copia) if self._copia is not None else None
+
+
+def normalizar_mermaid(mermaid_code: str) -> str:
+    lineas = (l.strip() for l in mermaid_code.splitlines())
+    return "\n".join(l for l in lineas if l) + "\n"
+
+
+def hash_mermaid(mermaid_code: str) -> str:
+    return hashlib.sha256(normalizar_mermaid(mermaid_code).encode()).hexdigest()
+
+
+def clave_cache(digest: str, extension: str) -> str:
+    return f"{CACHE_PREFIX}{digest}.{extension}"
+
+
+def clave_usuario(tenant_id: str, user_id: str, digest: str, extension: str) -> str:
+    return f"{tenant_id}/{user_id}/{digest}.{extension}"
+
+
+def _tamanio(s3, bucket: str, key: str):
+    # Tamaño del objeto, o None si no existe
+    try:
+        with etapa("s3_head"):
+            return s3.head_object(Bucket=bucket, Key=key)["ContentLength"]
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+
+
+def _subir_render(renderer, normalizado, s3, bucket, cache_key) -> int:
+    # El render va directo a S3 (multipart por encima del umbral de
+    # runtime.config_transferencia()) sin armar la imagen completa en memoria
+    stream = renderer.abrir(normalizado)
+    try:
+        lector = _LectorContado(stream, IMAGEN_MAX_BYTES)
+        s3.upload_fileobj(
+            lector, bucket, cache_key,
+            ExtraArgs = {"ContentType": renderer.content_type, "CacheControl": CACHE_INMUTABLE},
+            Config    = runtime.config_transferencia()
+        )
+    finally:
+        stream.close()
+    if lector.contenido is not None:
+        _imagenes.put(cache_key, lector.contenido)
+    return lector.tamanio
+
+
+def leer_imagen(publicado, s3, bucket: str) -> bytes:
+    imagen = _imagenes.get(publicado.cache_key)
+    if imagen is None:
+        imagen = s3.get_object(Bucket=bucket, Key=publicado.cache_key)["Body"].read()
+        if len(imagen) <= IMAGEN_MAX_BYTES:
+            _imagenes.put(publicado.cache_key, imagen)
+    return imagen
+
+
+def _asegurar_cache(renderer, normalizado, s3, bucket, cache_key) -> int:
+    # Renderiza solo si cache/<sha256>.<ext> no existe; devuelve su tamaño
+    tamanio = _objetos.get(cache_key)
+    if tamanio is not None:
+        propiedad("cache", "memoria")
+        return tamanio
+    tamanio = _tamanio(s3, bucket, cache_key)
+    if tamanio is not None:
+        propiedad("cache", "s3")
+    else:
+        propiedad("cache", "render")
+        # Render y subida van juntos: la imagen se sube mientras se descarga
+        with etapa("render_subida"):
+            tamanio = _subir_render(renderer, normalizado, s3, bucket, cache_key)
+    _objetos.put(cache_key, tamanio)
+    return tamanio
+
+
+@dataclass
+class Publicado:
+    s3_key:       str
+    cache_key:    str
+    digest:       str
+    tamanio:      int
+    content_type: str
+    nuevo:        bool   # False si el usuario ya tenía este mismo diagrama
+
+
+def renderizar_y_publicar(mermaid_code, tenant_id, user_id, s3, bucket, renderer) -> Publicado:
+    # Solo se llama al renderer si el contenido no está ni en memoria ni bajo
+    # cache/<sha256>.<ext>. Las entradas del LRU guardan el tamaño del objeto
+    normalizado = normalizar_mermaid(mermaid_code)
+    digest      = hashlib.sha256(normalizado.encode()).hexdigest()
+    cache_key   = clave_cache(digest, renderer.extension)
+    s3_key      = clave_usuario(tenant_id, user_id, digest, renderer.extension)
+
+    def publicado(tamanio, nuevo):
+        return Publicado(s3_key, cache_key, digest, tamanio, renderer.content_type, nuevo)
+
+    tamanio = _objetos.get(s3_key)
+    if tamanio is not None:
+        propiedad("cache", "memoria")
+        return publicado(tamanio, False)
+
+    tamanio = _tamanio(s3, bucket, s3_key)
+    if tamanio is not None:
+        propiedad("cache", "s3")
+        _objetos.put(s3_key, tamanio)
+        return publicado(tamanio, False)
+
+    tamanio = _asegurar_cache(renderer, normalizado, s3, bucket, cache_key)
+
+    # Copia del lado de S3: los bytes de la imagen no pasan por la Lambda.
+    # Los metadatos se fijan acá para cubrir también objetos de cache/ previos
+    with etapa("s3_copia"):
+        s3.copy_object(
+            Bucket            = bucket,
+            Key               = s3_key,
+            CopySource        = {"Bucket": bucket, "Key": cache_key},
+            MetadataDirective = "REPLACE",
+            ContentType       = renderer.content_type,
+            CacheControl      = CACHE_INMUTABLE
+        )
+    _objetos.put(s3_key, tamanio)
+    return publicado(tamanio, True)
+
+
+def publicar_en(mermaid_code, s3, bucket, destino, renderer, metadatos=None) -> Publicado:
+    # Como renderizar_y_publicar, pero sobre una clave estable que se
+    # sobrescribe en cada versión (diagramas editables). No pasa por _objetos:
+    # el contenido de destino cambia
+    normalizado = normalizar_mermaid(mermaid_code)
+    digest      = hashlib.sha256(normalizado.encode()).hexdigest()
+    cache_key   = clave_cache(digest, renderer.extension)
+    tamanio     = _asegurar_cache(renderer, normalizado, s3, bucket, cache_key)
+    s3.copy_object(
+        Bucket            = bucket,
+        Key               = destino,
+        CopySource        = {"Bucket": bucket, "Key": cache_key},
+        MetadataDirective = "REPLACE",
+        ContentType       = renderer.content_type,
+        CacheControl      = CACHE_EDITABLE,
+        Metadata          = metadatos or {}
+    )
+    return Publicado(destino, cache_key, digest, tamanio, renderer.content_type, True)
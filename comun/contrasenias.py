@@ -0,0 +1,50 @@
+import hashlib
+import hmac
+import os
+
+# scrypt con sal por usuario. Los parámetros de costo se guardan junto al hash
+# (atributo kdf de t_usuarios3) para poder subirlos sin invalidar cuentas:
+# el login vuelve a hashear cuando el registro usa otros parámetros
+KDF_N     = int(os.environ.get("KDF_N", str(2 ** 14)))
+KDF_R     = int(os.environ.get("KDF_R", "8"))
+KDF_P     = int(os.environ.get("KDF_P", "1"))
+KDF_LARGO = 32
+KDF_SAL   = 16
+
+
+def _scrypt(password: str, sal: bytes, n: int, r: int, p: int) -> bytes:
+    # maxmem por defecto de OpenSSL (32 MB) no alcanza para n >= 2**15
+    return hashlib.scrypt(
+        password.encode(), salt=sal, n=n, r=r, p=p,
+        maxmem=256 * n * r * p + 1024 * 1024, dklen=KDF_LARGO
+    )
+
+
+def hashear(password: str, n: int = None, r: int = None, p: int = None) -> dict:
+    n   = n or KDF_N
+    r   = r or KDF_R
+    p   = p or KDF_P
+    sal = os.urandom(KDF_SAL)
+    return {
+        "password": _scrypt(password, sal, n, r, p).hex(),
+        "kdf":      {"algoritmo": "scrypt", "sal": sal.hex(), "n": n, "r": r, "p": p}
+    }
+
+
+def verificar(password: str, usuario: dict) -> bool:
+    kdf = usuario.get("kdf")
+    if kdf is None:
+        # Registro anterior al KDF: SHA-256 sin sal
+        calculado = hashlib.sha256(password.encode()).hexdigest()
+    else:
+        calculado = _scrypt(
+            password, bytes.fromhex(kdf["sal"]), int(kdf["n"]), int(kdf["r"]), int(kdf["p"])
+        ).hex()
+    return hmac.compare_digest(calculado, usuario["password"])
+
+
+def necesita_rehash(usuario: dict) -> bool:
+    kdf = usuario.get("kdf")
+    if kdf is None:
+        return True
+    return (int(kdf["n"]), int(kdf["r"]), int(kdf["p"])) != (KDF_N, KDF_R, KDF_P)
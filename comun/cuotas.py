@@ -0,0 +1,184 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from botocore.exceptions import ClientError
+
+from comun import runtime
+from comun.limites import LIMITES_DEFECTO, limites_tenant
+from comun.lru import CacheLRU
+from comun.metricas import propiedad
+
+logger = logging.getLogger()
+
+# Cuotas por tenant con un token bucket en forma GCRA: cada cubeta es un único
+# número, "tat", el instante (ms) en que volvería a estar llena. En DynamoDB se
+# avanza con un update condicional atómico, sin leer antes. Cada contenedor
+# reserva tokens de a CUOTA_LOTE y los gasta en memoria, y un tenant rechazado
+# se sigue rechazando en memoria hasta que pasa su Retry-After.
+# Sin TABLE_CUOTAS no hay límite
+TABLE_CUOTAS = os.environ.get("TABLE_CUOTAS")
+CUOTA_LOTE   = int(os.environ.get("CUOTA_LOTE", "5"))
+CUOTA_TTL    = 3600   # las cubetas inactivas las borra el TTL de DynamoDB
+
+RENDER  = "render"
+LISTADO = "listado"
+
+
+@dataclass
+class _CubetaLocal:
+    disponibles:     int = 0   # tokens ya reservados en DynamoDB
+    vence_ms:        int = 0
+    bloqueado_hasta: int = 0
+
+
+# tenant#presupuesto -> _CubetaLocal. Sobrevive entre invocaciones "warm"
+_locales = CacheLRU(4096)
+_lock    = threading.Lock()
+
+
+def _segundos(ms: int) -> int:
+    return max(1, math.ceil(ms / 1000))
+
+
+def _numero(valor):
+    # ReturnValuesOnConditionCheckFailure devuelve el item sin deserializar
+    if isinstance(valor, dict):
+        valor = valor.get("N")
+    return int(valor) if valor is not None else None
+
+
+def _es_condicion_fallida(e: ClientError) -> bool:
+    return e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException"
+
+
+def _consumir(clave: str, costo: int, intervalo_ms: int, rafaga: int, ahora_ms: int) -> int:
+    # 0 si se concedieron `costo` tokens; si no, ms hasta que alcancen
+    from boto3.dynamodb.conditions import Attr
+    tabla  = runtime.tabla(TABLE_CUOTAS)
+    paso   = costo * intervalo_ms
+    tope   = ahora_ms + (rafaga - costo) * intervalo_ms   # tat máximo que todavía admite `costo`
+    expira = ahora_ms // 1000 + CUOTA_TTL
+    for _ in range(3):
+        try:
+            # Caso habitual bajo carga: la cubeta tiene un tat en el futuro
+            tabla.update_item(
+                Key                                 = {"clave": clave},
+                UpdateExpression                    = "SET tat = tat + :paso, expira_en = :expira",
+                ConditionExpression                 = Attr("tat").between(ahora_ms, tope),
+                ExpressionAttributeValues           = {":paso": paso, ":expira": expira},
+                ReturnValuesOnConditionCheckFailure = "ALL_OLD"
+            )
+            return 0
+        except ClientError as e:
+            if not _es_condicion_fallida(e):
+                raise
+            tat = _numero((e.response.get("Item") or {}).get("tat"))
+        if tat is not None and tat > tope:
+            return tat - tope
+
+        try:
+            # Cubeta nueva o llena (tat en el pasado): arranca desde ahora
+            tabla.update_item(
+                Key                       = {"clave": clave},
+                UpdateExpression          = "SET tat = :tat, expira_en = :expira",
+                ConditionExpression       = Attr("tat").not_exists() | Attr("tat").lt(ahora_ms),
+                ExpressionAttributeValues = {":tat": ahora_ms + paso, ":expira": expira}
+            )
+            return 0
+        except ClientError as e:
+            if not _es_condicion_fallida(e):
+                raise
+            # Otro contenedor la movió entre los dos updates: se reintenta
+    return intervalo_ms
+
+
+def _tasa(tenant_id: str, presupuesto: str) -> tuple:
+    # (por minuto, ráfaga). Si t_limites_tenant no responde valen los límites
+    # por defecto: el limitador no debe tirar la API
+    try:
+        limites = limites_tenant(tenant_id)
+    except Exception as e:
+        logger.warning(f"Límites del tenant no disponibles, se usan los por defecto: {e}")
+        limites = LIMITES_DEFECTO
+    return getattr(limites, f"{presupuesto}_por_minuto"), max(1, getattr(limites, f"{presupuesto}_rafaga"))
+
+
+def admitir(tenant_id: str, presupuesto: str, costo: int = 1):
+    # None si la solicitud entra; si no, segundos a esperar (Retry-After).
+    # Va antes de cualquier trabajo costoso del handler. Se cobra el costo
+    # completo; un costo mayor que la ráfaga no entra nunca y el handler lo
+    # tiene que rechazar antes con excede_rafaga (no es un 429)
+    if not TABLE_CUOTAS:
+        return None
+    por_minuto, rafaga = _tasa(tenant_id, presupuesto)
+    if por_minuto <= 0:
+        return None
+    intervalo_ms = max(1, 60000 // por_minuto)
+    clave        = f"{tenant_id}#{presupuesto}"
+    ahora_ms     = int(time.time() * 1000)
+    if costo > rafaga:
+        propiedad("cuota", "excede_rafaga")
+        return _segundos(rafaga * intervalo_ms)
+
+    with _lock:
+        local = _locales.get(clave)
+        if local is None:
+            local = _CubetaLocal()
+            _locales.put(clave, local)
+        if ahora_ms < local.bloqueado_hasta:
+            propiedad("cuota", "rechazo_local")
+            return _segundos(local.bloqueado_hasta - ahora_ms)
+        if ahora_ms < local.vence_ms and local.disponibles >= costo:
+            local.disponibles -= costo
+            propiedad("cuota", "local")
+            return None
+
+    # Se reserva un lote para las próximas solicitudes; si no alcanza, solo lo pedido
+    lote = min(rafaga, max(costo, CUOTA_LOTE))
+    try:
+        espera = _consumir(clave, lote, intervalo_ms, rafaga, ahora_ms)
+        if espera and lote > costo:
+            lote   = costo
+            espera = _consumir(clave, costo, intervalo_ms, rafaga, ahora_ms)
+    except Exception as e:
+        # Si DynamoDB falla, el limitador no debe tirar la API
+        logger.warning(f"Cuotas no disponibles, se admite la solicitud: {e}")
+        return None
+
+    with _lock:
+        if espera:
+            local.bloqueado_hasta = ahora_ms + espera
+            propiedad("cuota", "rechazo")
+            return _segundos(espera)
+        # Los tokens reservados valen lo que representan en tiempo
+        local.disponibles = lote - costo
+        local.vence_ms    = ahora_ms + lote * intervalo_ms
+    propiedad("cuota", "dynamodb")
+    return None
+
+
+def excede_rafaga(tenant_id: str, presupuesto: str, costo: int) -> int:
+    # La ráfaga del tenant si `costo` no puede entrar en una sola solicitud; 0 si no
+    if not TABLE_CUOTAS:
+        return 0
+    por_minuto, rafaga = _tasa(tenant_id, presupuesto)
+    if por_minuto <= 0:
+        return 0
+    return rafaga if costo > rafaga else 0
+
+
+def respuesta_limitada(espera: int, headers: dict, error: str = "Demasiadas solicitudes para este tenant") -> dict:
+    return {
+        "statusCode": 429,
+        "headers": {
+            **headers,
+            "Retry-After":                   str(espera),
+            "Access-Control-Expose-Headers": "Retry-After"
+        },
+        "body": json.dumps({"error": error, "retry_after": espera})
+    }
@@ -0,0 +1,437 @@
+import json
+import logging
+import os
+import time
+import uuid
+
+from botocore.exceptions import ClientError
+
+from comun import runtime
+from comun.cache_render import hash_mermaid, publicar_en
+from comun.indice import registrar_diagrama
+from comun.lru import CacheLRU
+from comun.parser import (
+    DiagramaER, Grafo, emitir_mermaid, json_a_mermaid, parsear_grafo, parsear_pseudocodigo,
+    pseudocodigo_a_mermaid
+)
+from comun.render import obtener_renderer
+
+logger = logging.getLogger()
+
+# Diagramas con id estable que se editan con parches. t_diagramas_editables
+# guarda, por diagrama_id, una cabecera (version = 0) y un ítem por cambio
+# (version = 1, 2, ...). El put condicional del ítem de cambio es lo que
+# reserva la versión: dos ediciones concurrentes no pueden ganar las dos.
+# Cada SNAPSHOT_CADA versiones el estado completo va a S3, así que cargar un
+# diagrama en frío es snapshot + como mucho SNAPSHOT_CADA cambios
+TABLE_EDITABLES  = os.environ.get("TABLE_EDITABLES", "t_diagramas_editables")
+SNAPSHOT_CADA    = int(os.environ.get("EDITABLE_SNAPSHOT_CADA", "20"))
+EDITABLES_ITEMS  = int(os.environ.get("EDITABLE_CACHE_ITEMS", "256"))
+MAX_CAMBIO       = 350 * 1024   # el ítem de DynamoDB no puede pasar de 400 KB
+VERSION_CABECERA = 0
+
+
+class DiagramaNoEncontrado(Exception):
+    pass
+
+
+class CambioInvalido(ValueError):
+    pass
+
+
+class ConflictoVersion(Exception):
+    def __init__(self, version_actual: int):
+        super().__init__(f"El diagrama ya está en la versión {version_actual}")
+        self.version_actual = version_actual
+
+
+def _es_id(valor) -> bool:
+    return isinstance(valor, str) and bool(valor)
+
+
+def _lista(cambios: dict, campo: str, tipo=dict) -> list:
+    # Los parches vienen del cliente: una forma inesperada es un 400, no un 500
+    valor = cambios.get(campo, [])
+    if not isinstance(valor, list) or not all(isinstance(v, tipo) for v in valor):
+        raise CambioInvalido(f"{campo} debe ser una lista de {'objetos' if tipo is dict else 'textos'}")
+    return valor
+
+
+def _de_entrada(funcion, *args):
+    # Un ValueError al interpretar lo que mandó el cliente es entrada inválida
+    # (400). El mismo error leyendo un snapshot o el log es un fallo interno
+    try:
+        return funcion(*args)
+    except CambioInvalido:
+        raise
+    except ValueError as e:
+        raise CambioInvalido(str(e)) from e
+
+
+class ModeloJSON:
+    # Modelo nodos/conexiones de /diagrama/json con índice de incidencia:
+    # quitar un nodo cuesta O(grado), no O(aristas)
+    def __init__(self):
+        self.nodos      = {}   # id -> etiqueta, en orden de inserción
+        self.conexiones = {}   # (origen, destino) -> None: conjunto ordenado
+        self.incidentes = {}   # id -> {(origen, destino)}
+
+    @classmethod
+    def desde_estado(cls, estado: dict):
+        if not isinstance(estado, dict):
+            raise ValueError("El JSON debe ser un objeto con 'nodos' y 'conexiones'.")
+        modelo = cls()
+        modelo.aplicar({
+            "agregar_nodos":      estado.get("nodos", []),
+            "agregar_conexiones": estado.get("conexiones", [])
+        })
+        return modelo
+
+    def estado(self) -> dict:
+        return {
+            "nodos":      [{"id": i, "etiqueta": e} for i, e in self.nodos.items()],
+            "conexiones": [{"origen": o, "destino": d} for o, d in self.conexiones]
+        }
+
+    @staticmethod
+    def _arista(conexion) -> tuple:
+        origen  = conexion.get("origen")
+        destino = conexion.get("destino")
+        if not _es_id(origen) or not _es_id(destino):
+            raise CambioInvalido("Cada conexión debe tener 'origen' y 'destino'.")
+        return origen, destino
+
+    def _quitar_conexion(self, arista: tuple):
+        if arista in self.conexiones:
+            del self.conexiones[arista]
+            for extremo in arista:
+                incidentes = self.incidentes.get(extremo)
+                if incidentes is not None:
+                    incidentes.discard(arista)
+
+    def aplicar(self, cambios: dict):
+        for id_nodo in _lista(cambios, "quitar_nodos", str):
+            self.nodos.pop(id_nodo, None)
+            for arista in self.incidentes.pop(id_nodo, set()):
+                self._quitar_conexion(arista)
+        for conexion in _lista(cambios, "quitar_conexiones"):
+            self._quitar_conexion(self._arista(conexion))
+        for nodo in _lista(cambios, "agregar_nodos"):
+            id_nodo = nodo.get("id")
+            if not _es_id(id_nodo):
+                raise CambioInvalido("Cada nodo debe tener un 'id'.")
+            self.nodos[id_nodo] = str(nodo.get("etiqueta", id_nodo))
+        for conexion in _lista(cambios, "agregar_conexiones"):
+            arista = self._arista(conexion)
+            if arista not in self.conexiones:
+                self.conexiones[arista] = None
+                for extremo in arista:
+                    self.incidentes.setdefault(extremo, set()).add(arista)
+
+    def mermaid(self) -> str:
+        return json_a_mermaid(self.estado())
+
+
+class ModeloPseudocodigo:
+    # Líneas del pseudocódigo de /diagrama/aws y /diagrama/ER. Para grafos se
+    # mantiene el aporte de cada línea con contadores de referencias, así un
+    # parche solo parsea las líneas que quita y las que agrega
+    def __init__(self, lineas: list):
+        self.er        = isinstance(parsear_pseudocodigo("\n".join(lineas)), DiagramaER)
+        self.lineas    = []
+        self.refs_nodo = {}   # nombre -> líneas que lo mencionan
+        self.aristas   = {}   # (origen, destino) -> repeticiones
+        self._reemplazar(0, 0, lineas)
+
+    @classmethod
+    def desde_estado(cls, estado: dict):
+        return cls(estado["lineas"])
+
+    def estado(self) -> dict:
+        return {"lineas": self.lineas}
+
+    def _aporte(self, linea: str):
+        linea = linea.strip()
+        if self.er or not linea or linea.lower().startswith("diagrama"):
+            return (), None
+        grafo  = parsear_grafo([linea])
+        arista = None
+        if grafo.aristas:
+            origen, destino = grafo.aristas[0]
+            arista = (grafo.nombres[origen], grafo.nombres[destino])
+        return grafo.nombres, arista
+
+    def _sumar(self, aporte, signo: int):
+        nombres, arista = aporte
+        for nombre in nombres:
+            refs = self.refs_nodo.get(nombre, 0) + signo
+            if refs:
+                self.refs_nodo[nombre] = refs
+            else:
+                del self.refs_nodo[nombre]
+        if arista is not None:
+            refs = self.aristas.get(arista, 0) + signo
+            if refs:
+                self.aristas[arista] = refs
+            else:
+                del self.aristas[arista]
+
+    def _reemplazar(self, desde: int, borrar: int, insertar: list):
+        # Se parsean las líneas nuevas antes de tocar el modelo
+        nuevos = [self._aporte(linea) for linea in insertar]
+        for linea in self.lineas[desde:desde + borrar]:
+            self._sumar(self._aporte(linea), -1)
+        for aporte in nuevos:
+            self._sumar(aporte, 1)
+        self.lineas[desde:desde + borrar] = insertar
+
+    def aplicar(self, cambios: dict):
+        # cambios = {"lineas": [{"desde": i, "borrar": n, "insertar": [...]}, ...]},
+        # cada bloque con índices sobre el resultado del anterior
+        for bloque in _lista(cambios, "lineas"):
+            try:
+                desde  = int(bloque.get("desde", 0))
+                borrar = int(bloque.get("borrar", 0))
+            except (TypeError, ValueError):
+                raise CambioInvalido("desde y borrar deben ser enteros")
+            insertar = bloque.get("insertar", [])
+            if desde < 0 or borrar < 0 or desde + borrar > len(self.lineas):
+                raise CambioInvalido(f"Bloque fuera de rango: desde={desde} borrar={borrar}")
+            if not isinstance(insertar, list) or not all(isinstance(l, str) for l in insertar):
+                raise CambioInvalido("insertar debe ser una lista de líneas")
+            self._reemplazar(desde, borrar, insertar)
+
+    def mermaid(self) -> str:
+        if self.er:
+            return pseudocodigo_a_mermaid("\n".join(self.lineas))
+        if not self.refs_nodo:
+            raise CambioInvalido("El diagrama quedó vacío")
+        grafo = Grafo()
+        for nombre in self.refs_nodo:
+            grafo.nodo(nombre)
+        for (origen, destino), repeticiones in self.aristas.items():
+            grafo.aristas.extend([(grafo.indices[origen], grafo.indices[destino])] * repeticiones)
+        return "".join(emitir_mermaid(grafo))
+
+
+MODELOS = {
+    "json": ModeloJSON,
+    "aws":  ModeloPseudocodigo,
+    "ER":   ModeloPseudocodigo
+}
+
+# diagrama_id -> (version, digest, modelo). Una Lambda "warm" aplica solo los
+# cambios posteriores a la versión que ya tiene en memoria
+_modelos = CacheLRU(EDITABLES_ITEMS)
+
+
+def modelo_desde_entrada(tipo: str, code):
+    if tipo == "json":
+        return ModeloJSON.desde_estado(code)
+    if not isinstance(code, str):
+        raise CambioInvalido("code debe ser el pseudocódigo como texto")
+    return ModeloPseudocodigo(code.splitlines())
+
+
+def _clave_snapshot(diagrama_id: str, version: int) -> str:
+    return f"editables/{diagrama_id}/v{version}.json"
+
+
+def _clave_imagen(tenant_id: str, user_id: str, diagrama_id: str, extension: str) -> str:
+    return f"{tenant_id}/{user_id}/editables/{diagrama_id}.{extension}"
+
+
+def _guardar_snapshot(bucket: str, diagrama_id: str, version: int, digest: str, modelo):
+    runtime.s3().put_object(
+        Bucket      = bucket,
+        Key         = _clave_snapshot(diagrama_id, version),
+        Body        = json.dumps({"digest": digest, "estado": modelo.estado()}).encode(),
+        ContentType = "application/json"
+    )
+
+
+def obtener_cabecera(diagrama_id: str, tenant_id: str, user_id: str) -> dict:
+    item = runtime.tabla(TABLE_EDITABLES).get_item(
+        Key            = {"diagrama_id": diagrama_id, "version": VERSION_CABECERA},
+        ConsistentRead = True
+    ).get("Item")
+    # Un diagrama de otro usuario se reporta igual que uno inexistente
+    if not item or (item["tenant_id"], item["user_id"]) != (tenant_id, user_id):
+        raise DiagramaNoEncontrado(diagrama_id)
+    return item
+
+
+def _cambios_desde(diagrama_id: str, version: int):
+    from boto3.dynamodb.conditions import Key
+    kwargs = {
+        "KeyConditionExpression": Key("diagrama_id").eq(diagrama_id) & Key("version").gt(version),
+        "ConsistentRead":         True
+    }
+    while True:
+        respuesta = runtime.tabla(TABLE_EDITABLES).query(**kwargs)
+        yield from respuesta.get("Items", [])
+        if "LastEvaluatedKey" not in respuesta:
+            return
+        kwargs["ExclusiveStartKey"] = respuesta["LastEvaluatedKey"]
+
+
+def cargar_modelo(cabecera: dict, bucket: str):
+    diagrama_id = cabecera["diagrama_id"]
+    cacheado    = _modelos.get(diagrama_id)
+    if cacheado is not None:
+        version, digest, modelo = cacheado
+    else:
+        version  = int(cabecera["version_snapshot"])
+        snapshot = runtime.s3().get_object(Bucket=bucket, Key=_clave_snapshot(diagrama_id, version))
+        datos    = json.loads(snapshot["Body"].read())
+        digest   = datos["digest"]
+        modelo   = MODELOS[cabecera["tipo"]].desde_estado(datos["estado"])
+
+    for item in _cambios_desde(diagrama_id, version):
+        modelo.aplicar(json.loads(item["cambios"]))
+        version = int(item["version"])
+        digest  = item["digest"]
+    _modelos.put(diagrama_id, (version, digest, modelo))
+    return version, digest, modelo
+
+
+def crear_diagrama(tenant_id: str, user_id: str, tipo: str, code, bucket: str) -> dict:
+    modelo      = _de_entrada(modelo_desde_entrada, tipo, code)
+    mermaid     = _de_entrada(modelo.mermaid)
+    digest      = hash_mermaid(mermaid)
+    diagrama_id = str(uuid.uuid4())
+    renderer    = obtener_renderer()
+    ahora       = int(time.time())
+
+    publicado = publicar_en(
+        mermaid, runtime.s3(), bucket, _clave_imagen(tenant_id, user_id, diagrama_id, renderer.extension),
+        renderer, {"version": "1", "digest": digest}
+    )
+    _guardar_snapshot(bucket, diagrama_id, 1, digest, modelo)
+    cabecera = {
+        "diagrama_id":      diagrama_id,
+        "version":          VERSION_CABECERA,
+        "tenant_id":        tenant_id,
+        "user_id":          user_id,
+        "tipo":             tipo,
+        "version_actual":   1,
+        "version_snapshot": 1,
+        "digest":           digest,
+        "s3_key":           publicado.s3_key,
+        "tamanio":          publicado.tamanio,
+        "creado_en":        ahora,
+        "actualizado_en":   ahora
+    }
+    runtime.tabla(TABLE_EDITABLES).put_item(Item=cabecera)
+    registrar_diagrama(tenant_id, user_id, tipo, publicado)
+    _modelos.put(diagrama_id, (1, digest, modelo))
+    return cabecera
+
+
+def actualizar_diagrama(diagrama_id: str, tenant_id: str, user_id: str, cambios: dict,
+                        bucket: str, version_esperada: int = None) -> dict:
+    cabecera = obtener_cabecera(diagrama_id, tenant_id, user_id)
+    base, _, modelo = cargar_modelo(cabecera, bucket)
+    if version_esperada is not None and version_esperada != base:
+        raise ConflictoVersion(base)
+
+    texto = json.dumps(cambios)
+    if len(texto.encode()) > MAX_CAMBIO:
+        raise CambioInvalido("El parche es demasiado grande; cree el diagrama de nuevo")
+
+    # El modelo en memoria se modifica en el lugar: ante cualquier fallo se
+    # descarta y la próxima carga parte del snapshot
+    try:
+        _de_entrada(modelo.aplicar, cambios)
+        mermaid = _de_entrada(modelo.mermaid)
+        digest  = hash_mermaid(mermaid)
+        version = base + 1
+        runtime.tabla(TABLE_EDITABLES).put_item(
+            Item                     = {
+                "diagrama_id": diagrama_id,
+                "version":     version,
+                "cambios":     texto,
+                "digest":      digest,
+                "user_id":     user_id,
+                "creado_en":   int(time.time())
+            },
+            ConditionExpression      = "attribute_not_exists(#version)",
+            ExpressionAttributeNames = {"#version": "version"}
+        )
+    except ClientError as e:
+        _modelos.pop(diagrama_id)
+        if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            raise ConflictoVersion(base + 1)
+        raise
+    except Exception:
+        _modelos.pop(diagrama_id)
+        raise
+    _modelos.put(diagrama_id, (version, digest, modelo))
+
+    # La versión ya quedó confirmada: de acá en adelante un fallo no la deshace
+    # ni se informa como error. La imagen se compara contra el digest publicado
+    # en la cabecera, así que si este render falla lo repite la próxima edición
+    renderizado = False
+    s3_key      = cabecera["s3_key"]
+    campos      = {"version_actual": version, "actualizado_en": int(time.time())}
+    if digest != cabecera["digest"]:
+        try:
+            renderer  = obtener_renderer()
+            publicado = publicar_en(
+                mermaid, runtime.s3(), bucket, _clave_imagen(tenant_id, user_id, diagrama_id, renderer.extension),
+                renderer, {"version": str(version), "digest": digest}
+            )
+            s3_key      = publicado.s3_key
+            renderizado = True
+            campos.update(digest=digest, s3_key=s3_key, tamanio=publicado.tamanio)
+        except Exception:
+            logger.exception("Versión %s de %s guardada sin actualizar la imagen", version, diagrama_id)
+
+    try:
+        if version - int(cabecera["version_snapshot"]) >= SNAPSHOT_CADA:
+            _guardar_snapshot(bucket, diagrama_id, version, digest, modelo)
+            campos["version_snapshot"] = version
+        _actualizar_cabecera(diagrama_id, campos)
+    except Exception:
+        # La cabecera solo acelera lecturas: los cambios se leen de sus ítems
+        logger.exception("Versión %s de %s guardada sin actualizar la cabecera", version, diagrama_id)
+
+    resultado = {
+        "diagrama_id": diagrama_id,
+        "version":     version,
+        "digest":      digest,
+        "renderizado": renderizado,
+        "s3_key":      s3_key
+    }
+    if digest != cabecera["digest"] and not renderizado:
+        resultado["aviso"] = "Cambios guardados; la imagen se actualizará en la próxima edición"
+    return resultado
+
+
+def _actualizar_cabecera(diagrama_id: str, campos: dict):
+    # La cabecera nunca retrocede si otra edición más nueva ya la actualizó
+    from boto3.dynamodb.conditions import Attr
+    try:
+        runtime.tabla(TABLE_EDITABLES).update_item(
+            Key                       = {"diagrama_id": diagrama_id, "version": VERSION_CABECERA},
+            UpdateExpression          = "SET " + ", ".join(f"#{k} = :{k}" for k in campos),
+            ConditionExpression       = Attr("version_actual").lt(campos["version_actual"]),
+            ExpressionAttributeNames  = {f"#{k}": k for k in campos},
+            ExpressionAttributeValues = {f":{k}": v for k, v in campos.items()}
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+            raise
+
+
+def obtener_diagrama(diagrama_id: str, tenant_id: str, user_id: str, bucket: str) -> dict:
+    cabecera = obtener_cabecera(diagrama_id, tenant_id, user_id)
+    version, digest, modelo = cargar_modelo(cabecera, bucket)
+    return {
+        "diagrama_id": diagrama_id,
+        "tipo":        cabecera["tipo"],
+        "version":     version,
+        "digest":      digest,
+        "s3_key":      cabecera["s3_key"],
+        "estado":      modelo.estado()
+    }
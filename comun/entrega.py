@@ -0,0 +1,27 @@
+import base64
+
+from comun import runtime
+from comun.cache_render import IMAGEN_MAX_BYTES, leer_imagen
+
+
+def quiere_inline(event) -> bool:
+    params = event.get("queryStringParameters") or {}
+    return str(params.get("inline", "")).lower() in ("true", "1")
+
+
+def respuesta_inline(publicado, bucket: str, headers: dict):
+    # Imagen en el cuerpo (base64, tipo binario en API Gateway) para que el cliente
+    # no tenga que hacer el GET prefirmado. None si supera INLINE_MAX_BYTES
+    if publicado.tamanio > IMAGEN_MAX_BYTES:
+        return None
+    imagen = leer_imagen(publicado, runtime.s3(), bucket)
+    return {
+        "statusCode": 201,
+        "headers": {
+            **headers,
+            "Content-Type":   publicado.content_type,
+            "X-Diagrama-Key": publicado.s3_key
+        },
+        "body": base64.b64encode(imagen).decode(),
+        "isBase64Encoded": True
+    }
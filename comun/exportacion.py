@@ -0,0 +1,155 @@
+import logging
+import os
+import shutil
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from comun import runtime
+
+logger = logging.getLogger()
+
+# Exportación de todos los diagramas de un usuario como un ZIP. El archivo se
+# arma en streaming: los objetos se descargan en paralelo (con una ventana
+# acotada) y se escriben en orden en el ZIP, que sube a S3 por multipart a
+# medida que se llenan las partes. En memoria hay como mucho la ventana de
+# descargas y una o dos partes, no el archivo completo
+EXPORT_WORKERS    = int(os.environ.get("EXPORT_WORKERS", "16"))
+EXPORT_PARTE      = int(os.environ.get("EXPORT_PARTE_MB", "8")) * 1024 * 1024   # mínimo de S3: 5 MB
+EXPORT_EN_MEMORIA = 4 * 1024 * 1024   # objetos más grandes se copian en streaming
+EXPORT_TAG        = "exportacion=true"   # la regla de ciclo de vida del bucket los borra
+
+CARPETA_EXPORTACIONES = "exportaciones/"
+# Ya comprimidos: deflate solo gastaría CPU
+SIN_COMPRIMIR = (".png", ".pdf", ".jpg", ".zip")
+
+
+def clave_exportacion(tenant_id: str, user_id: str, job_id: str) -> str:
+    # Dentro del prefijo del usuario: la firma de CloudFront por prefijo la cubre
+    return f"{tenant_id}/{user_id}/{CARPETA_EXPORTACIONES}{job_id}.zip"
+
+
+class _SubidaMultiparte:
+    # Archivo de solo escritura sobre una subida multiparte. zipfile escribe en
+    # streams sin seek (usa descriptores de datos), así que alcanza con write().
+    # Cada parte llena se sube en segundo plano mientras el ZIP sigue creciendo
+    def __init__(self, s3, bucket: str, key: str, content_type: str):
+        self.s3        = s3
+        self.bucket    = bucket
+        self.key       = key
+        self.escritos  = 0
+        self._buffer   = bytearray()
+        self._partes   = []   # futuros de upload_part, en orden
+        self._pool     = ThreadPoolExecutor(max_workers=2)
+        self._upload   = s3.create_multipart_upload(
+            Bucket       = bucket,
+            Key          = key,
+            ContentType  = content_type,
+            CacheControl = "private, max-age=86400",
+            Tagging      = EXPORT_TAG
+        )["UploadId"]
+
+    def write(self, datos) -> int:
+        self._buffer += datos
+        self.escritos += len(datos)
+        while len(self._buffer) >= EXPORT_PARTE:
+            self._subir(bytes(self._buffer[:EXPORT_PARTE]))
+            del self._buffer[:EXPORT_PARTE]
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def _subir(self, parte: bytes):
+        # Como mucho dos partes en vuelo: acota la memoria si S3 va más lento
+        pendientes = [f for f in self._partes if not f.done()]
+        if len(pendientes) >= 2:
+            pendientes[0].result()
+        numero = len(self._partes) + 1
+        self._partes.append(self._pool.submit(
+            self.s3.upload_part,
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload, PartNumber=numero, Body=parte
+        ))
+
+    def completar(self):
+        # La última parte puede ser más chica que el mínimo (o la única). Si el
+        # total es múltiplo exacto de EXPORT_PARTE no queda resto: no se sube
+        # una parte vacía
+        if self._buffer or not self._partes:
+            self._subir(bytes(self._buffer))
+        self._buffer = bytearray()
+        partes = [{"PartNumber": i + 1, "ETag": f.result()["ETag"]} for i, f in enumerate(self._partes)]
+        self._pool.shutdown()
+        self.s3.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload, MultipartUpload={"Parts": partes}
+        )
+
+    def abortar(self):
+        self._pool.shutdown(cancel_futures=True)
+        try:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload)
+        except Exception:
+            logger.exception("No se pudo abortar la subida %s", self.key)
+
+
+def objetos_usuario(s3, bucket: str, tenant_id: str, user_id: str):
+    # Todo el prefijo del usuario (incluidos los editables), sin exportaciones previas
+    prefijo   = f"{tenant_id}/{user_id}/"
+    paginador = s3.get_paginator("list_objects_v2")
+    for pagina in paginador.paginate(Bucket=bucket, Prefix=prefijo):
+        for obj in pagina.get("Contents", []):
+            nombre = obj["Key"][len(prefijo):]
+            if nombre and not nombre.startswith(CARPETA_EXPORTACIONES):
+                yield obj, nombre
+
+
+def _descargar(s3, bucket: str, obj: dict):
+    # Los objetos chicos se leen completos en el hilo de descarga; los grandes
+    # se devuelven como stream y los copia el hilo que escribe el ZIP
+    cuerpo = s3.get_object(Bucket=bucket, Key=obj["Key"])["Body"]
+    if obj["Size"] <= EXPORT_EN_MEMORIA:
+        return cuerpo.read()
+    return cuerpo
+
+
+def _agregar(archivo: zipfile.ZipFile, nombre: str, obj: dict, contenido):
+    info = zipfile.ZipInfo(nombre, date_time=obj["LastModified"].timetuple()[:6])
+    info.compress_type = zipfile.ZIP_STORED if nombre.lower().endswith(SIN_COMPRIMIR) else zipfile.ZIP_DEFLATED
+    if isinstance(contenido, bytes):
+        archivo.writestr(info, contenido)
+        return
+    info.file_size = obj["Size"]
+    try:
+        with archivo.open(info, "w", force_zip64=obj["Size"] > 2 ** 31) as destino:
+            shutil.copyfileobj(contenido, destino, 1024 * 1024)
+    finally:
+        contenido.close()
+
+
+def exportar_usuario(tenant_id: str, user_id: str, bucket: str, destino: str) -> dict:
+    # Escribe el ZIP en `destino` y devuelve {"archivos", "bytes"}
+    s3      = runtime.s3()
+    subida  = _SubidaMultiparte(s3, bucket, destino, "application/zip")
+    ventana = []   # (obj, nombre, futuro) en orden de listado
+    total   = 0
+    try:
+        with ThreadPoolExecutor(max_workers=EXPORT_WORKERS) as pool, \
+                zipfile.ZipFile(subida, "w", allowZip64=True) as archivo:
+
+            def escribir_primero():
+                obj, nombre, futuro = ventana.pop(0)
+                _agregar(archivo, nombre, obj, futuro.result())
+
+            for obj, nombre in objetos_usuario(s3, bucket, tenant_id, user_id):
+                ventana.append((obj, nombre, pool.submit(_descargar, s3, bucket, obj)))
+                total += 1
+                if len(ventana) >= 2 * EXPORT_WORKERS:
+                    escribir_primero()
+            while ventana:
+                escribir_primero()
+        subida.completar()
+    except BaseException:
+        for _, _, futuro in ventana:
+            futuro.cancel()
+        subida.abortar()
+        raise
+    return {"archivos": total, "bytes": subida.escritos}
@@ -0,0 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from comun.firmador import obtener_firmador, prefijo_usuario
+from comun.generacion import generar_diagrama
+from comun.mosaico import quiere_mosaico
+from comun.render import RENDERERS, Renderer, obtener_renderer
+from comun.trabajos import es_async
+
+# Formato de salida de los generadores: ?format=svg,png o, si no viene, el
+# header Accept. "mermaid" devuelve el código tal cual, sin render ni S3. Sin
+# formato pedido se usa el del renderer por defecto (RENDERER). Cada formato
+# se cachea bajo su propia clave (cache/<sha256>.<ext>)
+MERMAID  = "mermaid"
+FORMATOS = (MERMAID, "svg", "png", "pdf")
+
+TIPOS_MEDIA = {
+    "text/vnd.mermaid": MERMAID,
+    "text/x-mermaid":   MERMAID,
+    "image/svg+xml":    "svg",
+    "image/png":        "png",
+    "application/pdf":  "pdf",
+}
+
+RENDERER_POR_FORMATO = {
+    "svg": "mermaid_ink_svg",
+    "png": "mermaid_ink",
+    "pdf": "mermaid_ink_pdf",
+}
+
+
+def _desde_accept(accept: str) -> list:
+    # El tipo soportado de mayor q; a igual q, el primero. application/json,
+    # text/plain o */* no eligen nada (clientes que ya usan la API)
+    mejor, mejor_q = None, 0.0
+    for parte in accept.split(","):
+        tipo, *parametros = [p.strip() for p in parte.split(";")]
+        q = 1.0
+        for parametro in parametros:
+            if parametro.startswith("q="):
+                try:
+                    q = float(parametro[2:])
+                except ValueError:
+                    q = 0.0
+        formato = TIPOS_MEDIA.get(tipo.lower())
+        if formato and q > mejor_q:
+            mejor, mejor_q = formato, q
+    return [mejor] if mejor else []
+
+
+def formatos_pedidos(event) -> list:
+    # Lista vacía = formato por defecto. ValueError si ?format trae uno
+    # desconocido o varios junto con mosaico/async, o si se piden mosaico y
+    # async a la vez (el mosaico no se encola)
+    if quiere_mosaico(event) and es_async(event):
+        raise ValueError("Los modos mosaico y async no se pueden combinar")
+    params = event.get("queryStringParameters") or {}
+    if not params.get("format"):
+        headers = {k.lower(): v for k, v in (event.get("headers") or {}).items()}
+        return _desde_accept(headers.get("accept") or "")
+
+    pedidos   = list(dict.fromkeys(f.strip().lower() for f in params["format"].split(",") if f.strip()))
+    invalidos = [f for f in pedidos if f not in FORMATOS]
+    if invalidos:
+        raise ValueError(f"Formato inválido: {', '.join(invalidos)}. Use {', '.join(FORMATOS)}")
+    if len(pedidos) > 1 and (quiere_mosaico(event) or es_async(event)):
+        raise ValueError("Los modos mosaico y async admiten un solo formato")
+    return pedidos
+
+
+def renderer_de(formato: str = None) -> Renderer:
+    # El renderer por defecto se respeta si ya produce ese formato (p. ej. el
+    # SVG local, sin red); si no, el endpoint correspondiente de mermaid.ink
+    defecto = obtener_renderer()
+    if formato is None or defecto.extension == formato:
+        return defecto
+    return RENDERERS[RENDERER_POR_FORMATO[formato]]
+
+
+def respuesta_mermaid(mermaid_code: str, headers: dict) -> dict:
+    return {
+        "statusCode": 200,
+        "headers": {**headers, "Content-Type": "text/vnd.mermaid; charset=utf-8"},
+        "body": mermaid_code
+    }
+
+
+def generar_formatos(mermaid_code: str, tenant_id: str, user_id: str, tipo: str, bucket: str,
+                     formatos: list) -> dict:
+    # Un render por formato (en paralelo: son independientes) y una sola
+    # pasada de firmado. Devuelve formato -> URL, con el código si se pidió "mermaid"
+    a_renderizar = [f for f in formatos if f != MERMAID]
+
+    def generar(formato):
+        return generar_diagrama(mermaid_code, tenant_id, user_id, tipo, bucket, renderer_de(formato))
+
+    with ThreadPoolExecutor(max_workers=max(1, len(a_renderizar))) as pool:
+        publicados = list(pool.map(generar, a_renderizar))
+
+    prefijo  = prefijo_usuario(tenant_id, user_id)
+    urls     = obtener_firmador(bucket).firmar([p.s3_key for p in publicados], prefijo, expira=3600)
+    salida   = dict(zip(a_renderizar, urls))
+    if MERMAID in formatos:
+        salida[MERMAID] = mermaid_code
+    return salida
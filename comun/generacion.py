@@ -0,0 +1,15 @@
+from comun import runtime
+from comun.cache_render import Publicado, renderizar_y_publicar
+from comun.indice import registrar_diagrama
+from comun.render import obtener_renderer
+
+
+def generar_diagrama(mermaid_code, tenant_id, user_id, tipo, bucket, renderer=None, indexar=True) -> Publicado:
+    # Render (con caché) + publicación en S3 + registro en el índice de metadatos.
+    # Con indexar=False el registro queda a cargo del llamador (p. ej. en lote)
+    publicado = renderizar_y_publicar(
+        mermaid_code, tenant_id, user_id, runtime.s3(), bucket, renderer or obtener_renderer()
+    )
+    if indexar and publicado.nuevo:
+        registrar_diagrama(tenant_id, user_id, tipo, publicado)
+    return publicado
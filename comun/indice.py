@@ -0,0 +1,112 @@
+import base64
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+from comun import runtime
+
+# Índice de metadatos de diagramas (t_diagramas): tenant_id + created_at como
+# clave, con un GSI por usuario. Listar y "mis recientes" son un único Query de
+# costo O(página). Los duplicados no se buscan acá: el render ya se deduplica
+# por hash en el caché de S3 (comun.cache_render)
+TABLE_DIAGRAMAS = os.environ.get("TABLE_DIAGRAMAS", "t_diagramas")
+INDICE_USUARIO  = "usuario-fecha-index"
+# Atributos de LastEvaluatedKey: los de la tabla más los del índice consultado
+CLAVES_TABLA    = ("tenant_id", "created_at")
+CLAVES_USUARIO  = ("tenant_id", "created_at", "tenant_user")
+
+
+class CursorInvalido(ValueError):
+    def __init__(self):
+        super().__init__("next_token inválido")
+
+
+def _ahora_ordenable() -> str:
+    # Sufijo aleatorio para que dos diagramas del mismo instante no colisionen
+    ahora = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    return f"{ahora}#{uuid.uuid4().hex[:8]}"
+
+
+def _item(tenant_id: str, user_id: str, tipo: str, publicado, created_at: str = None) -> dict:
+    return {
+        "tenant_id":    tenant_id,
+        "created_at":   created_at or _ahora_ordenable(),
+        "tenant_user":  f"{tenant_id}#{user_id}",
+        "user_id":      user_id,
+        "tipo":         tipo,
+        "content_hash": publicado.digest,
+        "tamanio":      publicado.tamanio,
+        "s3_key":       publicado.s3_key
+    }
+
+
+def registrar_diagrama(tenant_id: str, user_id: str, tipo: str, publicado, created_at: str = None) -> dict:
+    item = _item(tenant_id, user_id, tipo, publicado, created_at)
+    runtime.tabla(TABLE_DIAGRAMAS).put_item(Item=item)
+    return item
+
+
+def registrar_diagramas(registros) -> list:
+    # registros: [(tenant_id, user_id, tipo, publicado)]. Un BatchWriteItem por
+    # cada 25 registros; batch_writer reintenta los no procesados
+    items = [_item(*registro) for registro in registros]
+    with runtime.tabla(TABLE_DIAGRAMAS).batch_writer() as lote:
+        for item in items:
+            lote.put_item(Item=item)
+    return items
+
+
+def codificar_cursor(last_evaluated_key) -> str:
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode()).decode()
+
+
+def decodificar_cursor(cursor: str, claves: tuple, fijos: dict) -> dict:
+    # El cursor lo trae el cliente: tiene que ser exactamente una clave de la
+    # consulta, con la partición de quien pregunta (fijos), o se podría
+    # arrancar la página en los diagramas de otro usuario
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise CursorInvalido()
+    if (not isinstance(datos, dict) or set(datos) != set(claves)
+            or not all(isinstance(v, str) for v in datos.values())
+            or any(datos[k] != v for k, v in fijos.items())):
+        raise CursorInvalido()
+    return datos
+
+
+def _consultar(limit: int, cursor: str, claves: tuple, fijos: dict, **consulta):
+    consulta["Limit"]            = limit
+    consulta["ScanIndexForward"] = False   # más recientes primero
+    if cursor:
+        consulta["ExclusiveStartKey"] = decodificar_cursor(cursor, claves, fijos)
+    try:
+        respuesta = runtime.tabla(TABLE_DIAGRAMAS).query(**consulta)
+    except ClientError as e:
+        # Un created_at que no es del formato esperado llega hasta DynamoDB
+        if cursor and e.response.get("Error", {}).get("Code") == "ValidationException":
+            raise CursorInvalido()
+        raise
+    return respuesta.get("Items", []), codificar_cursor(respuesta.get("LastEvaluatedKey"))
+
+
+def recientes_usuario(tenant_id: str, user_id: str, limit: int, cursor: str = None):
+    from boto3.dynamodb.conditions import Key
+    return _consultar(
+        limit, cursor, CLAVES_USUARIO, {"tenant_id": tenant_id, "tenant_user": f"{tenant_id}#{user_id}"},
+        IndexName              = INDICE_USUARIO,
+        KeyConditionExpression = Key("tenant_user").eq(f"{tenant_id}#{user_id}")
+    )
+
+
+def recientes_tenant(tenant_id: str, limit: int, cursor: str = None):
+    from boto3.dynamodb.conditions import Key
+    return _consultar(
+        limit, cursor, CLAVES_TABLA, {"tenant_id": tenant_id},
+        KeyConditionExpression = Key("tenant_id").eq(tenant_id)
+    )
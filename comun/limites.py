@@ -0,0 +1,78 @@
+import os
+import time
+from dataclasses import dataclass, fields, replace
+
+from comun import runtime
+from comun.lru import CacheLRU
+from comun.parser import GrafoJSON, normalizar_json
+
+# Límites de tamaño de los grafos y cuotas de solicitudes por tenant. Los
+# valores por defecto vienen del entorno; t_limites_tenant puede sobrescribir
+# cualquiera de ellos para un tenant concreto (atributos con el mismo nombre
+# que los campos)
+TABLE_LIMITES = os.environ.get("TABLE_LIMITES", "t_limites_tenant")
+LIMITES_TTL   = int(os.environ.get("LIMITES_CACHE_TTL", "300"))
+
+
+class LimiteExcedido(ValueError):
+    def __init__(self, mensaje: str, metricas: dict):
+        super().__init__(mensaje)
+        self.metricas = metricas
+
+
+@dataclass(frozen=True)
+class Limites:
+    max_nodos:          int  = int(os.environ.get("LIMITE_NODOS", "2000"))
+    max_aristas:        int  = int(os.environ.get("LIMITE_ARISTAS", "5000"))
+    max_grado:          int  = int(os.environ.get("LIMITE_GRADO", "200"))
+    max_profundidad:    int  = int(os.environ.get("LIMITE_PROFUNDIDAD", "200"))
+    declarar_colgantes: bool = os.environ.get("ARISTAS_COLGANTES", "declarar") == "declarar"
+    # Cuotas de solicitudes (ver comun/cuotas.py); 0 = sin límite
+    render_por_minuto:  int  = int(os.environ.get("CUOTA_RENDER_POR_MINUTO", "120"))
+    render_rafaga:      int  = int(os.environ.get("CUOTA_RENDER_RAFAGA", "30"))
+    listado_por_minuto: int  = int(os.environ.get("CUOTA_LISTADO_POR_MINUTO", "600"))
+    listado_rafaga:     int  = int(os.environ.get("CUOTA_LISTADO_RAFAGA", "100"))
+
+
+LIMITES_DEFECTO = Limites()
+
+# tenant_id -> (vence_en, Limites)
+_limites = CacheLRU(1024)
+
+
+def limites_tenant(tenant_id: str) -> Limites:
+    ahora    = time.time()
+    cacheado = _limites.get(tenant_id)
+    if cacheado is not None and ahora < cacheado[0]:
+        return cacheado[1]
+
+    item    = runtime.tabla(TABLE_LIMITES).get_item(Key={"tenant_id": tenant_id}).get("Item") or {}
+    propios = {c.name: c.type(item[c.name]) for c in fields(Limites) if c.name in item}
+    limites = replace(LIMITES_DEFECTO, **propios)
+    _limites.put(tenant_id, (ahora + LIMITES_TTL, limites))
+    return limites
+
+
+def verificar_limites(metricas: dict, limites: Limites):
+    for metrica, maximo in (
+        ("nodos",       limites.max_nodos),
+        ("aristas",     limites.max_aristas),
+        ("grado_max",   limites.max_grado),
+        ("profundidad", limites.max_profundidad)
+    ):
+        if metricas[metrica] > maximo:
+            raise LimiteExcedido(f"El diagrama excede el límite de {metrica}: {metricas[metrica]} > {maximo}", metricas)
+
+
+def validar_grafo_json(data, limites: Limites) -> GrafoJSON:
+    # El conteo de nodos se revisa antes de construir nada: una entrada enorme
+    # falla sin recorrerla
+    nodos = data.get("nodos") if isinstance(data, dict) else None
+    if isinstance(nodos, list) and len(nodos) > limites.max_nodos:
+        raise LimiteExcedido(
+            f"El diagrama excede el límite de nodos: {len(nodos)} > {limites.max_nodos}",
+            {"nodos": len(nodos)}
+        )
+    grafo = normalizar_json(data, limites.declarar_colgantes)
+    verificar_limites(grafo.metricas(), limites)
+    return grafo
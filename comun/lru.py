@@ -0,0 +1,37 @@
+import threading
+from collections import OrderedDict
+
+
+class CacheLRU:
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items    = OrderedDict()
+        self._lock     = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            return self._items.pop(key, None)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self._items)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
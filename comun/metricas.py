@@ -0,0 +1,129 @@
+import contextvars
+import functools
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+
+# Una línea de métricas por invocación en formato EMF (CloudWatch Embedded
+# Metric Format): CloudWatch la convierte en métricas sin llamadas a la API.
+# Las etapas se miden con `with etapa("nombre")` desde cualquier módulo; fuera
+# de un handler instrumentado (o en hilos del pool) no hacen nada
+NAMESPACE     = os.environ.get("METRICAS_NAMESPACE", "ApiDiagrama")
+LOG_MUESTREO  = float(os.environ.get("LOG_MUESTREO", "0.01"))
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", "2048"))
+# Se comparan en minúsculas
+HEADERS_SECRETOS = frozenset((
+    "authorization", "proxy-authorization", "x-api-key", "cookie", "set-cookie", "x-amz-security-token"
+))
+
+_actual   = contextvars.ContextVar("medicion", default=None)
+_en_frio  = True
+
+
+class Medicion:
+    def __init__(self, handler: str):
+        global _en_frio
+        self.handler     = handler
+        self.inicio      = time.perf_counter()
+        self.etapas      = {}   # etapa -> ms acumulados
+        self.valores     = {}   # métricas numéricas sueltas (bytes, contadores)
+        self.propiedades = {"cold_start": _en_frio}
+        _en_frio = False
+
+    def sumar(self, nombre: str, valor):
+        self.valores[nombre] = self.valores.get(nombre, 0) + valor
+
+    def emitir(self, respuesta):
+        total     = (time.perf_counter() - self.inicio) * 1000
+        metricas  = {f"{k}_ms": round(v, 2) for k, v in self.etapas.items()}
+        metricas["total_ms"] = round(total, 2)
+        metricas.update(self.valores)
+        if isinstance(respuesta, dict):
+            self.propiedades["status"] = respuesta.get("statusCode")
+            metricas["bytes_salida"]   = len(respuesta.get("body") or "")
+
+        unidades = [
+            {"Name": k, "Unit": "Milliseconds" if k.endswith("_ms") else "Bytes" if k.startswith("bytes") else "Count"}
+            for k in metricas
+        ]
+        print(json.dumps({
+            "_aws": {
+                "Timestamp":         int(time.time() * 1000),
+                "CloudWatchMetrics": [{"Namespace": NAMESPACE, "Dimensions": [["Handler"]], "Metrics": unidades}]
+            },
+            "Handler": self.handler,
+            **self.propiedades,
+            **metricas
+        }, default=str))
+
+
+@contextmanager
+def etapa(nombre: str):
+    medicion = _actual.get()
+    inicio   = time.perf_counter()
+    try:
+        yield
+    finally:
+        if medicion is not None:
+            ms = (time.perf_counter() - inicio) * 1000
+            medicion.etapas[nombre] = medicion.etapas.get(nombre, 0) + ms
+
+
+def sumar(nombre: str, valor=1):
+    medicion = _actual.get()
+    if medicion is not None:
+        medicion.sumar(nombre, valor)
+
+
+def propiedad(nombre: str, valor):
+    medicion = _actual.get()
+    if medicion is not None:
+        medicion.propiedades[nombre] = valor
+
+
+def _sin_secretos(event: dict) -> dict:
+    # API Gateway no normaliza mayúsculas en los headers (y los repite en
+    # multiValueHeaders); la API key también viaja en requestContext.identity
+    copia = dict(event)
+    for campo in ("headers", "multiValueHeaders"):
+        if isinstance(event.get(campo), dict):
+            copia[campo] = {
+                k: "***" if k.lower() in HEADERS_SECRETOS else v for k, v in event[campo].items()
+            }
+    contexto  = event.get("requestContext")
+    identidad = contexto.get("identity") if isinstance(contexto, dict) else None
+    if isinstance(identidad, dict) and identidad.get("apiKey"):
+        copia["requestContext"] = {**contexto, "identity": {**identidad, "apiKey": "***"}}
+    return copia
+
+
+def registrar_evento(logger, event):
+    # Reemplaza el volcado completo del evento: solo una muestra de las
+    # invocaciones, sin credenciales y recortada a LOG_MAX_BYTES
+    if random.random() >= LOG_MUESTREO:
+        return
+    texto = json.dumps(_sin_secretos(event), default=str)
+    if len(texto) > LOG_MAX_BYTES:
+        texto = texto[:LOG_MAX_BYTES] + f"... ({len(texto)} bytes)"
+    logger.info("Evento (muestra): %s", texto)
+
+
+def instrumentado(handler_nombre: str):
+    def decorador(handler):
+        @functools.wraps(handler)
+        def envoltura(event, context):
+            medicion = Medicion(handler_nombre)
+            if isinstance(event, dict):
+                medicion.sumar("bytes_entrada", len(event.get("body") or ""))
+            token     = _actual.set(medicion)
+            respuesta = None
+            try:
+                respuesta = handler(event, context)
+                return respuesta
+            finally:
+                _actual.reset(token)
+                medicion.emitir(respuesta)
+        return envoltura
+    return decorador
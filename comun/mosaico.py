@@ -0,0 +1,164 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from comun.firmador import obtener_firmador, prefijo_usuario
+from comun.generacion import generar_diagrama
+from comun.indice import registrar_diagrama
+from comun.parser import Grafo, GrafoJSON
+from comun.render import obtener_renderer
+
+# Render en mosaicos para grafos grandes: se parte el grafo en componentes
+# conexas, las componentes que superan MOSAICO_MAX_NODOS se cortan en bloques
+# contiguos en orden BFS y las pequeñas se empaquetan juntas. Cada mosaico se
+# renderiza por separado, en paralelo, más una vista general con un nodo por
+# mosaico y las conexiones entre ellos
+MOSAICO_MAX_NODOS = int(os.environ.get("MOSAICO_MAX_NODOS", "150"))
+MOSAICO_WORKERS   = int(os.environ.get("MOSAICO_WORKERS", "8"))
+
+
+@dataclass
+class GrafoPlano:
+    ids:       list   # índice -> id Mermaid
+    etiquetas: list   # índice -> etiqueta visible
+    aristas:   list   # [(origen, destino)]
+
+
+def desde_grafo(grafo: Grafo) -> GrafoPlano:
+    return GrafoPlano([n.replace(" ", "_") for n in grafo.nombres], list(grafo.nombres), grafo.aristas)
+
+
+def desde_grafo_json(grafo: GrafoJSON) -> GrafoPlano:
+    return GrafoPlano(grafo.ids, grafo.etiquetas, grafo.aristas)
+
+
+def quiere_mosaico(event) -> bool:
+    params = event.get("queryStringParameters") or {}
+    return str(params.get("mosaico", "")).lower() in ("true", "1")
+
+
+def particionar(grafo: GrafoPlano, max_nodos: int) -> list:
+    # Devuelve listas de índices de nodo, cada una de a lo sumo max_nodos
+    vecinos = [[] for _ in grafo.ids]
+    for origen, destino in grafo.aristas:
+        vecinos[origen].append(destino)
+        vecinos[destino].append(origen)
+
+    visto       = [False] * len(grafo.ids)
+    componentes = []
+    for inicio in range(len(grafo.ids)):
+        if visto[inicio]:
+            continue
+        visto[inicio] = True
+        orden = []
+        cola  = deque([inicio])
+        while cola:
+            nodo = cola.popleft()
+            orden.append(nodo)
+            for vecino in vecinos[nodo]:
+                if not visto[vecino]:
+                    visto[vecino] = True
+                    cola.append(vecino)
+        componentes.append(orden)
+
+    # Componentes grandes: bloques BFS contiguos (vecinos cerca del mismo corte).
+    # Pequeñas: first-fit decreasing para no generar miles de mosaicos sueltos
+    mosaicos = []
+    abiertos = []   # índices de mosaicos con espacio libre
+    for orden in sorted(componentes, key=len, reverse=True):
+        if len(orden) >= max_nodos:
+            mosaicos.extend(orden[i:i + max_nodos] for i in range(0, len(orden), max_nodos))
+            continue
+        for indice in abiertos:
+            if len(mosaicos[indice]) + len(orden) <= max_nodos:
+                mosaicos[indice].extend(orden)
+                break
+        else:
+            abiertos.append(len(mosaicos))
+            mosaicos.append(list(orden))
+    return mosaicos
+
+
+def _mermaid_mosaico(grafo: GrafoPlano, nodos: list, mosaico_de: list, indice: int, usados: set) -> str:
+    # Los extremos que viven en otro mosaico aparecen como nodos de referencia.
+    # Sus ids se numeran saltando los del grafo (usados): un nodo real puede
+    # llamarse ext_3. Solo formas que también entiende el render local
+    # (comun.svg_local)
+    partes  = ["graph TD\n"]
+    partes += [f'    {grafo.ids[n]}["{grafo.etiquetas[n]}"]\n' for n in nodos]
+    externos = {}
+    siguiente = 0
+    for origen, destino in grafo.aristas:
+        dentro_origen  = mosaico_de[origen] == indice
+        dentro_destino = mosaico_de[destino] == indice
+        if not (dentro_origen or dentro_destino):
+            continue
+        extremos = []
+        for nodo, dentro in ((origen, dentro_origen), (destino, dentro_destino)):
+            if dentro:
+                extremos.append(grafo.ids[nodo])
+            else:
+                if nodo not in externos:
+                    while f"ext_{siguiente}" in usados:
+                        siguiente += 1
+                    externos[nodo] = f"ext_{siguiente}"
+                    siguiente += 1
+                extremos.append(externos[nodo])
+        partes.append(f"    {extremos[0]} --> {extremos[1]}\n")
+    partes += [
+        f'    {ref}["↗ {grafo.etiquetas[n]} · mosaico {mosaico_de[n] + 1}"]\n'
+        for n, ref in externos.items()
+    ]
+    return "".join(partes)
+
+
+def _mermaid_vista(grafo: GrafoPlano, mosaicos: list, mosaico_de: list) -> str:
+    entre = {}
+    for origen, destino in grafo.aristas:
+        par = (mosaico_de[origen], mosaico_de[destino])
+        if par[0] != par[1]:
+            entre[par] = entre.get(par, 0) + 1
+    partes  = ["graph TD\n"]
+    partes += [f'    m{i + 1}["Mosaico {i + 1} · {len(nodos)} nodos"]\n' for i, nodos in enumerate(mosaicos)]
+    partes += [f"    m{o + 1} -->|{n}| m{d + 1}\n" for (o, d), n in entre.items()]
+    return "".join(partes)
+
+
+def generar_mosaicos(grafo: GrafoPlano, tenant_id: str, user_id: str, tipo: str, bucket: str,
+                     max_nodos: int = None, renderer=None) -> dict:
+    mosaicos   = particionar(grafo, max_nodos or MOSAICO_MAX_NODOS)
+    mosaico_de = [0] * len(grafo.ids)
+    for indice, nodos in enumerate(mosaicos):
+        for nodo in nodos:
+            mosaico_de[nodo] = indice
+
+    usados   = set(grafo.ids)
+    textos   = [_mermaid_mosaico(grafo, nodos, mosaico_de, i, usados) for i, nodos in enumerate(mosaicos)]
+    textos.append(_mermaid_vista(grafo, mosaicos, mosaico_de))
+    renderer = renderer or obtener_renderer()
+
+    def generar(mermaid_code):
+        return generar_diagrama(mermaid_code, tenant_id, user_id, tipo, bucket, renderer, indexar=False)
+
+    with ThreadPoolExecutor(max_workers=MOSAICO_WORKERS) as pool:
+        publicados = list(pool.map(generar, textos))
+
+    # En el índice queda solo la vista general
+    vista = publicados[-1]
+    if vista.nuevo:
+        registrar_diagrama(tenant_id, user_id, tipo, vista)
+
+    urls = obtener_firmador(bucket).firmar([p.s3_key for p in publicados], prefijo_usuario(tenant_id, user_id), expira=3600)
+    return {
+        "vista_url": urls[-1],
+        "mosaicos":  [
+            {
+                "indice":  i + 1,
+                "nodos":   len(nodos),
+                "url":     url
+            }
+            for i, (nodos, url) in enumerate(zip(mosaicos, urls))
+        ],
+        "aristas_entre_mosaicos": sum(1 for o, d in grafo.aristas if mosaico_de[o] != mosaico_de[d])
+    }
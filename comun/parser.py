@@ -0,0 +1,267 @@
+from dataclasses import dataclass, field
+
+# Parsers de /diagrama/aws, /diagrama/ER y /diagrama/json, compartidos por los
+# handlers y por los diagramas editables. El pseudocódigo se recorre una vez en
+# una representación intermedia (ids de nodo internados y aristas como pares de
+# índices) que editable.py y mosaico.py reutilizan sin volver a parsear.
+# Rinde igual que la versión anterior (benchmarks/bench_parser.py)
+
+SIMBOLOS_RELACION = ("||--", "}o--", "o{", "}o--o{")
+MARCAS_CLAVE      = {"PK", "FK", "UK"}
+
+
+@dataclass
+class Grafo:
+    nombres: list = field(default_factory=list)   # índice -> nombre del recurso
+    indices: dict = field(default_factory=dict)   # nombre -> índice
+    aristas: list = field(default_factory=list)   # [(origen, destino)] como índices
+
+    def nodo(self, nombre: str) -> int:
+        indice = self.indices.get(nombre)
+        if indice is None:
+            indice = self.indices[nombre] = len(self.nombres)
+            self.nombres.append(nombre)
+        return indice
+
+
+@dataclass
+class DiagramaER:
+    entidades:  dict = field(default_factory=dict)   # entidad -> [atributos]
+    relaciones: list = field(default_factory=list)
+
+
+def _lineas(texto: str):
+    for raw in texto.splitlines():
+        line = raw.strip()
+        if line:
+            yield line
+
+
+def _atributos(bloque: str) -> list:
+    # "string id string nombre PK" -> ["string id", "string nombre PK"]
+    tokens    = bloque.split()
+    atributos = []
+    i = 0
+    while i < len(tokens):
+        if i + 1 >= len(tokens):
+            raise ValueError(f"Atributo incompleto: “{tokens[i]}”")
+        partes = [tokens[i], tokens[i + 1]]
+        i += 2
+        while i < len(tokens) and tokens[i] in MARCAS_CLAVE:
+            partes.append(tokens[i])
+            i += 1
+        atributos.append(" ".join(partes))
+    return atributos
+
+
+def parsear_er(lineas) -> DiagramaER:
+    er = DiagramaER()
+    for line in lineas:
+        if "{" in line and "}" in line:
+            entidad, bloque = line.split("{", 1)
+            try:
+                er.entidades[entidad.strip()] = _atributos(bloque.rstrip("}"))
+            except ValueError as e:
+                raise ValueError(f"Línea ER inválida: “{line}” → {e}")
+        elif any(sym in line for sym in SIMBOLOS_RELACION):
+            er.relaciones.append(line)
+        else:
+            raise ValueError(f"Línea ER inválida: “{line}”")
+    return er
+
+
+def parsear_grafo(lineas) -> Grafo:
+    grafo   = Grafo()
+    indices = grafo.indices
+    nombres = grafo.nombres
+    aristas = grafo.aristas
+    for line in lineas:
+        try:
+            if "conectado a" in line:
+                origen_txt, destino_txt = line.split("conectado a")
+                extremos = (origen_txt, destino_txt)
+            else:
+                extremos = (line,)
+
+            ids = []
+            for fragmento in extremos:
+                _, nombre = fragmento.strip().split(" ", 1)
+                nombre = nombre.strip(' "\'')
+                indice = indices.get(nombre)
+                if indice is None:
+                    indice = indices[nombre] = len(nombres)
+                    nombres.append(nombre)
+                ids.append(indice)
+        except ValueError as e:
+            raise ValueError(f"Línea inválida: “{line}” → {e}")
+        if len(ids) == 2:
+            aristas.append((ids[0], ids[1]))
+    return grafo
+
+
+def parsear_pseudocodigo(pseudocodigo: str):
+    lineas = _lineas(pseudocodigo)
+    header = next(lineas, None)
+    if header is None:
+        raise ValueError("Pseudocódigo vacío")
+
+    header_lower = header.lower()
+    if header_lower.startswith("erdiagrama"):
+        return parsear_er(lineas)
+    if header_lower.startswith("diagrama"):
+        return parsear_grafo(lineas)
+
+    # Sin cabecera la primera línea ya es parte del grafo
+    def con_header():
+        yield header
+        yield from lineas
+    return parsear_grafo(con_header())
+
+
+def emitir_mermaid(diagrama):
+    # Generador de líneas: permite escribir a un stream sin armar el texto completo
+    if isinstance(diagrama, DiagramaER):
+        yield "erDiagram\n"
+        for entidad, attrs in diagrama.entidades.items():
+            yield f"    {entidad} {{\n"
+            for attr in attrs:
+                yield f"        {attr}\n"
+            yield "    }\n"
+        for rel in diagrama.relaciones:
+            yield f"    {rel}\n"
+        return
+
+    nombres = diagrama.nombres
+    ids     = [n.replace(" ", "_") for n in nombres]
+    yield "graph TD\n"
+    for i in sorted(range(len(nombres)), key=nombres.__getitem__):
+        yield f'    {ids[i]}["{nombres[i]}"]\n'
+    for orig, dest in diagrama.aristas:
+        yield f"    {ids[orig]} --> {ids[dest]}\n"
+
+
+def pseudocodigo_a_mermaid(pseudocodigo: str) -> str:
+    return "".join(emitir_mermaid(parsear_pseudocodigo(pseudocodigo)))
+
+
+@dataclass
+class GrafoJSON:
+    ids:        list = field(default_factory=list)   # índice -> id
+    etiquetas:  list = field(default_factory=list)   # índice -> etiqueta
+    indices:    dict = field(default_factory=dict)   # id -> índice
+    aristas:    list = field(default_factory=list)   # [(origen, destino)] sin repetir
+    salientes:  list = field(default_factory=list)   # índice -> [destinos]
+    grados:     list = field(default_factory=list)   # índice -> entrantes + salientes
+    colgantes:  int  = 0   # nodos declarados automáticamente por una conexión
+    duplicadas: int  = 0   # conexiones repetidas descartadas
+
+    def _agregar_nodo(self, id_nodo: str, etiqueta: str) -> int:
+        indice = self.indices[id_nodo] = len(self.ids)
+        self.ids.append(id_nodo)
+        self.etiquetas.append(etiqueta)
+        self.salientes.append([])
+        self.grados.append(0)
+        return indice
+
+    def profundidad(self) -> int:
+        # Camino más largo en capas (Kahn), O(nodos + aristas). Si quedan
+        # ciclos se libera el siguiente nodo pendiente para poder seguir
+        pendientes = [0] * len(self.ids)
+        for _, destino in self.aristas:
+            pendientes[destino] += 1
+        capa     = [0] * len(self.ids)
+        ubicado  = [False] * len(self.ids)
+        listos   = [i for i, p in enumerate(pendientes) if p == 0]
+        cursor   = 0
+        ubicados = 0
+        while ubicados < len(self.ids):
+            if not listos:
+                while ubicado[cursor]:
+                    cursor += 1
+                listos = [cursor]
+            nodo = listos.pop()
+            if ubicado[nodo]:
+                continue
+            ubicado[nodo] = True
+            ubicados += 1
+            for destino in self.salientes[nodo]:
+                if not ubicado[destino]:
+                    capa[destino] = max(capa[destino], capa[nodo] + 1)
+                    pendientes[destino] -= 1
+                    if pendientes[destino] == 0:
+                        listos.append(destino)
+        return max(capa, default=-1) + 1
+
+    def metricas(self) -> dict:
+        return {
+            "nodos":       len(self.ids),
+            "aristas":     len(self.aristas),
+            "grado_max":   max(self.grados, default=0),
+            "profundidad": self.profundidad(),
+            "colgantes":   self.colgantes,
+            "duplicadas":  self.duplicadas
+        }
+
+
+def normalizar_json(data: dict, declarar_colgantes: bool = True) -> GrafoJSON:
+    # Valida y normaliza la entrada de /diagrama/json en una sola pasada:
+    # ids únicos, conexiones sin repetir y, según declarar_colgantes, nodos
+    # implícitos declarados o rechazados. Todo antes de llamar al renderer
+    if not isinstance(data, dict):
+        raise ValueError("El JSON debe ser un objeto con 'nodos' y 'conexiones'.")
+    nodos      = data.get("nodos", [])
+    conexiones = data.get("conexiones", [])
+
+    if not nodos:
+        raise ValueError("El JSON debe contener una lista de 'nodos'.")
+    if not isinstance(nodos, list) or not isinstance(conexiones, list):
+        raise ValueError("'nodos' y 'conexiones' deben ser listas.")
+
+    grafo = GrafoJSON()
+    for nodo in nodos:
+        id_nodo = nodo.get("id")
+        if not id_nodo:
+            raise ValueError("Cada nodo debe tener un 'id'.")
+        etiqueta = str(nodo.get("etiqueta", id_nodo)).replace('"', "'").replace("\n", " ")
+        indice   = grafo.indices.get(id_nodo)
+        if indice is None:
+            grafo._agregar_nodo(id_nodo, etiqueta)
+        elif grafo.etiquetas[indice] != etiqueta:
+            raise ValueError(f"Nodo duplicado con etiquetas distintas: “{id_nodo}”")
+
+    vistas = set()
+    for conexion in conexiones:
+        origen  = conexion.get("origen")
+        destino = conexion.get("destino")
+        if not origen or not destino:
+            raise ValueError("Cada conexión debe tener 'origen' y 'destino'.")
+        extremos = []
+        for id_nodo in (origen, destino):
+            indice = grafo.indices.get(id_nodo)
+            if indice is None:
+                if not declarar_colgantes:
+                    raise ValueError(f"Conexión hacia un nodo no declarado: “{id_nodo}”")
+                indice = grafo._agregar_nodo(id_nodo, id_nodo)
+                grafo.colgantes += 1
+            extremos.append(indice)
+        arista = (extremos[0], extremos[1])
+        if arista in vistas:
+            grafo.duplicadas += 1
+            continue
+        vistas.add(arista)
+        grafo.aristas.append(arista)
+        grafo.salientes[arista[0]].append(arista[1])
+        grafo.grados[arista[0]] += 1
+        grafo.grados[arista[1]] += 1
+    return grafo
+
+
+def grafo_json_a_mermaid(grafo: GrafoJSON) -> str:
+    partes = ["graph TD\n"]
+    partes.extend(f'    {i}["{e}"]\n' for i, e in zip(grafo.ids, grafo.etiquetas))
+    partes.extend(f"    {grafo.ids[o]} --> {grafo.ids[d]}\n" for o, d in grafo.aristas)
+    return "".join(partes)
+
+
+def json_a_mermaid(data: dict) -> str:
+    return grafo_json_a_mermaid(normalizar_json(data))
@@ -0,0 +1,106 @@
+import base64
+import io
+import os
+
+from comun import runtime
+from comun.svg_local import DiagramaNoSoportado, mermaid_a_svg
+
+MERMAID_INK_URL  = "https://mermaid.ink/"
+RENDERER_DEFECTO  = os.environ.get("RENDERER", "local")
+
+
+class ErrorRender(Exception):
+    pass
+
+
+class Renderer:
+    nombre       = ""
+    extension    = ""
+    content_type = ""
+
+    def renderizar(self, mermaid_code: str) -> bytes:
+        raise NotImplementedError
+
+    def abrir(self, mermaid_code: str):
+        # Imagen como stream (read/close) para subirla a S3 sin tenerla entera en memoria
+        return io.BytesIO(self.renderizar(mermaid_code))
+
+
+class _StreamHTTP:
+    def __init__(self, respuesta):
+        self._raw = respuesta.raw
+        self._raw.decode_content = True
+
+    def read(self, n=-1):
+        return self._raw.read(n if n is not None and n >= 0 else None)
+
+    def close(self):
+        # Devuelve la conexión al pool de runtime.http() en vez de cerrarla
+        self._raw.drain_conn()
+        self._raw.release_conn()
+
+
+class RendererMermaidInk(Renderer):
+    # /img/ devuelve JPEG salvo que se pida ?type=png
+    nombre       = "mermaid_ink"
+    extension    = "png"
+    content_type = "image/png"
+    ruta         = "img/{}?type=png"
+
+    def _pedir(self, mermaid_code: str, stream: bool):
+        import requests   # solo este renderer lo necesita (ver comun/runtime.py)
+        encoded = base64.urlsafe_b64encode(mermaid_code.encode()).decode()
+        url     = MERMAID_INK_URL + self.ruta.format(encoded)
+        try:
+            img_resp = runtime.http().get(url, timeout=10, stream=stream)
+        except requests.RequestException as e:
+            raise ErrorRender(f"mermaid.ink no disponible: {e}")
+        if img_resp.status_code != 200:
+            img_resp.close()
+            raise ErrorRender(f"mermaid.ink respondió {img_resp.status_code}")
+        return img_resp
+
+    def renderizar(self, mermaid_code: str) -> bytes:
+        return self._pedir(mermaid_code, stream=False).content
+
+    def abrir(self, mermaid_code: str):
+        return _StreamHTTP(self._pedir(mermaid_code, stream=True))
+
+
+class RendererMermaidInkSVG(RendererMermaidInk):
+    nombre       = "mermaid_ink_svg"
+    extension    = "svg"
+    content_type = "image/svg+xml"
+    ruta         = "svg/{}"
+
+
+class RendererMermaidInkPDF(RendererMermaidInk):
+    nombre       = "mermaid_ink_pdf"
+    extension    = "pdf"
+    content_type = "application/pdf"
+    ruta         = "pdf/{}?fit"
+
+
+class RendererSVGLocal(Renderer):
+    nombre       = "local"
+    extension    = "svg"
+    content_type = "image/svg+xml"
+
+    def renderizar(self, mermaid_code: str) -> bytes:
+        try:
+            return mermaid_a_svg(mermaid_code).encode()
+        except DiagramaNoSoportado as e:
+            raise ErrorRender(str(e))
+
+
+RENDERERS = {
+    r.nombre: r
+    for r in (RendererMermaidInk(), RendererMermaidInkSVG(), RendererMermaidInkPDF(), RendererSVGLocal())
+}
+
+
+def obtener_renderer(nombre: str = None) -> Renderer:
+    nombre = nombre or RENDERER_DEFECTO
+    if nombre not in RENDERERS:
+        raise ValueError(f"Renderer desconocido: {nombre}")
+    return RENDERERS[nombre]
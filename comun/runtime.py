@@ -0,0 +1,107 @@
+import os
+import threading
+
+# Los clientes se construyen una sola vez por contenedor y se reutilizan en
+# cada invocación "warm" (mismo pool de conexiones, sin repetir el handshake TLS).
+# boto3 (~200 ms) y requests (~100 ms) se importan recién al crear el primer
+# cliente: los handlers que no los usan no pagan ese costo en el cold start
+POOL_CONEXIONES = int(os.environ.get("POOL_CONEXIONES", "50"))
+
+_lock     = threading.RLock()
+_clientes = {}
+
+
+def _obtener(nombre, fabrica):
+    cliente = _clientes.get(nombre)
+    if cliente is None:
+        with _lock:
+            cliente = _clientes.get(nombre)
+            if cliente is None:
+                cliente = _clientes[nombre] = fabrica()
+    return cliente
+
+
+def _nueva_sesion_aws():
+    import boto3
+    return boto3.session.Session()
+
+
+def _sesion_aws():
+    # boto3.client()/resource() sobre la sesión por defecto no es thread-safe
+    return _obtener("sesion", _nueva_sesion_aws)
+
+
+def _nueva_config_aws():
+    from botocore.config import Config
+    return Config(
+        max_pool_connections = POOL_CONEXIONES,
+        tcp_keepalive        = True,
+        connect_timeout      = 3,
+        read_timeout         = 10,
+        retries              = {"max_attempts": 5, "mode": "adaptive"}
+    )
+
+
+def config_aws():
+    return _obtener("config_aws", _nueva_config_aws)
+
+
+def _nueva_config_transferencia():
+    # Subidas en streaming: multipart a partir de 8 MB, con partes en paralelo
+    from boto3.s3.transfer import TransferConfig
+    return TransferConfig(
+        multipart_threshold = 8 * 1024 * 1024,
+        multipart_chunksize = 8 * 1024 * 1024,
+        max_concurrency     = 4
+    )
+
+
+def config_transferencia():
+    return _obtener("config_transferencia", _nueva_config_transferencia)
+
+
+def credenciales():
+    return _sesion_aws().get_credentials()
+
+
+def s3():
+    return _obtener("s3", lambda: _sesion_aws().client("s3", config=config_aws()))
+
+
+def dynamodb():
+    return _obtener("dynamodb", lambda: _sesion_aws().resource("dynamodb", config=config_aws()))
+
+
+def tabla(nombre: str):
+    return _obtener(f"tabla:{nombre}", lambda: dynamodb().Table(nombre))
+
+
+def lambda_client():
+    return _obtener("lambda", lambda: _sesion_aws().client("lambda", config=config_aws()))
+
+
+def sqs():
+    return _obtener("sqs", lambda: _sesion_aws().client("sqs", config=config_aws()))
+
+
+def _nueva_sesion_http():
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    reintentos = Retry(
+        total            = 2,
+        backoff_factor   = 0.3,
+        status_forcelist = (429, 500, 502, 503, 504),
+        allowed_methods  = frozenset(["GET", "HEAD"]),
+        raise_on_status  = False   # agotados los reintentos se devuelve la última respuesta
+    )
+    adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_CONEXIONES, max_retries=reintentos)
+    sesion    = requests.Session()
+    sesion.mount("https://", adaptador)
+    sesion.mount("http://", adaptador)
+    return sesion
+
+
+def http():
+    return _obtener("http", _nueva_sesion_http)
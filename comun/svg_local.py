@@ -0,0 +1,238 @@
+import re
+from xml.sax.saxutils import escape
+
+# Render SVG local (sin red) para los diagramas que generan pseudocodigo_a_mermaid
+# y json_a_mermaid: "graph TD" (nodos/aristas) y "erDiagram" (entidades/relaciones)
+
+NODO_ALTO      = 40
+FILA_ALTO      = 22
+SEP_HORIZONTAL = 40
+SEP_CAPAS      = 70
+MARGEN         = 20
+ANCHO_CARACTER = 8
+
+RE_NODO     = re.compile(r'^(\S+?)\s*\["(.*)"\]$')
+RE_ARISTA   = re.compile(r'^(\S+?)\s*-->\s*(?:\|([^|]*)\|\s*)?(\S+)$')
+RE_ENTIDAD  = re.compile(r'^(\S+)\s*\{$')
+RE_RELACION = re.compile(r'^(\S+)\s+([|}o{]{2}(?:--|\.\.)[|}o{]{2})\s+(\S+)\s*(?::\s*(.*))?$')
+
+
+class DiagramaNoSoportado(ValueError):
+    pass
+
+
+def _ancho_texto(texto: str) -> int:
+    return len(texto) * ANCHO_CARACTER
+
+
+def parsear_grafo(lineas):
+    nodos   = {}   # id -> etiqueta, en orden de declaración
+    aristas = []   # (origen, destino, etiqueta)
+    for linea in lineas:
+        m = RE_NODO.match(linea)
+        if m:
+            nodos[m.group(1)] = m.group(2)
+            continue
+        m = RE_ARISTA.match(linea)
+        if m:
+            origen, etiqueta, destino = m.groups()
+            nodos.setdefault(origen, origen)
+            nodos.setdefault(destino, destino)
+            aristas.append((origen, destino, (etiqueta or "").strip()))
+            continue
+        raise DiagramaNoSoportado(f"Línea no soportada: {linea}")
+    return nodos, aristas
+
+
+def parsear_er(lineas):
+    entidades  = {}   # nombre -> [atributos]
+    relaciones = []   # (origen, cardinalidad, destino, etiqueta)
+    actual     = None
+    for linea in lineas:
+        if actual is not None:
+            if linea == "}":
+                actual = None
+            else:
+                entidades[actual].append(linea)
+            continue
+        m = RE_ENTIDAD.match(linea)
+        if m:
+            actual = m.group(1)
+            entidades.setdefault(actual, [])
+            continue
+        m = RE_RELACION.match(linea)
+        if m:
+            origen, cardinalidad, destino, etiqueta = m.groups()
+            entidades.setdefault(origen, [])
+            entidades.setdefault(destino, [])
+            relaciones.append((origen, cardinalidad, destino, (etiqueta or "").strip('"')))
+            continue
+        raise DiagramaNoSoportado(f"Línea ER no soportada: {linea}")
+    if actual is not None:
+        raise DiagramaNoSoportado(f"Entidad sin cerrar: {actual}")
+    return entidades, relaciones
+
+
+def _capas(nodos, aristas):
+    # Capa = camino más largo desde una fuente (Kahn). Los ciclos se rompen
+    # tomando el nodo pendiente con menos predecesores sin ubicar
+    sucesores  = {n: [] for n in nodos}
+    pendientes = {n: 0 for n in nodos}
+    for origen, destino in aristas:
+        if origen != destino:
+            sucesores[origen].append(destino)
+            pendientes[destino] += 1
+
+    capa     = {n: 0 for n in nodos}
+    orden    = {n: i for i, n in enumerate(nodos)}
+    listos   = [n for n in nodos if pendientes[n] == 0]
+    ubicados = set()
+    while len(ubicados) < len(nodos):
+        if not listos:
+            restantes = [n for n in nodos if n not in ubicados]
+            listos = [min(restantes, key=lambda n: (pendientes[n], orden[n]))]
+        siguiente = []
+        for n in listos:
+            if n in ubicados:
+                continue
+            ubicados.add(n)
+            for s in sucesores[n]:
+                if s in ubicados:
+                    continue
+                capa[s] = max(capa[s], capa[n] + 1)
+                pendientes[s] -= 1
+                if pendientes[s] == 0:
+                    siguiente.append(s)
+        listos = siguiente
+    return capa
+
+
+def _layout(nodos, aristas, tamanios):
+    capa     = _capas(nodos, aristas)
+    por_capa = {}
+    for n in nodos:
+        por_capa.setdefault(capa[n], []).append(n)
+
+    predecesores = {n: [] for n in nodos}
+    for origen, destino in aristas:
+        predecesores[destino].append(origen)
+
+    # Una pasada de baricentros para reducir cruces entre capas consecutivas
+    posicion = {}
+    for nivel in sorted(por_capa):
+        fila = por_capa[nivel]
+        for i, n in enumerate(fila):
+            previos = [posicion[p] for p in predecesores[n] if p in posicion and capa[p] < nivel]
+            posicion[n] = sum(previos) / len(previos) if previos else float(i)
+        fila.sort(key=lambda n: posicion[n])
+        for i, n in enumerate(fila):
+            posicion[n] = float(i)
+
+    anchos_capa = {
+        nivel: sum(tamanios[n][0] for n in fila) + SEP_HORIZONTAL * (len(fila) - 1)
+        for nivel, fila in por_capa.items()
+    }
+    ancho_total = max(anchos_capa.values(), default=0) + 2 * MARGEN
+
+    cajas = {}
+    y = MARGEN
+    for nivel in sorted(por_capa):
+        fila = por_capa[nivel]
+        alto_capa = max(tamanios[n][1] for n in fila)
+        x = (ancho_total - anchos_capa[nivel]) / 2
+        for n in fila:
+            ancho, alto = tamanios[n]
+            cajas[n] = (x, y, ancho, alto)
+            x += ancho + SEP_HORIZONTAL
+        y += alto_capa + SEP_CAPAS
+    alto_total = y - SEP_CAPAS + MARGEN
+    return cajas, ancho_total, max(alto_total, 2 * MARGEN)
+
+
+def _extremos(caja_origen, caja_destino):
+    xo, yo, wo, ho = caja_origen
+    xd, yd, wd, hd = caja_destino
+    if yd > yo:
+        return xo + wo / 2, yo + ho, xd + wd / 2, yd
+    if yd < yo:
+        return xo + wo / 2, yo, xd + wd / 2, yd + hd
+    if xd > xo:
+        return xo + wo, yo + ho / 2, xd, yd + hd / 2
+    return xo, yo + ho / 2, xd + wd, yd + hd / 2
+
+
+def _svg(ancho, alto, cuerpo):
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{ancho:.0f}" height="{alto:.0f}" '
+        f'viewBox="0 0 {ancho:.0f} {alto:.0f}" font-family="sans-serif" font-size="13">'
+        '<defs><marker id="flecha" viewBox="0 0 10 10" refX="10" refY="5" markerWidth="8" '
+        'markerHeight="8" orient="auto-start-reverse"><path d="M0,0L10,5L0,10z" fill="#333"/></marker></defs>'
+        f'<rect width="100%" height="100%" fill="white"/>{"".join(cuerpo)}</svg>'
+    )
+
+
+def svg_grafo(nodos, aristas) -> str:
+    tamanios = {n: (max(80, _ancho_texto(etiqueta) + 24), NODO_ALTO) for n, etiqueta in nodos.items()}
+    cajas, ancho, alto = _layout(nodos, [(origen, destino) for origen, destino, _ in aristas], tamanios)
+
+    cuerpo = []
+    for origen, destino, etiqueta in aristas:
+        x1, y1, x2, y2 = _extremos(cajas[origen], cajas[destino])
+        cuerpo.append(
+            f'<line x1="{x1:.1f}" y1="{y1:.1f}" x2="{x2:.1f}" y2="{y2:.1f}" '
+            'stroke="#333" marker-end="url(#flecha)"/>'
+        )
+        if etiqueta:
+            cuerpo.append(
+                f'<text x="{(x1 + x2) / 2 + 4:.1f}" y="{(y1 + y2) / 2:.1f}" font-size="11">{escape(etiqueta)}</text>'
+            )
+    for n, etiqueta in nodos.items():
+        x, y, w, h = cajas[n]
+        cuerpo.append(
+            f'<rect x="{x:.1f}" y="{y:.1f}" width="{w}" height="{h}" rx="4" fill="#ECECFF" stroke="#9370DB"/>'
+            f'<text x="{x + w / 2:.1f}" y="{y + h / 2 + 4:.1f}" text-anchor="middle">{escape(etiqueta)}</text>'
+        )
+    return _svg(ancho, alto, cuerpo)
+
+
+def svg_er(entidades, relaciones) -> str:
+    tamanios = {}
+    for nombre, atributos in entidades.items():
+        ancho = max([_ancho_texto(nombre)] + [_ancho_texto(a) for a in atributos]) + 24
+        tamanios[nombre] = (max(100, ancho), FILA_ALTO * (1 + len(atributos)) + 6)
+    aristas = [(origen, destino) for origen, _, destino, _ in relaciones]
+    cajas, ancho, alto = _layout(entidades, aristas, tamanios)
+
+    cuerpo = []
+    for origen, cardinalidad, destino, etiqueta in relaciones:
+        x1, y1, x2, y2 = _extremos(cajas[origen], cajas[destino])
+        texto = f"{cardinalidad} {etiqueta}".strip()
+        cuerpo.append(
+            f'<line x1="{x1:.1f}" y1="{y1:.1f}" x2="{x2:.1f}" y2="{y2:.1f}" stroke="#333"/>'
+            f'<text x="{(x1 + x2) / 2 + 4:.1f}" y="{(y1 + y2) / 2:.1f}" font-size="11">{escape(texto)}</text>'
+        )
+    for nombre, atributos in entidades.items():
+        x, y, w, h = cajas[nombre]
+        cuerpo.append(
+            f'<rect x="{x:.1f}" y="{y:.1f}" width="{w}" height="{h}" fill="white" stroke="#9370DB"/>'
+            f'<rect x="{x:.1f}" y="{y:.1f}" width="{w}" height="{FILA_ALTO}" fill="#ECECFF" stroke="#9370DB"/>'
+            f'<text x="{x + w / 2:.1f}" y="{y + 15:.1f}" text-anchor="middle" font-weight="bold">{escape(nombre)}</text>'
+        )
+        for i, atributo in enumerate(atributos, start=1):
+            cuerpo.append(
+                f'<text x="{x + 8:.1f}" y="{y + FILA_ALTO * i + 15:.1f}">{escape(atributo)}</text>'
+            )
+    return _svg(ancho, alto, cuerpo)
+
+
+def mermaid_a_svg(mermaid_code: str) -> str:
+    lineas = [l.strip() for l in mermaid_code.splitlines() if l.strip()]
+    if not lineas:
+        raise DiagramaNoSoportado("Diagrama vacío")
+
+    cabecera, cuerpo = lineas[0], lineas[1:]
+    if cabecera == "erDiagram":
+        return svg_er(*parsear_er(cuerpo))
+    if cabecera.split()[0] in ("graph", "flowchart"):
+        return svg_grafo(*parsear_grafo(cuerpo))
+    raise DiagramaNoSoportado(f"Tipo de diagrama no soportado: {cabecera}")
@@ -0,0 +1,165 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from comun import runtime
+
+logger = logging.getLogger()
+
+# Tokens firmados (HMAC-SHA256) con tenant, usuario y expiración: se verifican
+# localmente sin leer t_tokens_acceso2 ni t_usuarios3. Formato:
+#   v1.<payload base64url>.<firma base64url>
+PREFIJO_FIRMADO     = "v1."
+REVOCADOS_REFRESCO  = int(os.environ.get("TOKEN_REVOCADOS_REFRESCO", "60"))
+REVOCADOS_REINTENTO = int(os.environ.get("TOKEN_REVOCADOS_REINTENTO", "5"))
+MODOS               = ("opaco", "firmado")
+
+
+class TokenInvalido(Exception):
+    pass
+
+
+def _b64(datos: bytes) -> str:
+    return base64.urlsafe_b64encode(datos).rstrip(b"=").decode()
+
+
+def _b64_decode(texto: str) -> bytes:
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+def _secretos() -> list:
+    # El secreto anterior sigue validando tokens durante una rotación
+    secretos = [os.environ.get("TOKEN_SECRET"), os.environ.get("TOKEN_SECRET_ANTERIOR")]
+    return [s.encode() for s in secretos if s]
+
+
+def verificar_modo(modo: str):
+    # Al importar el handler de login: una configuración incompleta falla en
+    # el cold start con un mensaje claro, no en cada login
+    if modo not in MODOS:
+        raise RuntimeError(f"TOKEN_MODO desconocido: {modo}. Use opaco o firmado")
+    if modo == "firmado" and not os.environ.get("TOKEN_SECRET"):
+        raise RuntimeError("TOKEN_MODO=firmado requiere TOKEN_SECRET")
+
+
+def _firma(secreto: bytes, payload: str) -> str:
+    return _b64(hmac.new(secreto, payload.encode(), hashlib.sha256).digest())
+
+
+def es_token_firmado(token: str) -> bool:
+    return token.startswith(PREFIJO_FIRMADO)
+
+
+def emitir_token(tenant_id: str, user_id: str, ttl: int = 3600):
+    secretos = _secretos()
+    if not secretos:
+        raise RuntimeError("TOKEN_SECRET no configurado")
+    expira   = int(time.time()) + ttl
+    datos    = {"t": tenant_id, "u": user_id, "e": expira, "j": uuid.uuid4().hex}
+    payload  = _b64(json.dumps(datos, separators=(",", ":")).encode())
+    token    = f"{PREFIJO_FIRMADO}{payload}.{_firma(secretos[0], payload)}"
+    return token, expira
+
+
+def _decodificar(token: str) -> dict:
+    try:
+        payload, firma = token[len(PREFIJO_FIRMADO):].split(".")
+    except ValueError:
+        raise TokenInvalido("Token mal formado")
+    secretos = _secretos()
+    if not secretos:
+        # Despliegue en modo opaco: un "v1." es solo un token que no existe
+        raise TokenInvalido("Tokens firmados no habilitados")
+    # Se comparan bytes: compare_digest con str rechaza (TypeError) lo no ASCII
+    firma = firma.encode()
+    if not any(hmac.compare_digest(firma, _firma(s, payload).encode()) for s in secretos):
+        raise TokenInvalido("Firma inválida")
+    try:
+        return json.loads(_b64_decode(payload))
+    except ValueError:
+        raise TokenInvalido("Token mal formado")
+
+
+class ListaRevocados:
+    # Copia en memoria de t_tokens_revocados, refrescada cada REVOCADOS_REFRESCO
+    # segundos. Sin TABLE_TOKENS_REVOCADOS no hay revocación. Si un scan falla
+    # no se reintenta hasta pasados `reintento` segundos: mientras tanto se usa
+    # la última copia, o se rechaza si nunca se pudo cargar
+    def __init__(self, tabla: str, refresco: int, reintento: int = REVOCADOS_REINTENTO):
+        self.tabla          = tabla
+        self.refresco       = refresco
+        self.reintento      = reintento
+        self._jtis          = frozenset()
+        self._cargado_en    = 0.0
+        self._reintentar_en = 0.0
+        self._lock          = threading.Lock()
+
+    def _cargar(self):
+        from boto3.dynamodb.conditions import Attr
+        ahora  = int(time.time())
+        jtis   = set()
+        kwargs = {"ProjectionExpression": "jti", "FilterExpression": Attr("expira_en").gt(ahora)}
+        while True:
+            respuesta = runtime.tabla(self.tabla).scan(**kwargs)
+            jtis.update(item["jti"] for item in respuesta.get("Items", []))
+            if "LastEvaluatedKey" not in respuesta:
+                break
+            kwargs["ExclusiveStartKey"] = respuesta["LastEvaluatedKey"]
+        self._jtis = frozenset(jtis)
+
+    def _vencida(self) -> bool:
+        ahora = time.time()
+        return ahora - self._cargado_en > self.refresco and ahora >= self._reintentar_en
+
+    def contiene(self, jti: str) -> bool:
+        if self._vencida():
+            with self._lock:
+                if self._vencida():
+                    try:
+                        self._cargar()
+                        self._cargado_en = time.time()
+                    except Exception:
+                        self._reintentar_en = time.time() + self.reintento
+                        logger.exception("No se pudo cargar %s", self.tabla)
+        if not self._cargado_en:
+            raise RuntimeError("Lista de tokens revocados no disponible")
+        return jti in self._jtis
+
+
+_revocados = None
+
+
+def _lista_revocados():
+    global _revocados
+    tabla = os.environ.get("TABLE_TOKENS_REVOCADOS")
+    if not tabla:
+        return None
+    if _revocados is None:
+        _revocados = ListaRevocados(tabla, REVOCADOS_REFRESCO)
+    return _revocados
+
+
+def verificar_token(token: str) -> dict:
+    datos = _decodificar(token)
+    if datos["e"] < time.time():
+        raise TokenInvalido("Token expirado")
+    revocados = _lista_revocados()
+    if revocados is not None and revocados.contiene(datos["j"]):
+        raise TokenInvalido("Token revocado")
+    return {"tenant_id": datos["t"], "user_id": datos["u"], "expira": datos["e"], "jti": datos["j"]}
+
+
+def revocar_token(token: str):
+    datos = _decodificar(token)
+    runtime.tabla(os.environ["TABLE_TOKENS_REVOCADOS"]).put_item(Item={
+        "jti":       datos["j"],
+        "tenant_id": datos["t"],
+        "user_id":   datos["u"],
+        "expira_en": datos["e"]
+    })
@@ -0,0 +1,200 @@
+import json
+import logging
+import os
+import time
+import uuid
+
+from comun import runtime
+from comun.exportacion import clave_exportacion, exportar_usuario
+from comun.generacion import generar_diagrama
+from comun.render import ErrorRender, obtener_renderer
+
+logger = logging.getLogger()
+
+TABLE_TRABAJOS = os.environ.get("TABLE_TRABAJOS", "t_trabajos_diagrama")
+TRABAJO_TTL    = 7 * 24 * 3600
+# Límite de SQS: 256 KB por mensaje. Por encima el código Mermaid va a S3
+MAX_MENSAJE    = 200 * 1024
+
+# Las exportaciones van por su propia cola (y worker con más timeout) para no
+# demorar los renders
+COLA_RENDER      = "COLA_RENDER_URL"
+COLA_EXPORTACION = "COLA_EXPORTACION_URL"
+EXPORTACION      = "exportacion"
+
+# Igual al maxReceiveCount de las colas (serverless.yml): en el último intento
+# el trabajo se marca con error, porque después el mensaje pasa a la DLQ
+MAX_RECEPCIONES = int(os.environ.get("TRABAJOS_MAX_RECEPCIONES", "3"))
+
+PENDIENTE  = "pendiente"
+PROCESANDO = "procesando"
+COMPLETADO = "completado"
+ERROR      = "error"
+
+
+class ColaSQS:
+    def __init__(self, url: str):
+        self.url = url
+
+    def enviar(self, mensaje: dict):
+        runtime.sqs().send_message(QueueUrl=self.url, MessageBody=json.dumps(mensaje))
+
+
+class ColaMemoria:
+    # Sustituto local de SQS para pruebas: los mensajes se procesan con
+    # procesar_evento(cola.como_evento_sqs(), bucket)
+    def __init__(self):
+        self.mensajes = []
+
+    def enviar(self, mensaje: dict):
+        self.mensajes.append(json.dumps(mensaje))
+
+    def como_evento_sqs(self) -> dict:
+        records = [
+            {"messageId": str(i), "body": body, "attributes": {"ApproximateReceiveCount": "1"}}
+            for i, body in enumerate(self.mensajes)
+        ]
+        self.mensajes = []
+        return {"Records": records}
+
+
+_colas = {}
+
+
+def obtener_cola(variable: str = COLA_RENDER):
+    cola = _colas.get(variable)
+    if cola is None:
+        url  = os.environ.get(variable)
+        cola = _colas[variable] = ColaSQS(url) if url else ColaMemoria()
+    return cola
+
+
+def es_async(event) -> bool:
+    params = event.get("queryStringParameters") or {}
+    return str(params.get("async", "")).lower() in ("true", "1")
+
+
+def _clave_fuente(job_id: str) -> str:
+    return f"trabajos/{job_id}.mmd"
+
+
+def _crear_trabajo(tenant_id: str, user_id: str, **campos) -> str:
+    job_id = str(uuid.uuid4())
+    ahora  = int(time.time())
+    runtime.tabla(TABLE_TRABAJOS).put_item(Item={
+        "job_id":    job_id,
+        "estado":    PENDIENTE,
+        "tenant_id": tenant_id,
+        "user_id":   user_id,
+        "creado_en": ahora,
+        "expira_en": ahora + TRABAJO_TTL,
+        **campos
+    })
+    return job_id
+
+
+def encolar_render(mermaid_code: str, tenant_id: str, user_id: str, tipo: str, bucket: str,
+                   renderer=None) -> str:
+    job_id = _crear_trabajo(tenant_id, user_id)
+
+    mensaje = {
+        "job_id":    job_id,
+        "tenant_id": tenant_id,
+        "user_id":   user_id,
+        "tipo":      tipo,
+        "renderer":  (renderer or obtener_renderer()).nombre
+    }
+    if len(mermaid_code.encode()) > MAX_MENSAJE:
+        runtime.s3().put_object(Bucket=bucket, Key=_clave_fuente(job_id), Body=mermaid_code.encode())
+        mensaje["fuente_s3"] = _clave_fuente(job_id)
+    else:
+        mensaje["mermaid_code"] = mermaid_code
+
+    obtener_cola().enviar(mensaje)
+    return job_id
+
+
+def encolar_exportacion(tenant_id: str, user_id: str) -> str:
+    job_id = _crear_trabajo(tenant_id, user_id, tipo=EXPORTACION)
+    obtener_cola(COLA_EXPORTACION).enviar({
+        "job_id":    job_id,
+        "tenant_id": tenant_id,
+        "user_id":   user_id,
+        "tipo":      EXPORTACION
+    })
+    return job_id
+
+
+def actualizar_estado(job_id: str, estado: str, **campos):
+    campos["estado"]         = estado
+    campos["actualizado_en"] = int(time.time())
+    nombres = {f"#{k}": k for k in campos}
+    valores = {f":{k}": v for k, v in campos.items()}
+    runtime.tabla(TABLE_TRABAJOS).update_item(
+        Key                       = {"job_id": job_id},
+        UpdateExpression          = "SET " + ", ".join(f"#{k} = :{k}" for k in campos),
+        ExpressionAttributeNames  = nombres,
+        ExpressionAttributeValues = valores
+    )
+
+
+def obtener_trabajo(job_id: str):
+    return runtime.tabla(TABLE_TRABAJOS).get_item(Key={"job_id": job_id}).get("Item")
+
+
+def _procesar_exportacion(mensaje: dict, bucket: str):
+    job_id  = mensaje["job_id"]
+    destino = clave_exportacion(mensaje["tenant_id"], mensaje["user_id"], job_id)
+    # Un fallo acá es transitorio (S3): el mensaje vuelve a la cola
+    resultado = exportar_usuario(mensaje["tenant_id"], mensaje["user_id"], bucket, destino)
+    actualizar_estado(job_id, COMPLETADO, s3_key=destino, **resultado)
+
+
+def procesar_mensaje(mensaje: dict, bucket: str):
+    job_id = mensaje["job_id"]
+    actualizar_estado(job_id, PROCESANDO)
+    if mensaje.get("tipo") == EXPORTACION:
+        _procesar_exportacion(mensaje, bucket)
+        return
+
+    mermaid_code = mensaje.get("mermaid_code")
+    if mermaid_code is None:
+        obj = runtime.s3().get_object(Bucket=bucket, Key=mensaje["fuente_s3"])
+        mermaid_code = obj["Body"].read().decode()
+
+    try:
+        publicado = generar_diagrama(
+            mermaid_code, mensaje["tenant_id"], mensaje["user_id"], mensaje["tipo"],
+            bucket, obtener_renderer(mensaje.get("renderer"))
+        )
+    except ErrorRender as e:
+        # Error del diagrama, no transitorio: no tiene sentido reintentar
+        actualizar_estado(job_id, ERROR, error=str(e))
+        return
+    actualizar_estado(job_id, COMPLETADO, s3_key=publicado.s3_key)
+
+
+def _abandonar(record: dict, error: Exception):
+    # Último intento: el mensaje se va a la DLQ y nadie más va a tocar el
+    # trabajo, que si no quedaría "procesando" para siempre
+    recepciones = int(record.get("attributes", {}).get("ApproximateReceiveCount", "1"))
+    if recepciones < MAX_RECEPCIONES:
+        return
+    try:
+        job_id = json.loads(record["body"])["job_id"]
+        actualizar_estado(job_id, ERROR, error=f"Falló tras {recepciones} intentos: {error}")
+    except Exception:
+        logger.exception("No se pudo marcar con error el trabajo de %s", record.get("messageId"))
+
+
+def procesar_evento(event, bucket: str) -> dict:
+    # Respuesta parcial de lote: solo los mensajes fallidos vuelven a la cola
+    fallidos = []
+    for record in event.get("Records", []):
+        try:
+            procesar_mensaje(json.loads(record["body"]), bucket)
+        except Exception as e:
+            logger.exception("Fallo procesando trabajo %s", record.get("messageId"))
+            fallidos.append({"itemIdentifier": record["messageId"]})
+            _abandonar(record, e)
+    return {"batchItemFailures": fallidos}
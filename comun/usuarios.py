@@ -0,0 +1,144 @@
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from comun import runtime
+from comun.contrasenias import hashear
+
+TABLE_USUARIOS   = os.environ.get("TABLE_USUARIOS", "t_usuarios3")
+LOTE_TRANSACCION = 100   # máximo de TransactWriteItems
+LOTE_LECTURA     = 100   # máximo de BatchGetItem
+MAX_INTENTOS     = 8
+ESPERA_BASE      = 0.05
+ESPERA_MAX       = 2.0
+ONBOARDING_HILOS = int(os.environ.get("ONBOARDING_HILOS", "8"))
+
+
+class UsuarioExistente(Exception):
+    pass
+
+
+class IdentificadorInvalido(ValueError):
+    pass
+
+
+def validar_identificador(valor, campo: str) -> str:
+    # tenant_id y user_id forman el prefijo {tenant}/{usuario}/ de S3 y de la
+    # política de CloudFront: con un "/" adentro el prefijo cubriría otra cosa
+    if not isinstance(valor, str) or not valor.strip() or "/" in valor:
+        raise IdentificadorInvalido(f"{campo} inválido: no puede estar vacío ni contener '/'")
+    return valor
+
+
+def _item(tenant_id: str, user_id: str, password: str) -> dict:
+    hashed = hashear(password)
+    return {
+        "tenant_id": tenant_id,
+        "user_id":   user_id,
+        "password":  hashed["password"],
+        "kdf":       hashed["kdf"]
+    }
+
+
+def registrar_usuario(tenant_id: str, user_id: str, password: str):
+    # Un único put condicional: sin lectura previa y sin carrera entre dos
+    # registros simultáneos del mismo email
+    validar_identificador(tenant_id, "tenant_id")
+    validar_identificador(user_id, "email")
+    try:
+        runtime.tabla(TABLE_USUARIOS).put_item(
+            Item                = _item(tenant_id, user_id, password),
+            ConditionExpression = "attribute_not_exists(user_id)"
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            raise UsuarioExistente(user_id)
+        raise
+
+
+def _esperar(intento: int):
+    # Backoff exponencial con jitter completo
+    time.sleep(random.uniform(0, min(ESPERA_MAX, ESPERA_BASE * 2 ** intento)))
+
+
+def _existentes(tenant_id: str, user_ids: list) -> set:
+    encontrados = set()
+    for i in range(0, len(user_ids), LOTE_LECTURA):
+        pendientes = {TABLE_USUARIOS: {
+            "Keys":                 [{"tenant_id": tenant_id, "user_id": u} for u in user_ids[i:i + LOTE_LECTURA]],
+            "ProjectionExpression": "user_id"
+        }}
+        for intento in range(MAX_INTENTOS):
+            respuesta = runtime.dynamodb().batch_get_item(RequestItems=pendientes)
+            encontrados.update(item["user_id"] for item in respuesta["Responses"].get(TABLE_USUARIOS, []))
+            pendientes = respuesta.get("UnprocessedKeys")
+            if not pendientes:
+                break
+            _esperar(intento)
+        else:
+            raise RuntimeError("BatchGetItem no terminó de leer t_usuarios3")
+    return encontrados
+
+
+def _escribir_lote(items: list) -> tuple:
+    # Un TransactWriteItems con un put condicional por usuario: un email que
+    # alguien registró después de la lectura previa no se pisa. Devuelve
+    # (user_id ya existentes, user_id sin escribir tras los reintentos)
+    from boto3.dynamodb.types import TypeSerializer
+    serializador = TypeSerializer()
+    cliente      = runtime.dynamodb().meta.client
+    pendientes   = items
+    existentes   = []
+    for intento in range(MAX_INTENTOS):
+        try:
+            cliente.transact_write_items(TransactItems=[
+                {"Put": {
+                    "TableName":           TABLE_USUARIOS,
+                    "Item":                {k: serializador.serialize(v) for k, v in item.items()},
+                    "ConditionExpression": "attribute_not_exists(user_id)"
+                }}
+                for item in pendientes
+            ])
+            return existentes, []
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "TransactionCanceledException":
+                raise
+            razones = [r.get("Code") for r in e.response.get("CancellationReasons", [])]
+        # Se cancela la transacción entera: los que ya existían salen y el
+        # resto se reintenta enseguida; un conflicto o throttling espera
+        if "ConditionalCheckFailed" in razones:
+            existentes += [i["user_id"] for i, r in zip(pendientes, razones) if r == "ConditionalCheckFailed"]
+            pendientes  = [i for i, r in zip(pendientes, razones) if r != "ConditionalCheckFailed"]
+            if not pendientes:
+                return existentes, []
+        else:
+            _esperar(intento)
+    return existentes, [item["user_id"] for item in pendientes]
+
+
+def registrar_usuarios(tenant_id: str, usuarios: list) -> dict:
+    # La lectura previa solo evita calcular hashes de emails ya registrados;
+    # lo que impide pisar una contraseña es la condición de cada put
+    validar_identificador(tenant_id, "tenant_id")
+    for u in usuarios:
+        validar_identificador(u["email"], "email")
+    por_email  = {u["email"]: u["password"] for u in usuarios}
+    existentes = _existentes(tenant_id, list(por_email))
+    nuevos     = [email for email in por_email if email not in existentes]
+
+    with ThreadPoolExecutor(max_workers=ONBOARDING_HILOS) as pool:
+        # scrypt libera el GIL: los hashes se calculan en paralelo
+        items      = list(pool.map(lambda email: _item(tenant_id, email, por_email[email]), nuevos))
+        lotes      = [items[i:i + LOTE_TRANSACCION] for i in range(0, len(items), LOTE_TRANSACCION)]
+        resultados = list(pool.map(_escribir_lote, lotes))
+
+    carrera = [user_id for ya, _ in resultados for user_id in ya]
+    fallos  = [user_id for _, fallidos in resultados for user_id in fallidos]
+    return {
+        "registrados": len(items) - len(carrera) - len(fallos),
+        "existentes":  sorted(existentes | set(carrera)),
+        "fallidos":    fallos
+    }
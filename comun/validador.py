@@ -0,0 +1,100 @@
+import functools
+import os
+import time
+
+from comun import runtime
+from comun.lru import CacheLRU
+from comun.tokens import TokenInvalido, es_token_firmado, verificar_token
+
+ZONA_HORARIA      = "America/Lima"
+FORMATO_EXPIRES   = "%Y-%m-%d %H:%M:%S"
+TOKEN_CACHE_TTL   = int(os.environ.get("TOKEN_CACHE_TTL", "60"))
+TOKEN_CACHE_ITEMS = int(os.environ.get("TOKEN_CACHE_ITEMS", "2048"))
+# Filas sin `ttl` (anteriores a herramientas/migrar_tokens_ttl.py): solo se
+# aceptan, parseando `expires`, con TOKEN_EXPIRES_LEGADO=true
+EXPIRES_LEGADO    = os.environ.get("TOKEN_EXPIRES_LEGADO", "").lower() in ("true", "1")
+
+
+# token -> (vence_en, datos). Sobrevive entre invocaciones "warm"
+_tokens = CacheLRU(TOKEN_CACHE_ITEMS)
+
+
+@functools.lru_cache(maxsize=1)
+def _zona():
+    # Fuera del camino de validación: datetime/zoneinfo se cargan al primer uso
+    from zoneinfo import ZoneInfo
+    return ZoneInfo(ZONA_HORARIA)
+
+
+def expires_legible(expira: int) -> str:
+    # Solo para respuestas: la validación trabaja con epoch
+    from datetime import datetime
+    return datetime.fromtimestamp(expira, _zona()).strftime(FORMATO_EXPIRES)
+
+
+def epoch_desde_expires(expires: str) -> int:
+    # Filas anteriores al atributo ttl (ver herramientas/migrar_tokens_ttl.py)
+    from datetime import datetime
+    return int(datetime.strptime(expires, FORMATO_EXPIRES).replace(tzinfo=_zona()).timestamp())
+
+
+def _consultar_token(token: str, ahora: float) -> dict:
+    t_tokens   = runtime.tabla(os.environ["TABLE_TOKENS"])
+    t_usuarios = runtime.tabla(os.environ["TABLE_USUARIOS"])
+
+    # Buscar el token en la tabla
+    response = t_tokens.get_item(Key={"token": token})
+    if "Item" not in response:
+        raise TokenInvalido("Token no existe")
+
+    token_data = response["Item"]
+    tenant_id  = token_data["tenant_id"]
+    user_id    = token_data["user_id"]  # Este es el email
+    if "ttl" in token_data:
+        expira = int(token_data["ttl"])
+    elif EXPIRES_LEGADO and "expires" in token_data:
+        expira = epoch_desde_expires(token_data["expires"])
+    else:
+        raise TokenInvalido("Token sin ttl")
+
+    # Validar que no haya expirado. El borrado por TTL de DynamoDB puede
+    # tardar, así que la comparación sigue siendo necesaria
+    if ahora >= expira:
+        raise TokenInvalido("Token expirado")
+
+    # Verificar que el usuario todavía exista
+    response_user = t_usuarios.get_item(Key={
+        "tenant_id": tenant_id,
+        "user_id":   user_id
+    })
+    if "Item" not in response_user:
+        raise TokenInvalido("Usuario no encontrado")
+
+    return {"tenant_id": tenant_id, "user_id": user_id, "expira": expira}
+
+
+def _validar_firmado(token: str) -> dict:
+    datos = verificar_token(token)
+    return {"tenant_id": datos["tenant_id"], "user_id": datos["user_id"], "expira": datos["expira"]}
+
+
+def validar_token(token: str) -> dict:
+    # Token firmado: HMAC local, sin DynamoDB ni caché
+    if es_token_firmado(token):
+        return _validar_firmado(token)
+
+    # Un token "caliente" no cuesta ninguna llamada a DynamoDB. La entrada vence
+    # con el token o a los TOKEN_CACHE_TTL segundos, lo que ocurra primero, para
+    # que un usuario eliminado no siga autenticado indefinidamente
+    ahora    = time.time()
+    cacheado = _tokens.get(token)
+    if cacheado is not None:
+        vence_en, datos = cacheado
+        if ahora < vence_en:
+            return datos
+        _tokens.pop(token)
+
+    datos    = _consultar_token(token, ahora)
+    vence_en = min(datos["expira"], ahora + TOKEN_CACHE_TTL)
+    _tokens.put(token, (vence_en, datos))
+    return datos
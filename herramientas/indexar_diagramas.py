@@ -0,0 +1,51 @@
+"""Carga en t_diagramas los diagramas que ya estaban en el bucket.
+
+Los objetos creados antes del índice de metadatos no aparecen en
+listar_diagramas hasta indexarlos. Recorre el bucket una sola vez (omitiendo
+cache/, trabajos/ y editables/) y escribe un registro por {tenant_id}/{user_id}/<archivo>.
+
+    BUCKET_NAME=... python herramientas/indexar_diagramas.py
+"""
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from comun import runtime
+from comun.indice import TABLE_DIAGRAMAS
+
+PREFIJOS_INTERNOS = ("cache/", "trabajos/", "editables/")
+RE_HASH           = re.compile(r"^[0-9a-f]{64}$")
+
+
+def main():
+    bucket    = os.environ["BUCKET_NAME"]
+    paginador = runtime.s3().get_paginator("list_objects_v2")
+    total     = 0
+    with runtime.tabla(TABLE_DIAGRAMAS).batch_writer() as lote:
+        for pagina in paginador.paginate(Bucket=bucket):
+            for obj in pagina.get("Contents", []):
+                key = obj["Key"]
+                if key.startswith(PREFIJOS_INTERNOS) or key.count("/") != 2:
+                    continue
+                tenant_id, user_id, archivo = key.split("/")
+                item = {
+                    "tenant_id":   tenant_id,
+                    "created_at":  obj["LastModified"].strftime("%Y-%m-%dT%H:%M:%S.%fZ") + "#backfill",
+                    "tenant_user": f"{tenant_id}#{user_id}",
+                    "user_id":     user_id,
+                    "tipo":        "desconocido",
+                    "tamanio":     obj["Size"],
+                    "s3_key":      key
+                }
+                digest = archivo.rsplit(".", 1)[0]
+                if RE_HASH.match(digest):
+                    item["content_hash"] = digest
+                lote.put_item(Item=item)
+                total += 1
+    print(f"{total} diagramas indexados en {TABLE_DIAGRAMAS}")
+
+
+if __name__ == "__main__":
+    main()
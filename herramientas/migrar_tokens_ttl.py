@@ -0,0 +1,80 @@
+"""Migra t_tokens_acceso2 al atributo ttl (epoch) que usa el TTL de DynamoDB.
+
+Los tokens guardados antes del cambio solo tienen expires como texto en hora
+de Lima y el TTL nunca los borra. Recorre la tabla con un scan paralelo por
+segmentos: los tokens vencidos se eliminan y los vigentes reciben su ttl.
+
+    python herramientas/migrar_tokens_ttl.py [--segmentos 8] [--simular]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from boto3.dynamodb.conditions import Attr
+
+from comun import runtime
+from comun.validador import epoch_desde_expires
+
+TABLE_TOKENS = os.environ.get("TABLE_TOKENS", "t_tokens_acceso2")
+
+
+def migrar_segmento(segmento: int, total: int, ahora: int, simular: bool) -> tuple:
+    tabla    = runtime.tabla(TABLE_TOKENS)
+    kwargs   = {
+        "Segment":                  segmento,
+        "TotalSegments":            total,
+        "FilterExpression":         Attr("ttl").not_exists(),
+        "ProjectionExpression":     "#token, expires",
+        "ExpressionAttributeNames": {"#token": "token"}
+    }
+    borrados = 0
+    migrados = 0
+    with tabla.batch_writer() as lote:
+        while True:
+            respuesta = tabla.scan(**kwargs)
+            for item in respuesta.get("Items", []):
+                expira = epoch_desde_expires(item["expires"])
+                if expira <= ahora:
+                    if not simular:
+                        lote.delete_item(Key={"token": item["token"]})
+                    borrados += 1
+                else:
+                    if not simular:
+                        tabla.update_item(
+                            Key                       = {"token": item["token"]},
+                            UpdateExpression          = "SET #ttl = :ttl",
+                            ExpressionAttributeNames  = {"#ttl": "ttl"},
+                            ExpressionAttributeValues = {":ttl": expira}
+                        )
+                    migrados += 1
+            if "LastEvaluatedKey" not in respuesta:
+                break
+            kwargs["ExclusiveStartKey"] = respuesta["LastEvaluatedKey"]
+    return borrados, migrados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--segmentos", type=int, default=8)
+    parser.add_argument("--simular", action="store_true", help="solo contar, sin escribir")
+    args = parser.parse_args()
+
+    ahora = int(time.time())
+    with ThreadPoolExecutor(max_workers=args.segmentos) as pool:
+        resultados = list(pool.map(
+            lambda s: migrar_segmento(s, args.segmentos, ahora, args.simular),
+            range(args.segmentos)
+        ))
+
+    borrados = sum(r[0] for r in resultados)
+    migrados = sum(r[1] for r in resultados)
+    accion   = "a borrar" if args.simular else "borrados"
+    print(f"{TABLE_TOKENS}: {borrados} tokens vencidos {accion}, {migrados} con ttl nuevo")
+
+
+if __name__ == "__main__":
+    main()
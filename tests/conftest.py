@@ -0,0 +1,64 @@
+import importlib.util
+import json
+import os
+import sys
+import time
+import uuid
+
+import pytest
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "pruebas")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "pruebas")
+os.environ.setdefault("BUCKET_NAME", "pruebas-diagramas")
+os.environ.setdefault("TABLE_TOKENS", "t_tokens_acceso2")
+os.environ.setdefault("TABLE_USUARIOS", "t_usuarios3")
+os.environ.setdefault("TABLE_CUOTAS", "t_cuotas_tenant")
+os.environ.setdefault("RENDERER", "local")
+
+from simulados import instalar
+
+
+@pytest.fixture
+def servicios():
+    # DynamoDB, S3, Lambda, SQS y mermaid.ink en memoria, nuevos en cada prueba.
+    # Las cachés de proceso que recuerdan objetos de S3 se vacían con ellos
+    from comun import cache_render, editable
+    for cache in (cache_render._objetos, cache_render._imagenes, editable._modelos):
+        cache.clear()
+    return instalar()
+
+
+def cargar(ruta: str, funcion: str = "lambda_handler"):
+    # Los handlers viven en carpetas con guiones: se importan por ruta
+    nombre = os.path.splitext(os.path.basename(ruta))[0].replace("-", "_")
+    spec   = importlib.util.spec_from_file_location(f"prueba_{nombre}", os.path.join(RAIZ, ruta))
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return getattr(modulo, funcion)
+
+
+def evento(body, token: str = None, params: dict = None, metodo: str = None) -> dict:
+    return {
+        "headers":               {"Authorization": token} if token else {},
+        "body":                  json.dumps(body) if body is not None else None,
+        "queryStringParameters": params,
+        "requestContext":        {"http": {"method": metodo or ("GET" if body is None else "POST")}}
+    }
+
+
+@pytest.fixture
+def sesion(servicios):
+    # (tenant_id, user_id, token) de un usuario nuevo; tenant distinto en cada
+    # prueba para no compartir cachés de límites y cuotas
+    tenant_id = f"t{uuid.uuid4().hex[:8]}"
+    user_id   = "ana@ejemplo.com"
+    token     = str(uuid.uuid4())
+    servicios["dynamodb"].Table(os.environ["TABLE_USUARIOS"])._guardar({"tenant_id": tenant_id, "user_id": user_id})
+    servicios["dynamodb"].Table(os.environ["TABLE_TOKENS"])._guardar({
+        "token": token, "ttl": int(time.time()) + 3600, "tenant_id": tenant_id, "user_id": user_id
+    })
+    return tenant_id, user_id, token
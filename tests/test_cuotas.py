@@ -0,0 +1,55 @@
+import json
+
+from conftest import cargar, evento
+
+from comun import cuotas
+from comun.cuotas import RENDER, admitir
+
+RAFAGA = 30   # CUOTA_RENDER_RAFAGA por defecto
+
+
+def test_costo_completo_hasta_la_rafaga(sesion):
+    tenant_id, _, _ = sesion
+    assert admitir(tenant_id, RENDER, costo=RAFAGA) is None
+    assert admitir(tenant_id, RENDER, costo=1) >= 1
+
+
+def test_costo_mayor_que_la_rafaga_no_se_recorta(servicios, sesion):
+    tenant_id, _, _ = sesion
+    espera = admitir(tenant_id, RENDER, costo=RAFAGA + 1)
+    assert espera >= 1
+    # No se gastó nada: la cubeta sigue llena
+    assert (f"{tenant_id}#{RENDER}",) not in servicios["dynamodb"].Table(cuotas.TABLE_CUOTAS).items
+    assert admitir(tenant_id, RENDER, costo=RAFAGA) is None
+
+
+def test_lote_mas_grande_que_la_rafaga(sesion):
+    _, _, token = sesion
+    batch = cargar("api-diagrama/diagrama-batch.py")
+    lote  = [{"tipo": "json", "code": {"nodos": [{"id": f"n{i}"}]}} for i in range(RAFAGA + 1)]
+
+    respuesta = batch(evento({"diagramas": lote}, token), None)
+    # Reintentar no sirve: 413 sin Retry-After y sin gastar la cubeta
+    assert respuesta["statusCode"] == 413
+    assert "Retry-After" not in respuesta["headers"]
+    assert json.loads(respuesta["body"])["maximo"] == RAFAGA
+
+    respuesta = batch(evento({"diagramas": lote[:RAFAGA]}, token), None)
+    assert respuesta["statusCode"] == 200
+    assert json.loads(respuesta["body"])["generados"] == RAFAGA
+
+    # La ráfaga quedó gastada: el siguiente diagrama ya espera
+    respuesta = batch(evento({"diagramas": lote[:1]}, token), None)
+    assert respuesta["statusCode"] == 429
+
+
+def test_limites_no_disponibles_usa_los_por_defecto(sesion, monkeypatch):
+    tenant_id, _, _ = sesion
+
+    def caida(_tenant_id):
+        raise RuntimeError("t_limites_tenant no responde")
+
+    monkeypatch.setattr(cuotas, "limites_tenant", caida)
+    assert admitir(tenant_id, RENDER, costo=RAFAGA) is None
+    assert admitir(tenant_id, RENDER, costo=1) >= 1
+    assert cuotas.excede_rafaga(tenant_id, RENDER, RAFAGA + 1) == RAFAGA
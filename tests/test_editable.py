@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+from conftest import cargar, evento
+
+from comun import editable
+from comun.render import ErrorRender
+
+CODIGO = "diagrama x\nEC2 web conectado a RDS db\nS3 bucket"
+
+
+@pytest.fixture
+def handlers():
+    return {f: cargar("api-diagrama/diagrama_editable.py", f)
+            for f in ("crear_editable", "obtener_editable", "actualizar_editable")}
+
+
+def _crear(handlers, token, tipo="aws", code=CODIGO) -> str:
+    respuesta = handlers["crear_editable"](evento({"tipo": tipo, "code": code}, token), None)
+    assert respuesta["statusCode"] == 201
+    return json.loads(respuesta["body"])["diagrama_id"]
+
+
+def _patch(handlers, token, diagrama_id, body):
+    e = {**evento(body, token, metodo="PATCH"), "pathParameters": {"id": diagrama_id}}
+    respuesta = handlers["actualizar_editable"](e, None)
+    return respuesta["statusCode"], json.loads(respuesta["body"])
+
+
+def test_parches_y_conflicto(handlers, sesion, servicios):
+    _, _, token = sesion
+    diagrama_id = _crear(handlers, token)
+    agregar     = {"lineas": [{"desde": 3, "borrar": 0, "insertar": ["Lambda fn conectado a S3 bucket"]}]}
+
+    status, body = _patch(handlers, token, diagrama_id, {"version": 1, "cambios": agregar})
+    assert (status, body["version"], body["renderizado"]) == (200, 2, True)
+
+    # Editado sobre una versión vieja
+    status, body = _patch(handlers, token, diagrama_id, {"version": 1, "cambios": agregar})
+    assert (status, body["version"]) == (409, 2)
+
+    # La cabecera avanzó con el update condicional
+    tabla    = servicios["dynamodb"].Table(editable.TABLE_EDITABLES)
+    cabecera = tabla.items[(diagrama_id, editable.VERSION_CABECERA)]
+    assert cabecera["version_actual"] == 2
+
+    e = {**evento(None, token), "pathParameters": {"id": diagrama_id}}
+    body = json.loads(handlers["obtener_editable"](e, None)["body"])
+    assert body["version"] == 2 and body["estado"]["lineas"][-1] == "Lambda fn conectado a S3 bucket"
+
+
+@pytest.mark.parametrize("cambios", [
+    {"lineas": 5},
+    {"lineas": [{"desde": "x"}]},
+    {"lineas": [{"desde": [1]}]},
+    {"lineas": [{"desde": 99, "borrar": 1}]},
+    {"lineas": ["texto"]},
+])
+def test_parche_invalido_es_400(handlers, sesion, cambios):
+    _, _, token = sesion
+    diagrama_id  = _crear(handlers, token)
+    status, body = _patch(handlers, token, diagrama_id, {"cambios": cambios})
+    assert status == 400, body
+
+
+def test_parche_json_invalido_es_400(handlers, sesion):
+    _, _, token = sesion
+    diagrama_id = _crear(handlers, token, "json", {"nodos": [{"id": "a"}], "conexiones": []})
+    for cambios in ({"agregar_nodos": [5]}, {"quitar_nodos": [{"id": "a"}]}, {"agregar_conexiones": [{"origen": ["a"]}]}):
+        assert _patch(handlers, token, diagrama_id, {"cambios": cambios})[0] == 400
+    assert _patch(handlers, token, diagrama_id, {"cambios": {"agregar_nodos": [{"id": "b"}]}, "version": [1]})[0] == 400
+    assert _patch(handlers, token, diagrama_id, {"cambios": {"agregar_nodos": [{"id": "b"}]}, "version": "uno"})[0] == 400
+    # Quitar todos los nodos deja un JSON que normalizar_json rechaza
+    assert _patch(handlers, token, diagrama_id, {"cambios": {"quitar_nodos": ["a"]}})[0] == 400
+
+
+def test_entrada_invalida_al_crear_es_400(handlers, sesion):
+    _, _, token = sesion
+    for body in ({"tipo": "aws", "code": "EC2"}, {"tipo": "aws", "code": ["EC2 web"]}, {"tipo": "json", "code": "x"}):
+        assert handlers["crear_editable"](evento(body, token), None)["statusCode"] == 400
+    e = {**evento(None, token), "body": "{no es json"}
+    assert handlers["crear_editable"](e, None)["statusCode"] == 400
+
+
+def test_snapshot_corrupto_es_500(handlers, sesion, servicios):
+    _, _, token = sesion
+    diagrama_id = _crear(handlers, token)
+    editable._modelos.pop(diagrama_id)
+    servicios["s3"].objetos[editable._clave_snapshot(diagrama_id, 1)] = b"{corrupto"
+
+    status, _ = _patch(handlers, token, diagrama_id, {"cambios": {"lineas": []}})
+    assert status == 500
+
+
+def test_error_de_programacion_es_500(handlers, sesion, monkeypatch):
+    _, _, token = sesion
+    diagrama_id = _crear(handlers, token)
+
+    def roto(*_):
+        raise TypeError("error del servidor")
+    monkeypatch.setattr(editable.ModeloPseudocodigo, "aplicar", roto)
+    status, _ = _patch(handlers, token, diagrama_id, {"cambios": {"lineas": []}})
+    assert status == 500
+
+
+def test_version_guardada_aunque_falle_el_render(handlers, sesion, monkeypatch):
+    _, _, token = sesion
+    diagrama_id = _crear(handlers, token)
+    agregar     = {"lineas": [{"desde": 3, "borrar": 0, "insertar": ["Lambda fn conectado a S3 bucket"]}]}
+
+    def falla(*_, **__):
+        raise ErrorRender("mermaid.ink no responde")
+    with monkeypatch.context() as m:
+        m.setattr(editable, "publicar_en", falla)
+        status, body = _patch(handlers, token, diagrama_id, {"version": 1, "cambios": agregar})
+    assert (status, body["version"], body["renderizado"]) == (200, 2, False)
+    assert "aviso" in body
+
+    # La siguiente edición (aunque no cambie la salida) pone la imagen al día
+    vacio = {"lineas": [{"desde": 4, "borrar": 0, "insertar": ["   "]}]}
+    status, body = _patch(handlers, token, diagrama_id, {"version": 2, "cambios": vacio})
+    assert (status, body["version"], body["renderizado"]) == (200, 3, True)
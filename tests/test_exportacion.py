@@ -0,0 +1,53 @@
+import io
+import zipfile
+
+import pytest
+
+from comun import exportacion
+from comun.exportacion import _SubidaMultiparte, exportar_usuario
+
+BUCKET = "pruebas-diagramas"
+PARTE  = 1024
+
+
+@pytest.fixture
+def partes_chicas(monkeypatch, servicios):
+    monkeypatch.setattr(exportacion, "EXPORT_PARTE", PARTE)
+    subidas = []
+    original = servicios["s3"].upload_part
+
+    def upload_part(**kwargs):
+        subidas.append(len(kwargs["Body"]))
+        return original(**kwargs)
+    monkeypatch.setattr(servicios["s3"], "upload_part", upload_part)
+    return subidas
+
+
+@pytest.mark.parametrize("tamanio, esperadas", [
+    (PARTE * 3, [PARTE] * 3),          # múltiplo exacto: sin parte final vacía
+    (PARTE * 3 + 10, [PARTE] * 3 + [10]),
+    (10, [10]),
+    (0, [0]),                          # S3 exige al menos una parte
+])
+def test_partes_de_la_subida(servicios, partes_chicas, tamanio, esperadas):
+    subida = _SubidaMultiparte(servicios["s3"], BUCKET, "t/u/x.zip", "application/zip")
+    for i in range(0, tamanio, 100):
+        subida.write(b"x" * min(100, tamanio - i))
+    subida.completar()
+    assert partes_chicas == esperadas
+    assert servicios["s3"].objetos["t/u/x.zip"] == b"x" * tamanio
+
+
+def test_exportar_usuario(servicios, partes_chicas):
+    s3 = servicios["s3"]
+    for i in range(20):
+        s3.put_object(Bucket=BUCKET, Key=f"t/u/{i:064x}.svg", Body=b"<svg/>" * (i + 1))
+    s3.put_object(Bucket=BUCKET, Key="t/u/exportaciones/vieja.zip", Body=b"zip")
+    s3.put_object(Bucket=BUCKET, Key="t/otro/a.svg", Body=b"<svg/>")
+
+    resultado = exportar_usuario("t", "u", BUCKET, "t/u/exportaciones/nueva.zip")
+    assert resultado["archivos"] == 20
+    assert 0 not in partes_chicas
+    with zipfile.ZipFile(io.BytesIO(s3.objetos["t/u/exportaciones/nueva.zip"])) as archivo:
+        assert len(archivo.namelist()) == 20 and archivo.testzip() is None
+    assert s3.subidas == {}
@@ -0,0 +1,70 @@
+import base64
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from conftest import cargar, evento
+
+from comun import indice
+from comun.cache_render import Publicado
+from comun.indice import registrar_diagrama
+
+
+def _cursor(datos) -> str:
+    return base64.urlsafe_b64encode(json.dumps(datos).encode()).decode()
+
+
+@pytest.fixture
+def listar(sesion):
+    tenant_id, user_id, _ = sesion
+    for i in range(5):
+        digest = f"{i:064x}"
+        registrar_diagrama(tenant_id, user_id, "aws", Publicado(
+            f"{tenant_id}/{user_id}/{digest}.svg", f"cache/{digest}.svg", digest, 1024, "image/svg+xml", True
+        ))
+    return cargar("api-diagrama/listar_diagramas.py", "listar_diagramas")
+
+
+def _pagina(listar, token, **params):
+    respuesta = listar(evento(None, token, params), None)
+    return respuesta["statusCode"], json.loads(respuesta["body"])
+
+
+def test_paginacion(listar, sesion):
+    _, _, token = sesion
+    status, body = _pagina(listar, token, limit="3")
+    assert status == 200 and len(body["diagramas"]) == 3
+    status, body = _pagina(listar, token, limit="3", next_token=body["next_token"])
+    assert status == 200 and len(body["diagramas"]) == 2 and body["next_token"] is None
+
+
+@pytest.mark.parametrize("cursor", [
+    "no es base64 !",
+    _cursor([1, 2]),
+    _cursor({"tenant_id": "x"}),
+    _cursor({"tenant_id": "x", "created_at": "2024", "tenant_user": "x#y", "extra": "1"}),
+    _cursor({"tenant_id": 1, "created_at": "2024", "tenant_user": "x#y"}),
+])
+def test_cursor_mal_formado_es_400(listar, sesion, cursor):
+    _, _, token = sesion
+    assert _pagina(listar, token, next_token=cursor)[0] == 400
+
+
+def test_cursor_de_otro_usuario_es_400(listar, sesion):
+    tenant_id, _, token = sesion
+    ajeno = _cursor({"tenant_id": tenant_id, "created_at": "2024-01-01T00:00:00.000000Z#abc",
+                     "tenant_user": f"{tenant_id}#otro@ejemplo.com"})
+    assert _pagina(listar, token, next_token=ajeno)[0] == 400
+
+
+def test_validation_exception_es_400(listar, sesion, servicios, monkeypatch):
+    tenant_id, user_id, token = sesion
+    cursor = _cursor({"tenant_id": tenant_id, "created_at": "x", "tenant_user": f"{tenant_id}#{user_id}"})
+
+    def rechaza(**_):
+        raise ClientError({"Error": {"Code": "ValidationException", "Message": "clave inválida"}}, "Query")
+    monkeypatch.setattr(servicios["dynamodb"].Table(indice.TABLE_DIAGRAMAS), "query", rechaza)
+    assert _pagina(listar, token, next_token=cursor)[0] == 400
+    # Sin cursor, el mismo error es del servidor
+    assert _pagina(listar, token)[0] == 500
@@ -0,0 +1,24 @@
+import logging
+
+from comun import metricas
+
+
+def test_registrar_evento_oculta_credenciales(monkeypatch, caplog):
+    monkeypatch.setattr(metricas, "LOG_MUESTREO", 1.0)
+    monkeypatch.setattr(metricas, "LOG_MAX_BYTES", 10000)
+    event = {
+        "headers":           {"authorization": "tok-1", "X-Api-Key": "clave-2", "Cookie": "s=3",
+                              "Content-Type": "application/json"},
+        "multiValueHeaders": {"Authorization": ["tok-1"], "x-api-key": ["clave-2"]},
+        "requestContext":    {"identity": {"apiKey": "clave-2", "sourceIp": "10.0.0.1"}},
+        "body":              "{}"
+    }
+    with caplog.at_level(logging.INFO):
+        metricas.registrar_evento(logging.getLogger(), event)
+
+    texto = caplog.text
+    assert "Evento (muestra)" in texto
+    assert not any(secreto in texto for secreto in ("tok-1", "clave-2", "s=3"))
+    assert "application/json" in texto and "10.0.0.1" in texto
+    # El evento original no se modifica
+    assert event["headers"]["authorization"] == "tok-1"
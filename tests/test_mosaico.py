@@ -0,0 +1,77 @@
+from conftest import cargar, evento
+
+from comun.mosaico import GrafoPlano, _mermaid_mosaico, _mermaid_vista, generar_mosaicos, particionar
+from comun.render import obtener_renderer
+from comun.svg_local import mermaid_a_svg, parsear_grafo
+
+BUCKET = "pruebas-diagramas"
+
+
+def grafo_grande(nodos: int = 400) -> GrafoPlano:
+    # Árbol binario más una componente suelta: obliga a cortar y a empaquetar
+    ids     = [f"n{i}" for i in range(nodos)] + ["solo_a", "solo_b"]
+    aristas = [(i // 2, i) for i in range(1, nodos)] + [(nodos, nodos + 1)]
+    return GrafoPlano(ids, [f"Servicio {i}" for i in range(len(ids))], aristas)
+
+
+def textos(grafo: GrafoPlano, max_nodos: int) -> list:
+    mosaicos   = particionar(grafo, max_nodos)
+    mosaico_de = [0] * len(grafo.ids)
+    for indice, nodos in enumerate(mosaicos):
+        for nodo in nodos:
+            mosaico_de[nodo] = indice
+    return ([_mermaid_mosaico(grafo, nodos, mosaico_de, i, set(grafo.ids)) for i, nodos in enumerate(mosaicos)]
+            + [_mermaid_vista(grafo, mosaicos, mosaico_de)])
+
+
+def test_mosaicos_y_vista_se_renderizan_localmente():
+    renderer = obtener_renderer()
+    assert renderer.nombre == "local"
+    generados = textos(grafo_grande(), 50)
+    assert len(generados) > 2
+    for texto in generados:
+        assert renderer.renderizar(texto).startswith(b"<svg")
+
+
+def cuerpo(texto: str) -> list:
+    return [l.strip() for l in texto.splitlines()[1:]]
+
+
+def test_referencias_externas_y_conteos_en_la_vista():
+    *mosaicos, vista = textos(grafo_grande(), 50)
+    nodos, aristas = parsear_grafo(cuerpo(mosaicos[1]))
+    externos = [n for n in nodos if n.startswith("ext_")]
+    assert externos and all("· mosaico" in nodos[n] for n in externos)
+
+    nodos, aristas = parsear_grafo(cuerpo(vista))
+    assert all(o.startswith("m") and d.startswith("m") for o, d, _ in aristas)
+    assert all(etiqueta.isdigit() for _, _, etiqueta in aristas)
+    assert "font-size=\"11\"" in mermaid_a_svg(vista)
+
+
+def test_referencias_no_chocan_con_ids_reales():
+    # Mosaicos [a, ext_b] [b] [ext_0]: la referencia a b no puede llamarse
+    # ext_b ni ext_0, que ya son nodos del grafo
+    grafo = GrafoPlano(["a", "ext_b", "b", "ext_0"], ["A", "EB", "B", "E0"], [(0, 1), (0, 2)])
+    nodos, aristas = parsear_grafo(cuerpo(textos(grafo, 2)[0]))
+    referencias = [n for n in nodos if "· mosaico" in nodos[n]]
+    assert nodos["ext_b"] == "EB"
+    assert len(referencias) == 1 and referencias[0] not in grafo.ids
+    assert ("a", referencias[0], "") in aristas
+
+
+def test_mosaico_y_async_es_400(sesion):
+    _, _, token = sesion
+    params = {"mosaico": "true", "async": "true"}
+    for ruta, code in (("api-diagrama/diagrama-aws.py", "EC2 web conectado a RDS db"),
+                       ("api-diagrama/diagrama-json.py", {"nodos": [{"id": "a"}]})):
+        respuesta = cargar(ruta)(evento({"code": code}, token, params), None)
+        assert respuesta["statusCode"] == 400, respuesta["body"]
+
+
+def test_generar_mosaicos_publica_todos(servicios):
+    resultado = generar_mosaicos(grafo_grande(), "pruebas", "ana@ejemplo.com", "json", BUCKET, max_nodos=50)
+    assert len(resultado["mosaicos"]) > 1
+    assert resultado["aristas_entre_mosaicos"] > 0
+    guardados = [k for k in servicios["s3"].objetos if k.startswith("pruebas/ana@ejemplo.com/")]
+    assert len(guardados) == len(resultado["mosaicos"]) + 1
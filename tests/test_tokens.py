@@ -0,0 +1,133 @@
+import json
+
+import pytest
+
+from conftest import cargar, evento
+
+from comun import tokens, validador
+from comun.tokens import ListaRevocados, TokenInvalido, emitir_token, revocar_token, verificar_modo
+
+
+@pytest.fixture
+def firmado(monkeypatch):
+    monkeypatch.setenv("TOKEN_SECRET", "secreto de prueba")
+    monkeypatch.delenv("TOKEN_SECRET_ANTERIOR", raising=False)
+    monkeypatch.delenv("TABLE_TOKENS_REVOCADOS", raising=False)
+
+
+def test_token_firmado_se_valida_sin_dynamodb(firmado, servicios):
+    token, expira = emitir_token("t", "ana@ejemplo.com")
+    assert validador.validar_token(token) == {"tenant_id": "t", "user_id": "ana@ejemplo.com", "expira": expira}
+    assert servicios["dynamodb"].tablas == {}
+
+
+def test_firma_alterada_o_secreto_rotado(firmado, monkeypatch):
+    token, _ = emitir_token("t", "ana@ejemplo.com")
+    with pytest.raises(TokenInvalido):
+        validador.validar_token(token[:-2] + ("AA" if token[-2:] != "AA" else "BB"))
+
+    monkeypatch.setenv("TOKEN_SECRET", "secreto nuevo")
+    with pytest.raises(TokenInvalido):
+        validador.validar_token(token)
+    monkeypatch.setenv("TOKEN_SECRET_ANTERIOR", "secreto de prueba")
+    assert validador.validar_token(token)["user_id"] == "ana@ejemplo.com"
+
+
+@pytest.mark.parametrize("cola", ["abc.é", "é.abc", "abc", "abc.def.ghi", "abc.", ""])
+def test_token_mal_formado_o_no_ascii(firmado, cola):
+    with pytest.raises(TokenInvalido):
+        validador.validar_token("v1." + cola)
+
+
+def test_token_expirado(firmado):
+    token, _ = emitir_token("t", "ana@ejemplo.com", ttl=-1)
+    with pytest.raises(TokenInvalido):
+        validador.validar_token(token)
+
+
+def test_v1_sin_modo_firmado_es_token_invalido(firmado, monkeypatch):
+    token, _ = emitir_token("t", "ana@ejemplo.com")
+    monkeypatch.delenv("TOKEN_SECRET")
+    with pytest.raises(TokenInvalido):
+        validador.validar_token(token)
+
+
+def test_token_opaco(sesion):
+    tenant_id, user_id, token = sesion
+    assert validador.validar_token(token)["tenant_id"] == tenant_id
+    with pytest.raises(TokenInvalido):
+        validador.validar_token("no-existe")
+
+
+def test_login_firmado_sin_secreto_falla_al_importar(monkeypatch):
+    monkeypatch.setenv("TOKEN_MODO", "firmado")
+    monkeypatch.delenv("TOKEN_SECRET", raising=False)
+    with pytest.raises(RuntimeError, match="TOKEN_SECRET"):
+        cargar("api-usuarios/LoginUsuario.py")
+    with pytest.raises(RuntimeError):
+        verificar_modo("otro")
+
+
+def test_login_firmado_emite_token_valido(firmado, servicios, monkeypatch):
+    from comun.contrasenias import hashear
+    monkeypatch.setenv("TOKEN_MODO", "firmado")
+    servicios["dynamodb"].Table("t_usuarios3")._guardar(
+        {"tenant_id": "t", "user_id": "ana@ejemplo.com", **hashear("clave")}
+    )
+    login     = cargar("api-usuarios/LoginUsuario.py")
+    respuesta = login(evento({"tenant_id": "t", "email": "ana@ejemplo.com", "password": "clave"}), None)
+    token     = json.loads(respuesta["body"])["token"]
+    assert token.startswith("v1.") and validador.validar_token(token)["user_id"] == "ana@ejemplo.com"
+
+
+def test_revocacion(firmado, servicios, monkeypatch):
+    monkeypatch.setenv("TABLE_TOKENS_REVOCADOS", "t_tokens_revocados")
+    monkeypatch.setattr(tokens, "_revocados", None)
+    token, _ = emitir_token("t", "ana@ejemplo.com")
+    revocar_token(token)
+    with pytest.raises(TokenInvalido, match="revocado"):
+        validador.validar_token(token)
+
+
+def test_revocados_no_reescanea_tras_un_fallo(servicios, monkeypatch):
+    lista  = ListaRevocados("t_tokens_revocados", refresco=60, reintento=60)
+    tabla  = servicios["dynamodb"].Table("t_tokens_revocados")
+    scans  = []
+
+    def falla(**_):
+        scans.append(1)
+        raise RuntimeError("DynamoDB no disponible")
+    monkeypatch.setattr(tabla, "scan", falla)
+    for _ in range(5):
+        with pytest.raises(RuntimeError):
+            lista.contiene("jti")
+    assert len(scans) == 1
+
+    # Con una copia ya cargada, un fallo sigue usándola
+    monkeypatch.undo()
+    lista = ListaRevocados("t_tokens_revocados", refresco=0, reintento=60)
+    tabla._guardar({"jti": "revocado", "expira_en": 2 ** 40})
+    assert lista.contiene("revocado")
+    monkeypatch.setattr(tabla, "scan", falla)
+    assert lista.contiene("revocado") and not lista.contiene("otro")
+    assert len(scans) == 2
+
+
+def test_fila_sin_ttl_solo_con_legado(sesion, servicios, monkeypatch):
+    tenant_id, user_id, _ = sesion
+    servicios["dynamodb"].Table("t_tokens_acceso2")._guardar({
+        "token": "legado", "expires": "2999-01-01 00:00:00", "tenant_id": tenant_id, "user_id": user_id
+    })
+    with pytest.raises(TokenInvalido):
+        validador.validar_token("legado")
+    monkeypatch.setattr(validador, "EXPIRES_LEGADO", True)
+    assert validador.validar_token("legado")["tenant_id"] == tenant_id
+
+
+def test_validador_no_importa_zoneinfo():
+    import subprocess
+    import sys
+    from conftest import RAIZ
+    codigo = "import sys, comun.validador; print('zoneinfo' in sys.modules, '_strptime' in sys.modules)"
+    salida = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, capture_output=True, text=True, check=True)
+    assert salida.stdout.split() == ["False", "False"]
@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+from comun import trabajos
+from comun.trabajos import ERROR, PROCESANDO, obtener_trabajo, procesar_evento
+
+
+def _evento(job_id: str, recepciones: int) -> dict:
+    mensaje = {"job_id": job_id, "tenant_id": "t", "user_id": "ana@ejemplo.com", "tipo": "aws",
+               "fuente_s3": "trabajos/no-existe.mmd"}
+    return {"Records": [{
+        "messageId":  "m1",
+        "body":       json.dumps(mensaje),
+        "attributes": {"ApproximateReceiveCount": str(recepciones)}
+    }]}
+
+
+@pytest.mark.parametrize("recepciones, estado", [(1, PROCESANDO), (trabajos.MAX_RECEPCIONES, ERROR)])
+def test_ultimo_intento_marca_el_trabajo_con_error(servicios, recepciones, estado):
+    # La fuente no está en S3: falla igual en cada intento
+    job_id    = trabajos._crear_trabajo("t", "ana@ejemplo.com")
+    respuesta = procesar_evento(_evento(job_id, recepciones), "pruebas-diagramas")
+
+    # El mensaje se informa como fallido igual, para que llegue a la DLQ
+    assert respuesta["batchItemFailures"] == [{"itemIdentifier": "m1"}]
+    trabajo = obtener_trabajo(job_id)
+    assert trabajo["estado"] == estado
+    assert ("error" in trabajo) == (estado == ERROR)
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from conftest import cargar
+
+from comun import usuarios
+from comun.usuarios import registrar_usuarios
+
+
+@pytest.fixture
+def tabla(servicios, monkeypatch):
+    # scrypt con parámetros mínimos: se prueba el flujo, no el costo
+    monkeypatch.setattr(usuarios, "hashear", lambda password: {"password": password[::-1], "kdf": {"n": 2}})
+    return servicios["dynamodb"].Table(usuarios.TABLE_USUARIOS)
+
+
+def test_onboarding_no_pisa_usuarios_existentes(tabla):
+    tabla._guardar({"tenant_id": "t", "user_id": "ya@ejemplo.com", "password": "original"})
+    lista     = [{"email": f"u{i}@ejemplo.com", "password": "clave"} for i in range(250)]
+    resultado = registrar_usuarios("t", lista + [{"email": "ya@ejemplo.com", "password": "otra"}])
+    assert resultado == {"registrados": 250, "existentes": ["ya@ejemplo.com"], "fallidos": []}
+    assert tabla.items[("t", "ya@ejemplo.com")]["password"] == "original"
+
+
+def test_registro_concurrente_entre_lectura_y_escritura(tabla, monkeypatch):
+    # Alguien registra el email después del BatchGetItem: el put condicional
+    # lo detecta y el resto de la transacción se escribe igual
+    def lectura_vieja(tenant_id, user_ids):
+        tabla._guardar({"tenant_id": tenant_id, "user_id": "u3@ejemplo.com", "password": "original"})
+        return set()
+    monkeypatch.setattr(usuarios, "_existentes", lectura_vieja)
+
+    resultado = registrar_usuarios("t", [{"email": f"u{i}@ejemplo.com", "password": "clave"} for i in range(10)])
+    assert resultado == {"registrados": 9, "existentes": ["u3@ejemplo.com"], "fallidos": []}
+    assert tabla.items[("t", "u3@ejemplo.com")]["password"] == "original"
+    assert len(tabla.items) == 10
+
+
+def test_onboarding_rechaza_identificadores_con_barra(tabla):
+    onboarding = cargar("api-usuarios/OnboardingTenant.py")
+    respuesta  = onboarding({"body": json.dumps({
+        "tenant_id": "t", "usuarios": [{"email": "a/b@ejemplo.com", "password": "clave"}]
+    })}, None)
+    assert respuesta["statusCode"] == 400
+    assert tabla.items == {}